@@ -1,109 +1,96 @@
 import flet as ft
-import json
-import csv
+import time
+import shutil
 import pyperclip
 import asyncio
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 from pathlib import Path
 
-from eth_account import Account as EthAccount
-from solders.keypair import Keypair as SolKeypair
-from aptos_sdk.account import Account as AptosAccount
-from bitcoinlib.keys import HDKey
-
-# ──────────────────────────────────────────────────────────────
-#  Константы и вспомогательные функции
-# ──────────────────────────────────────────────────────────────
-DATA_DIR = Path("data")
-JSON_FILE = DATA_DIR / "accounts.json"
-
-NETWORKS = [
-    {"id": "evm",   "label": "EVM",     "field": "evm_private_key",   "address_field": "evm_address"},
-    {"id": "sol",   "label": "Solana",  "field": "sol_private_key",   "address_field": "solana_address"},
-    {"id": "sui",   "label": "Sui",     "field": "sui_private_key",   "address_field": "sui_address"},
-    {"id": "aptos", "label": "Aptos",   "field": "aptos_private_key", "address_field": "aptos_address"},
-    {"id": "btc",   "label": "Bitcoin", "field": "btc_private_key",   "address_field": "btc_address"},
-]
-
-def ensure_data_dir() -> None:
-    DATA_DIR.mkdir(exist_ok=True)
-
-def load_accounts() -> List[Dict[str, Any]]:
-    ensure_data_dir()
-    if not JSON_FILE.exists():
-        JSON_FILE.write_text("[]", encoding="utf-8")
-        return []
-    data = json.loads(JSON_FILE.read_text(encoding="utf-8"))
-    for acc in data:
-        for net in NETWORKS:
-            acc.setdefault(net["field"], "")
-            if not acc.get(net["address_field"]):
-                priv = acc.get(net["field"], "")
-                acc[net["address_field"]] = derive_address(net["id"], priv) if priv else ""
-    return data
-
-def save_accounts(accounts: List[Dict[str, Any]]) -> None:
-    ensure_data_dir()
-    JSON_FILE.write_text(json.dumps(accounts, indent=4, ensure_ascii=False), encoding="utf-8")
-
-def derive_address(network: str, priv_key: str) -> str:
-    if not priv_key:
-        return ""
-    try:
-        if network == "evm":
-            return EthAccount.from_key(priv_key).address
-        if network == "sol":
-            try:
-                return str(SolKeypair.from_base58_string(priv_key).pubkey())
-            except:
-                secret = bytes.fromhex(priv_key)
-                return str(SolKeypair.from_bytes(secret).pubkey())
-        if network == "sui":
-            import hashlib, binascii
-            priv_bytes = bytes.fromhex(priv_key)
-            pub_bytes = EthAccount.from_key(priv_bytes).public_key
-            addr = hashlib.sha256(pub_bytes).digest()[:20]
-            return "0x" + binascii.hexlify(addr).decode()
-        if network == "aptos":
-            return AptosAccount(priv_key).address().hex()
-        if network == "btc":
-            return HDKey(import_key=priv_key).address()
-    except Exception as exc:
-        print(f"[derive_address] {network} error: {exc}")
-    return ""
+from accounts_data import (
+    DATA_DIR, JSON_FILE, IMPORT_BATCH_SIZE, EXPORT_CSV_HEADERS,
+    ensure_data_dir, load_accounts, parse_import_line, iter_import_file,
+    derive_addresses, ingest_records, iter_export_rows, key_fields,
+)
+from bulk_edit import MODE_CONSTANT, MODE_LINES, MODE_TEMPLATE, apply_bulk_edit, plan_bulk_edit
+from export_dialog import run_export_job
+from export_jobs import ExportJob, export_path
+from key_index import (
+    KeyIndex, DUPLICATE_POLICIES, POLICY_SKIP, POLICY_MERGE, POLICY_OVERWRITE, apply_duplicate_policy,
+)
+from networks import NETWORKS, NETWORKS_BY_ID, shorten
+from rpc import BalanceFetcher
+from selection import (
+    MODE_REPLACE, SELECTION_MODES, Selection, expenses_selection, project_selection, range_selection,
+)
+from store import DELETED, ChangeEvent, DataStore
+from undo import UndoEntry
+
+FIRST_ROWS = 100        # строк в первом кадре таблицы
+CHUNK_ROWS = 250        # строк в каждой следующей порции
 
 # ──────────────────────────────────────────────────────────────
 #  Менеджер аккаунтов
 # ──────────────────────────────────────────────────────────────
 class AccountsManager:
-    def __init__(self, page: ft.Page, update_content_callback):
+    def __init__(self, page: ft.Page, update_content_callback, store: Optional[DataStore] = None):
         self.page = page
         self.update_content = update_content_callback
-        self.accounts = load_accounts()
+        self.store = store if store is not None else DataStore.from_disk()
+
+        # Индекс дубликатов по приватным ключам и адресам всех сетей
+        self.key_index = KeyIndex(key_fields())
+        self.key_index.rebuild(self.accounts)
+        self.store.accounts.subscribe(self._on_accounts_changed)
 
         # UI‑поля диалогов
         self.evm_field = self.sol_field = self.sui_field = self.aptos_field = None
         self.btc_field = self.email_field = self.twitter_field = self.discord_field = None
         self.dialog_modal = None
         self.editing_account_id = None
-        self.import_dialog = self.import_text_field = self.file_picker = None
+        self.import_dialog = self.import_text_field = None
+        self._import_cancelled = False
+        self._export_options: Dict[str, bool] = {"selected_only": False, "compress": False}
+        self.import_policy_dropdown = None
+        self.import_policy = POLICY_SKIP
 
         # кеш‑механизм
         self._cached_view = None
         self._revision = 0
         self._last_revision = -1
+        self._build_generation = 0         # поколение построения view (см. get_view_async)
+        self._table_body: Optional[ft.Column] = None
 
         # фильтры / UI‑состояния
         self.selected_network = "evm"
         self.display_mode = "key"          # «key» или «address»
         self.show_only_with_key = False
-        self.selected_account_ids: set[int] = set()
+        self.selected_account_ids = Selection()
+
+        # Ончейн-состояние адресов: (сеть, адрес) -> {"balance", "tx_count"} | {"error"}
+        self.balance_fetcher: Optional[BalanceFetcher] = None
+        self.chain_state: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._balances_loading = False
 
     # ------------------------------------------------------------------
     #  Асинхронная загрузка с индикатором
     # ------------------------------------------------------------------
-    async def get_view_async(self) -> ft.Container:
-        """Асинхронный рендер «Wallets» с индикатором загрузки."""
+    async def get_view_async(self) -> Optional[ft.Container]:
+        """Асинхронный рендер «Wallets»: данные — в пуле потоков, строки — порциями.
+
+        Каждый вызов начинает новое поколение построения; устаревшее
+        (например, сеть сменили, пока строилась таблица) прерывается на
+        ближайшей проверке и ничего не выводит.
+        """
+        self._build_generation += 1
+        generation = self._build_generation
+        stale = lambda: generation != self._build_generation
+
+        if self._cached_view is not None and self._revision == self._last_revision:
+            self.update_content(self._cached_view)
+            return self._cached_view
+        revision = self._revision
+
         # 1. Показываем индикатор
         loading = ft.Container(
             content=ft.Column(
@@ -118,29 +105,41 @@ class AccountsManager:
             alignment=ft.Alignment.CENTER,
         )
         self.update_content(loading)
-        await asyncio.sleep(0)  # даём UI отрисоваться
 
-        # 2. Загружаем данные (здесь можно делать реальную асинхронную загрузку)
-        #    Сейчас просто задержка для имитации
-        await asyncio.sleep(0.1)
-        # (в реальном коде здесь может быть вызов БД или API)
+        # 2. Фильтр и модели строк — вне event loop, по снимку списка
+        models = await self.store.saver.run(self._row_models, list(self.accounts), stale)
+        if models is None or stale():
+            return None
 
-        # 3. Строим таблицу
-        view = self._build_table()
+        # 3. Первые строки сразу, остальные дописываются порциями
+        view = self._build_table(models[:FIRST_ROWS])
         self.update_content(view)
+        body = self._table_body
+        for start in range(FIRST_ROWS, len(models), CHUNK_ROWS):
+            await asyncio.sleep(0)      # даём UI обработать ввод и прокрутку
+            if stale():
+                return None
+            body.controls.extend(self._make_row(m) for m in models[start:start + CHUNK_ROWS])
+            body.update()
+
+        if revision == self._revision:
+            self._cached_view = view
+            self._last_revision = revision
         return view
 
-    def _build_table(self) -> ft.Container:
-        """Строит таблицу со всеми строками и вертикальной прокруткой."""
-        filtered = self._filter_accounts()
-        rows = [self._make_row(acc) for acc in filtered]
+    def _build_table(self, models: Optional[List[Dict[str, Any]]] = None) -> ft.Container:
+        """Строит таблицу с вертикальной прокруткой (по умолчанию — со всеми строками)."""
+        if models is None:
+            models = self._row_models(self._filter_accounts())
+        rows = [self._make_row(m) for m in models]
 
         # Заголовок таблицы
         header_row = self._header_row()
 
         # Тело таблицы с вертикальной прокруткой
+        self._table_body = ft.Column(rows, scroll=ft.ScrollMode.ALWAYS)
         body = ft.Container(
-            content=ft.Column(rows, scroll=ft.ScrollMode.ALWAYS),
+            content=self._table_body,
             height=450,                     # фиксированная высота для прокрутки
             border=ft.Border(
                 left=ft.BorderSide(1, ft.Colors.GREY_800),
@@ -151,7 +150,7 @@ class AccountsManager:
 
         # Общая ширина таблицы (сумма ширин колонок + промежутки)
         col_widths = {
-            "select": 40, "id": 60, "value": 280,
+            "select": 40, "id": 60, "value": 280, "balance": 200,
             "email": 280, "twitter": 250, "discord": 250, "actions": 160,
         }
         total_width = sum(col_widths.values()) + 8 * (len(col_widths) - 1)
@@ -184,17 +183,43 @@ class AccountsManager:
     # ------------------------------------------------------------------
     #  Одна строка таблицы
     # ------------------------------------------------------------------
-    def _make_row(self, acc: Dict) -> ft.Container:
+    def _row_models(self, accounts: List[Dict],
+                    stale: Optional[Callable[[], bool]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Данные строк без контролов; может выполняться в рабочем потоке.
+
+        Возвращает None, если построение устарело (stale() стал True).
+        """
+        accounts = self._filter_accounts(accounts)
+        models = []
+        for i, acc in enumerate(accounts):
+            if stale is not None and i % CHUNK_ROWS == 0 and stale():
+                return None
+            display_value = self._get_account_display(acc, self.selected_network)
+            balance_text, balance_tooltip = self._balance_display(acc)
+            models.append({
+                "id": acc["id"],
+                "selected": acc["id"] in self.selected_account_ids,
+                "display_value": display_value,
+                "display_short": shorten(display_value, 8, 4, "…"),
+                "balance_text": balance_text,
+                "balance_tooltip": balance_tooltip,
+                "email": acc.get("email", ""),
+                "twitter_token": acc.get("twitter_token", ""),
+                "discord_token": acc.get("discord_token", ""),
+            })
+        return models
+
+    def _make_row(self, row: Dict[str, Any]) -> ft.Container:
         col_widths = {
-            "select": 40, "id": 60, "value": 280,
+            "select": 40, "id": 60, "value": 280, "balance": 200,
             "email": 280, "twitter": 250, "discord": 250, "actions": 160,
         }
         value_text_width = 240
 
         # Чекбокс выбора
         cb = ft.Checkbox(
-            value=acc["id"] in self.selected_account_ids,
-            data=acc["id"],
+            value=row["selected"],
+            data=row["id"],
             on_change=self._on_select_account,
         )
         select_cell = ft.Container(content=cb, width=col_widths["select"], alignment=ft.Alignment.CENTER)
@@ -204,7 +229,7 @@ class AccountsManager:
             icon=ft.Icons.DELETE_OUTLINE,
             icon_color=ft.Colors.RED_400,
             tooltip="Delete an account",
-            data=acc["id"],
+            data=row["id"],
             on_click=self.delete_account,
             width=32, height=32, padding=0, icon_size=20,
         )
@@ -212,16 +237,13 @@ class AccountsManager:
             icon=ft.Icons.EDIT_OUTLINED,
             icon_color=ft.Colors.BLUE_400,
             tooltip="Edit an account",
-            data=acc["id"],
+            data=row["id"],
             on_click=self.open_edit_account_dialog,
             width=32, height=32, padding=0, icon_size=20,
         )
 
         # Значение (ключ или адрес) с кнопкой копирования
-        display_value = self._get_account_display(acc, self.selected_network)
-        display_short = (
-            display_value[:8] + "…" + display_value[-4:] if len(display_value) > 12 else display_value
-        )
+        display_value = row["display_value"]
         copy_btn = ft.IconButton(
             icon=ft.Icons.CONTENT_COPY,
             icon_size=16,
@@ -232,7 +254,7 @@ class AccountsManager:
         )
         value_cell_content = ft.Row(
             [
-                self.centered_cell(display_short, value_text_width, tooltip=display_value),
+                self.centered_cell(row["display_short"], value_text_width, tooltip=display_value),
                 copy_btn,
             ],
             spacing=0,
@@ -248,14 +270,15 @@ class AccountsManager:
             content=ft.Row(
                 [
                     select_cell,
-                    self.centered_cell(str(acc.get("id", "")), col_widths["id"]),
+                    self.centered_cell(str(row["id"]), col_widths["id"]),
                     value_cell,
-                    self.centered_cell(acc.get("email", ""), col_widths["email"],
-                                       tooltip=acc.get("email", "")),
-                    self.centered_cell(acc.get("twitter_token", ""), col_widths["twitter"],
-                                       tooltip=acc.get("twitter_token", "")),
-                    self.centered_cell(acc.get("discord_token", ""), col_widths["discord"],
-                                       tooltip=acc.get("discord_token", "")),
+                    self.centered_cell(row["balance_text"], col_widths["balance"], tooltip=row["balance_tooltip"]),
+                    self.centered_cell(row["email"], col_widths["email"],
+                                       tooltip=row["email"]),
+                    self.centered_cell(row["twitter_token"], col_widths["twitter"],
+                                       tooltip=row["twitter_token"]),
+                    self.centered_cell(row["discord_token"], col_widths["discord"],
+                                       tooltip=row["discord_token"]),
                     ft.Container(
                         content=ft.Row([edit_btn, delete_btn], spacing=2,
                                        alignment=ft.MainAxisAlignment.CENTER),
@@ -315,9 +338,17 @@ class AccountsManager:
                 ft.Container(width=20),
                 ft.TextButton("Select All", on_click=self._select_all),
                 ft.TextButton("Clear All", on_click=self._clear_all),
+                ft.TextButton("Invert", on_click=self._invert_selection),
+                ft.TextButton("Select…", on_click=lambda _: self._select_dialog()),
                 ft.ElevatedButton(
                     "Bulk edit", icon=ft.Icons.EDIT, on_click=lambda _: self._bulk_edit_dialog()
                 ),
+                ft.ElevatedButton(
+                    "Refresh balances",
+                    icon=ft.Icons.REFRESH,
+                    on_click=self._refresh_balances_async,
+                    disabled=self._balances_loading or not NETWORKS_BY_ID[self.selected_network]["rpc"],
+                ),
             ],
             spacing=10,
         )
@@ -345,7 +376,7 @@ class AccountsManager:
 
     def _header_row(self) -> ft.Container:
         col_widths = {
-            "select": 40, "id": 60, "value": 280,
+            "select": 40, "id": 60, "value": 280, "balance": 200,
             "email": 280, "twitter": 250, "discord": 250, "actions": 160,
         }
 
@@ -373,6 +404,7 @@ class AccountsManager:
                     self.centered_header("", col_widths["select"]),
                     self.centered_header("ID", col_widths["id"]),
                     value_header_cell,
+                    self.centered_header("Balance", col_widths["balance"]),
                     self.centered_header("Email", col_widths["email"]),
                     self.centered_header("Twitter", col_widths["twitter"]),
                     self.centered_header("Discord", col_widths["discord"]),
@@ -429,19 +461,40 @@ class AccountsManager:
     def _increment_revision(self) -> None:
         self._revision += 1
 
+    @property
+    def accounts(self) -> List[Dict]:
+        return self.store.accounts.records
+
+    def _on_accounts_changed(self, event: ChangeEvent) -> None:
+        """Индекс дубликатов и выбор обновляются только по затронутым записям."""
+        for acc, prev in zip(event.records, event.previous):
+            if event.kind == DELETED:
+                self.key_index.remove(acc)
+                self.selected_account_ids.discard(acc["id"])
+                continue
+            if prev is not None:
+                self.key_index.remove(prev)
+            self.key_index.add(acc)
+        self._increment_revision()
+
+    def reload_from_disk(self) -> bool:
+        """Подтягивает внешние изменения accounts.json, трогая только изменённые записи."""
+        with self.store.history.external_change():
+            return self.store.accounts.replace_all(load_accounts())
+
     # ------------------------------------------------------------------
     #  Обработчики UI
     # ------------------------------------------------------------------
-    def on_network_change(self, e):
+    async def on_network_change(self, e):
         self.selected_network = e.data if hasattr(e, "data") else e.control.value
         self.selected_account_ids.clear()
         self._increment_revision()
-        self.update_content(self.get_view())
+        await self.get_view_async()
 
-    def on_display_mode_change(self, e):
+    async def on_display_mode_change(self, e):
         self.display_mode = e.data if hasattr(e, "data") else e.control.value
         self._increment_revision()
-        self.update_content(self.get_view())
+        await self.get_view_async()
 
     def on_filter_key_change(self, e):
         self.show_only_with_key = e.control.value
@@ -457,116 +510,138 @@ class AccountsManager:
             except Exception as exc:
                 print(f"Copy failed: {exc}")
 
+    # ------------------------------------------------------------------
+    #  Балансы и число транзакций (RPC)
+    # ------------------------------------------------------------------
+    def _balance_display(self, acc: Dict) -> Tuple[str, str]:
+        net = NETWORKS_BY_ID[self.selected_network]
+        address = acc.get(net["address_field"], "")
+        state = self.chain_state.get((net["id"], address)) if address else None
+        if state is None:
+            return "—", ""
+        if "error" in state:
+            return "error", state["error"]
+        return f"{state['balance']:.4f} {net['symbol']} · {state['tx_count']} tx", ""
+
+    async def close_async(self) -> None:
+        """Закрывает пул соединений RPC (при отключении страницы)."""
+        if self.balance_fetcher is not None:
+            await self.balance_fetcher.close()
+
+    async def _refresh_balances_async(self, e=None) -> None:
+        net = NETWORKS_BY_ID[self.selected_network]
+        if not net["rpc"] or self._balances_loading:
+            return
+        if self.balance_fetcher is None:
+            self.balance_fetcher = BalanceFetcher()
+        addresses = [acc.get(net["address_field"]) for acc in self._filter_accounts()]
+        self._balances_loading = True
+        self._increment_revision()
+        self.update_content(self.get_view())
+        try:
+            states = await self.balance_fetcher.fetch(net["id"], net["rpc"], addresses)
+            for address, state in states.items():
+                self.chain_state[(net["id"], address)] = state
+            failed = sum(1 for state in states.values() if "error" in state)
+            message = f"Balances updated: {len(states) - failed} ok, {failed} failed"
+        except Exception as exc:
+            message = f"Balance refresh failed: {exc}"
+        self._balances_loading = False
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(message), open=True)
+        self._increment_revision()
+        self.update_content(self.get_view())
+
     # ------------------------------------------------------------------
     #  Фильтрация аккаунтов
     # ------------------------------------------------------------------
     def _get_account_display(self, acc: Dict, network: str) -> str:
-        if self.display_mode == "key":
-            for net in NETWORKS:
-                if net["id"] == network:
-                    return acc.get(net["field"], "")
-        else:
-            for net in NETWORKS:
-                if net["id"] == network:
-                    return acc.get(net["address_field"], "")
-        return ""
+        net = NETWORKS_BY_ID.get(network)
+        if net is None:
+            return ""
+        field = net["field"] if self.display_mode == "key" else net["address_field"]
+        return acc.get(field, "")
 
     def _get_account_key(self, acc: Dict, network: str) -> str:
-        for net in NETWORKS:
-            if net["id"] == network:
-                return acc.get(net["field"], "")
-        return ""
+        net = NETWORKS_BY_ID.get(network)
+        return acc.get(net["field"], "") if net else ""
 
-    def _filter_accounts(self) -> List[Dict]:
+    def _filter_accounts(self, accounts: Optional[List[Dict]] = None) -> List[Dict]:
+        accounts = self.accounts if accounts is None else accounts
         if not self.show_only_with_key:
-            return self.accounts
-        return [acc for acc in self.accounts if self._get_account_key(acc, self.selected_network)]
+            return accounts
+        field = NETWORKS_BY_ID[self.selected_network]["field"]
+        return [acc for acc in accounts if acc.get(field)]
 
     # ------------------------------------------------------------------
     #  Экспорт / импорт
     # ------------------------------------------------------------------
-    def _export_to_csv(self, path: Path) -> None:
-        with open(path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.writer(f)
-            headers = [
-                "id", "evm_private_key", "sol_private_key", "sui_private_key",
-                "aptos_private_key", "btc_private_key", "email",
-                "twitter_token", "discord_token",
-            ]
-            writer.writerow(headers)
-            for acc in self.accounts:
-                writer.writerow([acc.get(h, "") for h in headers])
+    EXPORT_CSV_HEADERS = EXPORT_CSV_HEADERS
 
-    def _export_to_json(self, path: Path) -> None:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.accounts, f, indent=4, ensure_ascii=False)
+    def _export_source(self) -> List[Dict]:
+        """Снимок строк для экспорта (все или только выбранные)."""
+        if self._export_options["selected_only"]:
+            return [acc for acc in self.accounts if acc["id"] in self.selected_account_ids]
+        return list(self.accounts)
+
+    def _iter_export_rows(self, accounts: List[Dict], fmt: str) -> Iterator[Any]:
+        return iter_export_rows(accounts, fmt)
 
     def _export_dialog(self) -> None:
-        def on_export_format(e):
+        selected_only_cb = ft.Checkbox(
+            label=f"Selected only ({len(self.selected_account_ids)})",
+            value=bool(self.selected_account_ids),
+            disabled=not self.selected_account_ids,
+        )
+        compress_cb = ft.Checkbox(label="Compress (gzip)", value=self._export_options["compress"])
+
+        async def on_export_format(e):
             fmt = e.control.data
-            self._show_export_file_dialog(fmt)
+            self._export_options = {
+                "selected_only": bool(selected_only_cb.value),
+                "compress": bool(compress_cb.value),
+            }
+            self._close_dialog(dlg)
+            await self._pick_export_file_async(fmt)
 
         dlg = ft.AlertDialog(
             modal=True,
             title=ft.Text("Export wallets"),
             content=ft.Column(
                 [
+                    selected_only_cb,
+                    compress_cb,
                     ft.ElevatedButton("CSV", data="csv", on_click=on_export_format),
                     ft.ElevatedButton("JSON", data="json", on_click=on_export_format),
                 ],
                 spacing=10,
+                tight=True,
             ),
             actions=[ft.TextButton("Cancel", on_click=lambda e: self._close_dialog(dlg))],
             actions_alignment=ft.MainAxisAlignment.END,
         )
         self.page.show_dialog(dlg)
 
-    def _show_export_file_dialog(self, fmt: str) -> None:
-        if not self.file_picker:
-            self.file_picker = ft.FilePicker()
-            self.page.overlay.append(self.file_picker)
-
-        if hasattr(self.file_picker, "save_file"):
-            self.file_picker.save_file(
-                dialog_title="Save as",
-                allowed_extensions=[fmt],
-                on_result=lambda e: self._on_export_file_selected(e, fmt),
-            )
-        else:
-            def on_confirm(e):
-                p = Path(path_field.value)
-                if p.parent.exists():
-                    self._do_export(p, fmt)
-                    self._close_dialog(dlg)
-                else:
-                    path_field.error_text = "Invalid path"
-                    self.page.update()
-
-            path_field = ft.TextField(label="File path", hint_text=f"path/to/export.{fmt}")
-            dlg = ft.AlertDialog(
-                title=ft.Text(f"Save as .{fmt}"),
-                content=path_field,
-                actions=[
-                    ft.TextButton("Cancel", on_click=lambda e: self._close_dialog(dlg)),
-                    ft.ElevatedButton("Save", on_click=on_confirm),
-                ],
-            )
-            self.page.show_dialog(dlg)
-
-    def _on_export_file_selected(self, e, fmt: str) -> None:
-        if e.path:
-            self._do_export(Path(e.path), fmt)
+    async def _pick_export_file_async(self, fmt: str) -> None:
+        file_picker = ft.FilePicker()
+        self.page.services.append(file_picker)
+        dest = await file_picker.save_file(
+            dialog_title="Save as",
+            allowed_extensions=[fmt],
+        )
+        if dest:
+            self._do_export(Path(dest), fmt)
 
     def _do_export(self, path: Path, fmt: str) -> None:
-        try:
-            if fmt == "csv":
-                self._export_to_csv(path)
-            else:
-                self._export_to_json(path)
-            self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Exported to {path}"), open=True)
-        except Exception as ex:
-            self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Export failed: {ex}"), open=True)
-        self.page.update()
+        accounts = self._export_source()
+        job = ExportJob(
+            export_path(path, fmt, self._export_options["compress"]),
+            fmt,
+            self._iter_export_rows(accounts, fmt),
+            total=len(accounts),
+            headers=self.EXPORT_CSV_HEADERS if fmt == "csv" else None,
+            compress=self._export_options["compress"],
+        )
+        run_export_job(self.page, job, "Exporting wallets")
 
     def _close_dialog(self, dlg: ft.AlertDialog) -> None:
         dlg.open = False
@@ -576,18 +651,23 @@ class AccountsManager:
     #  Bulk‑edit диалог
     # ------------------------------------------------------------------
     def _bulk_edit_dialog(self) -> None:
-        def on_save(e):
-            field = field_dropdown.value
-            value = value_field.value
-            if not field or not value:
+        selected = len(self.selected_account_ids)
+
+        async def on_save(e):
+            try:
+                edit = plan_bulk_edit(self.store.accounts, self.selected_account_ids,
+                                      field_dropdown.value, value_field.value or "", mode_dropdown.value)
+            except ValueError as exc:
+                value_field.error_text = str(exc)
+                dlg.update()
                 return
-            for acc in self.accounts:
-                if acc["id"] in self.selected_account_ids:
-                    acc[field] = value
-            save_accounts(self.accounts)
-            self._increment_revision()
-            self.update_content(self.get_view())
             self._close_dialog(dlg)
+            if not edit:
+                return
+            apply_bulk_edit(self.store.accounts, edit)
+            self.update_content(self.get_view())
+            self._undo_snackbar(f"Updated {len(edit)} wallets")
+            await self.store.save("accounts")
 
         field_dropdown = ft.Dropdown(
             label="Field",
@@ -598,19 +678,39 @@ class AccountsManager:
             ],
             value="email",
         )
-        value_field = ft.TextField(label="New value", multiline=True)
+        mode_dropdown = ft.Dropdown(
+            label="Value",
+            options=[
+                ft.dropdown.Option(MODE_CONSTANT, "Same value for all"),
+                ft.dropdown.Option(MODE_LINES, "One line per wallet (by ID)"),
+                ft.dropdown.Option(MODE_TEMPLATE, "Template: {id}, {index}, {email}…"),
+            ],
+            value=MODE_CONSTANT,
+        )
+        value_field = ft.TextField(label="New value", multiline=True, min_lines=1, max_lines=10)
 
         dlg = ft.AlertDialog(
             modal=True,
-            title=ft.Text("Bulk edit"),
-            content=ft.Column([field_dropdown, value_field], spacing=10),
+            title=ft.Text(f"Bulk edit ({selected} selected)"),
+            content=ft.Column([field_dropdown, mode_dropdown, value_field], spacing=10, width=450, tight=True),
             actions=[
                 ft.TextButton("Cancel", on_click=lambda e: self._close_dialog(dlg)),
-                ft.ElevatedButton("Apply", on_click=on_save),
+                ft.ElevatedButton("Apply", on_click=on_save, disabled=not selected),
             ],
         )
         self.page.show_dialog(dlg)
 
+    def _undo_snackbar(self, message: str) -> None:
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(message), action="Undo",
+                                          on_action=self._undo_last, open=True)
+        self.page.update()
+
+    async def _undo_last(self, e=None) -> None:
+        entry = self.store.history.undo()
+        if entry:
+            self.update_content(self.get_view())
+            await self.store.save_entry(entry)
+
     # ------------------------------------------------------------------
     #  Импорт из текста
     # ------------------------------------------------------------------
@@ -626,6 +726,15 @@ class AccountsManager:
             ),
         )
 
+        self.import_policy_dropdown = ft.Dropdown(
+            label="Duplicates",
+            options=[
+                ft.dropdown.Option(policy, policy.capitalize()) for policy in DUPLICATE_POLICIES
+            ],
+            value=self.import_policy,
+            width=200,
+        )
+
         self.import_dialog = ft.AlertDialog(
             modal=True,
             title=ft.Text("Import wallets from text"),
@@ -633,6 +742,7 @@ class AccountsManager:
                 content=ft.Column(
                     [
                         self.import_text_field,
+                        self.import_policy_dropdown,
                         ft.Text("Each line should contain fields separated by '|'",
                                 size=12, color=ft.Colors.GREY_400),
                     ],
@@ -643,6 +753,8 @@ class AccountsManager:
             ),
             actions=[
                 ft.TextButton("Cancel", on_click=self.close_import_dialog),
+                ft.OutlinedButton("Import from file…", icon=ft.Icons.FOLDER_OPEN,
+                                  on_click=self._pick_import_file_async),
                 ft.ElevatedButton("Import", on_click=self.import_from_text),
             ],
             actions_alignment=ft.MainAxisAlignment.END,
@@ -654,48 +766,210 @@ class AccountsManager:
             self.import_dialog.open = False
             self.page.update()
 
-    def import_from_text(self, e: ft.ControlEvent = None) -> None:
-        text = self.import_text_field.value
-        if not text:
-            return
-        lines = text.strip().split("\n")
-        new_accounts = []
-        max_id = max([acc["id"] for acc in self.accounts], default=0)
+    def _selected_import_policy(self) -> str:
+        if self.import_policy_dropdown and self.import_policy_dropdown.value:
+            self.import_policy = self.import_policy_dropdown.value
+        return self.import_policy
+
+    def _ingest_records(self, records: List[Dict[str, Any]], policy: str,
+                        by_id: Dict[int, Dict[str, Any]], next_id: int,
+                        ) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]], int]:
+        """Как ingest_records, но сразу публикует изменения в хранилище одной пачкой."""
+        previous: Dict[int, Dict[str, Any]] = {}
+        new_accounts, duplicates, updated, next_id = ingest_records(
+            records, self.key_index, policy, by_id, next_id, previous
+        )
+        self.store.accounts.add(new_accounts)
+        self.store.accounts.touched(updated, [previous[acc["id"]] for acc in updated])
+        return new_accounts, duplicates, updated, next_id
 
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line or line.startswith("#"):
+    @staticmethod
+    def _parse_import_text(text: str) -> List[Dict[str, Any]]:
+        """Разбор и вывод адресов — выполняется вне event loop."""
+        records = []
+        for line_num, line in enumerate(text.strip().split("\n"), 1):
+            try:
+                record = parse_import_line(line)
+            except ValueError as exc:
+                print(f"Line {line_num}: {exc}")
                 continue
-            parts = [p.strip() for p in line.split("|")]
-            if len(parts) == 5:
-                evm, sol, email, twitter, discord = parts
-                sui = aptos = btc = ""
-            elif len(parts) >= 8:
-                evm, sol, sui, aptos, btc, email, twitter, discord = parts[:8]
-            else:
-                print(f"Line {line_num}: expected 5 or 8 fields, got {len(parts)}")
+            if record is None:
                 continue
+            derive_addresses(record)
+            records.append(record)
+        return records
 
-            max_id += 1
-            new_accounts.append(
-                {
-                    "id": max_id,
-                    "evm_private_key": evm,
-                    "sol_private_key": sol,
-                    "sui_private_key": sui,
-                    "aptos_private_key": aptos,
-                    "btc_private_key": btc,
-                    "email": email,
-                    "twitter_token": twitter,
-                    "discord_token": discord,
-                }
+    async def import_from_text(self, e: ft.ControlEvent = None) -> None:
+        text = self.import_text_field.value
+        if not text:
+            return
+        records = await self.store.saver.run(self._parse_import_text, text)
+
+        by_id = {acc["id"]: acc for acc in self.accounts}
+        with self.store.history.transaction("Import wallets"):
+            new_accounts, duplicates, updated, _ = self._ingest_records(
+                records, self._selected_import_policy(), by_id, self.store.accounts.next_id()
             )
-        if new_accounts:
-            self.accounts.extend(new_accounts)
-            save_accounts(self.accounts)
-            self._increment_revision()
-            self.close_import_dialog()
-            self.update_content(self.get_view())
+        self.close_import_dialog()
+        self.page.snack_bar = ft.SnackBar(
+            content=ft.Text(f"Imported {len(new_accounts)} · duplicates {duplicates} · updated {len(updated)}"),
+            open=True,
+        )
+        self.update_content(self.get_view())
+        if new_accounts or updated:
+            await self.store.save("accounts")
+
+    # ------------------------------------------------------------------
+    #  Потоковый импорт из файла
+    # ------------------------------------------------------------------
+    async def _pick_import_file_async(self, e) -> None:
+        file_picker = ft.FilePicker()
+        self.page.services.append(file_picker)
+        files = await file_picker.pick_files(
+            dialog_title="Choose wallets file",
+            allow_multiple=False,
+            allowed_extensions=["txt", "csv"],
+        )
+        if not files or not files[0].path:
+            return
+        self._selected_import_policy()
+        self.close_import_dialog()
+        self._start_file_import(Path(files[0].path))
+
+    def _start_file_import(self, path: Path) -> None:
+        progress_bar = ft.ProgressBar(value=0, width=500)
+        status_text = ft.Text("Starting…", size=13, color=ft.Colors.GREY_400)
+        cancel_btn = ft.TextButton("Cancel", on_click=lambda _: setattr(self, "_import_cancelled", True))
+        dlg = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(f"Importing {path.name}"),
+            content=ft.Column([progress_bar, status_text], tight=True, spacing=10, width=500),
+            actions=[cancel_btn],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self.page.show_dialog(dlg)
+        self._import_cancelled = False
+        self.page.run_thread(self._import_file_worker, path, dlg, progress_bar, status_text)
+
+    async def _commit_import_batch(self, batch: List[Dict[str, Any]], policy: str,
+                                   state: Dict[str, Any], entry: UndoEntry) -> Tuple[int, int, int]:
+        """Пачка файлового импорта применяется в event loop.
+
+        Хранилище, key_index и подписчики меняются только из loop, поэтому
+        с обработчиками UI (сохранение аккаунта, bulk edit) пачка не
+        пересекается. Возвращает (добавлено, дубликатов, обновлено).
+        """
+        if state["by_id"] is None:
+            state["by_id"] = {acc["id"]: acc for acc in self.accounts}
+        # Пока шёл импорт, аккаунты могли добавиться и из файла на диске
+        next_id = max(state["next_id"], self.store.accounts.next_id())
+        with self.store.history.recording(entry):
+            committed, dups, upd, state["next_id"] = self._ingest_records(batch, policy, state["by_id"], next_id)
+        return len(committed), dups, len(upd)
+
+    async def _push_import_history(self, entry: UndoEntry) -> None:
+        self.store.history.push(entry)
+
+    def _import_file_worker(self, path: Path, dlg: ft.AlertDialog,
+                            progress_bar: ft.ProgressBar, status_text: ft.Text) -> None:
+        """Фоновый импорт: читает файл построчно и выводит адреса в этом потоке,
+        пачки по IMPORT_BATCH_SIZE применяет в event loop (_commit_import_batch)."""
+        total_bytes = max(path.stat().st_size, 1)
+        ensure_data_dir()
+        errors_path = DATA_DIR / f"import_errors_{datetime.now():%Y%m%d_%H%M%S}.txt"
+        policy = self.import_policy
+        state: Dict[str, Any] = {"by_id": None, "next_id": 0}
+        # Весь импорт — один шаг undo: откат удаляет добавленные одной пачкой
+        entry = UndoEntry(f"Import {path.name}")
+        imported = errors = lines_read = duplicates = updated = 0
+        started = last_ui = time.monotonic()
+        batch: List[Dict[str, Any]] = []
+
+        def commit_batch() -> None:
+            nonlocal imported, duplicates, updated
+            # Пачка либо целиком попадает в список, либо не попадает вовсе
+            for record in batch:
+                derive_addresses(record)
+            added, dups, upd = self.page.run_task(
+                self._commit_import_batch, list(batch), policy, state, entry
+            ).result()
+            imported += added
+            duplicates += dups
+            updated += upd
+            batch.clear()
+
+        try:
+            with open(errors_path, "w", encoding="utf-8") as err_file:
+                for line_num, line, pos in iter_import_file(path):
+                    if self._import_cancelled:
+                        break
+                    lines_read = line_num
+                    try:
+                        record = parse_import_line(line)
+                    except ValueError as exc:
+                        errors += 1
+                        # Только номер и причина: сама строка — это ключи и токены
+                        err_file.write(f"line {line_num}: {exc}\n")
+                        continue
+                    if record is None:
+                        continue
+                    batch.append(record)
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        commit_batch()
+                        now = time.monotonic()
+                        if now - last_ui >= 0.25:
+                            last_ui = now
+                            rate = lines_read / max(now - started, 1e-6)
+                            progress_bar.value = pos / total_bytes
+                            status_text.value = (f"{lines_read} lines · {imported} imported · "
+                                                 f"{duplicates} duplicates · {errors} errors · "
+                                                 f"{rate:,.0f} lines/s")
+                            self.page.update()
+                if batch and not self._import_cancelled:
+                    commit_batch()
+        except Exception as exc:
+            errors += 1
+            print(f"[import] {path}: {exc}")
+
+        if entry:
+            self.page.run_task(self._push_import_history, entry).result()
+        if imported or updated:
+            self.store.save_sync("accounts")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        progress_bar.value = 1
+        outcome = "Cancelled" if self._import_cancelled else "Done"
+        status_text.value = (f"{outcome}: {lines_read} lines · {imported} imported · "
+                             f"{duplicates} duplicates ({updated} updated) · {errors} errors · "
+                             f"{lines_read / elapsed:,.0f} lines/s")
+        actions = [ft.TextButton("Close", on_click=lambda _: self._finish_file_import(dlg, errors_path))]
+        if errors:
+            actions.insert(0, ft.TextButton(
+                "Save error report",
+                icon=ft.Icons.DOWNLOAD,
+                on_click=lambda _: self.page.run_task(self._save_error_report_async, errors_path),
+            ))
+        else:
+            errors_path.unlink(missing_ok=True)
+        dlg.actions = actions
+        self.page.update()
+
+    async def _save_error_report_async(self, errors_path: Path) -> None:
+        file_picker = ft.FilePicker()
+        self.page.services.append(file_picker)
+        dest = await file_picker.save_file(
+            dialog_title="Save error report",
+            file_name=errors_path.name,
+            allowed_extensions=["txt"],
+        )
+        if dest:
+            shutil.copy2(errors_path, dest)
+
+    def _finish_file_import(self, dlg: ft.AlertDialog, errors_path: Path) -> None:
+        # Отчёт нужен только до закрытия диалога: сохранённый пользователем — его копия
+        errors_path.unlink(missing_ok=True)
+        self._close_dialog(dlg)
+        self.update_content(self.get_view())
 
     # ------------------------------------------------------------------
     #  Диалог добавления / редактирования аккаунта
@@ -707,7 +981,7 @@ class AccountsManager:
     def open_edit_account_dialog(self, e: ft.ControlEvent) -> None:
         account_id = e.control.data
         self.editing_account_id = account_id
-        account = next((acc for acc in self.accounts if acc["id"] == account_id), None)
+        account = self.store.accounts.get(account_id)
         if account:
             self._show_account_dialog(account)
 
@@ -760,41 +1034,69 @@ class AccountsManager:
         )
         self.page.show_dialog(self.dialog_modal)
 
-    def save_account(self, e: ft.ControlEvent = None) -> None:
+    def _account_form_values(self) -> Dict[str, str]:
+        return {
+            "evm_private_key": self.evm_field.value or "",
+            "sol_private_key": self.sol_field.value or "",
+            "sui_private_key": self.sui_field.value or "",
+            "aptos_private_key": self.aptos_field.value or "",
+            "btc_private_key": self.btc_field.value or "",
+            "email": self.email_field.value or "",
+            "twitter_token": self.twitter_field.value or "",
+            "discord_token": self.discord_field.value or "",
+        }
+
+    async def save_account(self, e: ft.ControlEvent = None) -> None:
+        values = self._account_form_values()
+        await self.store.saver.run(derive_addresses, values)
+        dup_id = self.key_index.find(values, exclude_id=self.editing_account_id)
+        if dup_id is not None:
+            self._confirm_duplicate(dup_id, values)
+            return
+        self._store_account(values)
+
+    def _store_account(self, values: Dict[str, Any]) -> None:
         if self.editing_account_id is None:
-            new_id = max([acc["id"] for acc in self.accounts], default=0) + 1
-            new_account = {
-                "id": new_id,
-                "evm_private_key": self.evm_field.value or "",
-                "sol_private_key": self.sol_field.value or "",
-                "sui_private_key": self.sui_field.value or "",
-                "aptos_private_key": self.aptos_field.value or "",
-                "btc_private_key": self.btc_field.value or "",
-                "email": self.email_field.value or "",
-                "twitter_token": self.twitter_field.value or "",
-                "discord_token": self.discord_field.value or "",
-            }
-            self.accounts.append(new_account)
+            self.store.accounts.add([{"id": self.store.accounts.next_id(), **values}])
         else:
-            for acc in self.accounts:
-                if acc["id"] == self.editing_account_id:
-                    acc.update(
-                        {
-                            "evm_private_key": self.evm_field.value or "",
-                            "sol_private_key": self.sol_field.value or "",
-                            "sui_private_key": self.sui_field.value or "",
-                            "aptos_private_key": self.aptos_field.value or "",
-                            "btc_private_key": self.btc_field.value or "",
-                            "email": self.email_field.value or "",
-                            "twitter_token": self.twitter_field.value or "",
-                            "discord_token": self.discord_field.value or "",
-                        }
-                    )
-                    break
-        save_accounts(self.accounts)
-        self._increment_revision()
+            self.store.accounts.update(self.editing_account_id, values)
         self.close_dialog()
         self.update_content(self.get_view())
+        self._save_later()
+
+    def _save_later(self) -> None:
+        """Запись на диск в фоне — view уже обновлён."""
+        self.page.run_task(self.store.save, "accounts")
+
+    def _confirm_duplicate(self, dup_id: int, values: Dict[str, Any]) -> None:
+        """Ключ или адрес уже есть у другого аккаунта: пропустить, слить или перезаписать."""
+        def resolve(policy: str):
+            def handler(e):
+                self._close_dialog(dlg)
+                existing = self.store.accounts.get(dup_id)
+                if policy == POLICY_SKIP or existing is None:
+                    return
+                merged = dict(existing)
+                if apply_duplicate_policy(merged, values, policy):
+                    self.store.accounts.replace(merged)
+                    self._save_later()
+                self.close_dialog()
+                self.update_content(self.get_view())
+            return handler
+
+        dlg = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Duplicate wallet"),
+            content=ft.Text(f"Account #{dup_id} already uses one of these keys or addresses."),
+            actions=[
+                ft.TextButton("Skip", on_click=resolve(POLICY_SKIP)),
+                ft.TextButton(f"Merge into #{dup_id}", on_click=resolve(POLICY_MERGE)),
+                ft.ElevatedButton(f"Overwrite #{dup_id}", on_click=resolve(POLICY_OVERWRITE),
+                                  color=ft.Colors.RED_400),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self.page.show_dialog(dlg)
 
     def close_dialog(self, e: ft.ControlEvent = None) -> None:
         if self.dialog_modal:
@@ -826,11 +1128,10 @@ class AccountsManager:
         self.page.show_dialog(dlg)
 
     def _delete_account(self, account_id: int) -> None:
-        self.accounts = [acc for acc in self.accounts if acc.get("id") != account_id]
-        self.selected_account_ids.discard(account_id)
-        save_accounts(self.accounts)
-        self._increment_revision()
+        self.store.accounts.delete([account_id])
         self.update_content(self.get_view())
+        self._undo_snackbar(f"Account #{account_id} deleted")
+        self._save_later()
 
     def delete_account(self, e: ft.ControlEvent) -> None:
         account_id = e.control.data
@@ -848,21 +1149,97 @@ class AccountsManager:
         self._increment_revision()
         self.update_content(self.get_view())
 
-    def _select_all(self, e: ft.ControlEvent) -> None:
-        filtered = self._filter_accounts()
-        self.selected_account_ids = {acc["id"] for acc in filtered}
+    def _visible_selection(self) -> Selection:
+        return Selection(acc["id"] for acc in self._filter_accounts())
+
+    def _set_selection(self, selection: Selection) -> None:
+        # Выбор ограничен видимыми строками, как у «Select All»
+        self.selected_account_ids = selection & self._visible_selection()
         self._increment_revision()
         self.update_content(self.get_view())
 
+    def _select_all(self, e: ft.ControlEvent) -> None:
+        self._set_selection(self._visible_selection())
+
     def _clear_all(self, e: ft.ControlEvent) -> None:
         self.selected_account_ids.clear()
         self._increment_revision()
         self.update_content(self.get_view())
 
+    def _invert_selection(self, e: ft.ControlEvent) -> None:
+        self._set_selection(self.selected_account_ids.inverted(self._visible_selection()))
+
+    def _select_dialog(self) -> None:
+        """Выбор по диапазону id или по проекту, с объединением/пересечением."""
+        projects = sorted(self.store.projects, key=lambda p: p.get("name", ""))
+        source_dropdown = ft.Dropdown(
+            label="Source",
+            options=[
+                ft.dropdown.Option("range", "ID range"),
+                ft.dropdown.Option("project", "Project accounts"),
+                ft.dropdown.Option("expenses", "Accounts in project operations"),
+            ],
+            value="range",
+        )
+        first_field = ft.TextField(label="From ID", width=120)
+        last_field = ft.TextField(label="To ID", width=120)
+        project_dropdown = ft.Dropdown(
+            label="Project",
+            options=[ft.dropdown.Option(str(p["id"]), p.get("name", f"#{p['id']}")) for p in projects],
+        )
+        mode_dropdown = ft.Dropdown(
+            label="Combine with current selection",
+            options=[ft.dropdown.Option(mode, mode.capitalize()) for mode in SELECTION_MODES],
+            value=MODE_REPLACE,
+        )
+
+        def on_apply(e):
+            source = source_dropdown.value
+            if source == "range":
+                bounds = []
+                for field in (first_field, last_field):
+                    try:
+                        bounds.append(int(field.value))
+                        field.error_text = None
+                    except (TypeError, ValueError):
+                        field.error_text = "Enter a number"
+                if len(bounds) < 2:
+                    dlg.update()
+                    return
+                # «To ID» больше последнего id не растит битовый массив выбора
+                picked = range_selection(bounds[0], min(bounds[1], self.store.accounts.next_id() - 1))
+            else:
+                if not project_dropdown.value:
+                    return
+                project_id = int(project_dropdown.value)
+                if source == "project":
+                    picked = project_selection(self.store.projects.get(project_id) or {})
+                else:
+                    picked = expenses_selection(
+                        exp for exp in self.store.expenses if exp.get("project_id") == project_id
+                    )
+            self._close_dialog(dlg)
+            self._set_selection(self.selected_account_ids.combine(picked, mode_dropdown.value))
+
+        dlg = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Select accounts"),
+            content=ft.Column(
+                [source_dropdown, ft.Row([first_field, last_field]), project_dropdown, mode_dropdown],
+                spacing=10, tight=True, width=400,
+            ),
+            actions=[
+                ft.TextButton("Cancel", on_click=lambda e: self._close_dialog(dlg)),
+                ft.ElevatedButton("Apply", on_click=on_apply),
+            ],
+        )
+        self.page.show_dialog(dlg)
+
     # ------------------------------------------------------------------
     #  Синхронный fallback (для совместимости)
     # ------------------------------------------------------------------
     def get_view(self) -> ft.Container:
+        self._build_generation += 1        # прерывает незавершённое асинхронное построение
         if self._cached_view is None or self._revision != self._last_revision:
             self._cached_view = self._build_table()
             self._last_revision = self._revision
@@ -0,0 +1,167 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from crypto_store import SEALED_FIELD, encryption_enabled, session_cipher
+from key_index import KeyIndex, POLICY_SKIP, apply_duplicate_policy
+from migrations import log_migration, migrate, read_records, write_records
+from networks import NETWORKS, derive_address
+from records import Account
+from watcher import remember_file
+
+# ──────────────────────────────────────────────────────────────
+#  Константы и вспомогательные функции
+# ──────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+JSON_FILE = DATA_DIR / "accounts.json"
+
+def ensure_data_dir() -> None:
+    DATA_DIR.mkdir(exist_ok=True)
+
+def load_accounts(derive: bool = True) -> List[Dict[str, Any]]:
+    """Читает accounts.json; файл старой схемы мигрирует и пересохраняет.
+
+    derive=False не вычисляет при миграции пустые адреса — cli.py derive
+    считает их сам в пуле процессов.
+    """
+    ensure_data_dir()
+    if not JSON_FILE.exists():
+        save_accounts([])
+        return []
+    data, version = read_records(JSON_FILE)
+    if any(SEALED_FIELD in acc for acc in data):
+        cipher = session_cipher()
+        if cipher is None:
+            raise ValueError("accounts.json is encrypted: unlock it with the password first")
+        data = [cipher.open(acc) if SEALED_FIELD in acc else acc for acc in data]
+    if migrate("accounts", data, version, derive=derive):
+        save_accounts(data)
+        log_migration(JSON_FILE, "accounts", version, len(data))
+    return data
+
+def save_accounts(accounts: List[Dict[str, Any]], encrypt: Optional[bool] = None) -> None:
+    """Пишет accounts.json; при включённом шифровании секреты запечатываются по записям.
+
+    encrypt=False пишет открытый файл при ещё существующем keystore.json —
+    для выключения шифрования, где keystore удаляется только после записи.
+    """
+    ensure_data_dir()
+    if encryption_enabled() if encrypt is None else encrypt:
+        cipher = session_cipher()
+        if cipher is None:
+            raise ValueError("accounts are encrypted but not unlocked; refusing to write plaintext")
+        accounts = [cipher.seal(acc) for acc in accounts]
+    # Пишем во временный файл и подменяем: при сбое старый файл остаётся целым
+    write_records(JSON_FILE, "accounts", accounts)
+    remember_file(JSON_FILE)
+
+# ──────────────────────────────────────────────────────────────
+#  Импорт: разбор строк и потоковое чтение файла
+# ──────────────────────────────────────────────────────────────
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FIELDS = [
+    "evm_private_key", "sol_private_key", "sui_private_key", "aptos_private_key",
+    "btc_private_key", "email", "twitter_token", "discord_token",
+]
+
+
+def parse_import_line(line: str) -> Optional[Dict[str, Any]]:
+    """Разбирает строку импорта (5 или 8 полей через '|').
+
+    Возвращает None для пустых строк и комментариев, при неверном
+    формате бросает ValueError.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = [p.strip() for p in line.split("|")]
+    if len(parts) == 5:
+        evm, sol, email, twitter, discord = parts
+        sui = aptos = btc = ""
+    elif len(parts) >= 8:
+        evm, sol, sui, aptos, btc, email, twitter, discord = parts[:8]
+    else:
+        raise ValueError(f"expected 5 or 8 fields, got {len(parts)}")
+    return dict(zip(IMPORT_FIELDS, (evm, sol, sui, aptos, btc, email, twitter, discord)))
+
+
+def iter_import_file(path: Path) -> Iterator[Tuple[int, str, int]]:
+    """Построчно читает файл импорта: (номер строки, строка, прочитано байт)."""
+    with open(path, "rb") as f:
+        for line_num, raw in enumerate(f, 1):
+            yield line_num, raw.decode("utf-8-sig" if line_num == 1 else "utf-8", errors="replace"), f.tell()
+
+
+def derive_addresses(account: Dict[str, Any]) -> None:
+    """Заполняет адресные поля по приватным ключам аккаунта."""
+    for net in NETWORKS:
+        priv = account.get(net["field"], "")
+        account[net["address_field"]] = derive_address(net["id"], priv) if priv else ""
+
+
+# ──────────────────────────────────────────────────────────────
+#  Дубликаты и экспорт (без UI — общие для менеджера и cli.py)
+# ──────────────────────────────────────────────────────────────
+EXPORT_CSV_HEADERS = [
+    "id", "evm_private_key", "sol_private_key", "sui_private_key",
+    "aptos_private_key", "btc_private_key", "email",
+    "twitter_token", "discord_token",
+]
+
+
+def key_fields() -> List[str]:
+    """Поля, по которым ищутся дубликаты: ключи и адреса всех сетей."""
+    return [net["field"] for net in NETWORKS] + [net["address_field"] for net in NETWORKS]
+
+
+def ingest_records(records: Iterable[Dict[str, Any]], key_index: KeyIndex, policy: str,
+                   by_id: Dict[int, Dict[str, Any]], next_id: int,
+                   previous: Optional[Dict[int, Dict[str, Any]]] = None,
+                   ) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]], int]:
+    """Сверяет записи с индексом дубликатов и присваивает id новым.
+
+    Возвращает (новые аккаунты, найдено дубликатов, изменённые на месте
+    существующие аккаунты, следующий свободный id). Индекс обновляется
+    сразу, поэтому повторы внутри одного файла тоже распознаются.
+    В previous (если передан) кладутся копии изменённых аккаунтов до
+    первого изменения — для событий хранилища и undo.
+    """
+    new_accounts: List[Dict[str, Any]] = []
+    updated: List[Dict[str, Any]] = []
+    updated_ids = set()
+    duplicates = 0
+    for record in records:
+        dup_id = key_index.find(record)
+        if dup_id is not None:
+            duplicates += 1
+            existing = by_id.get(dup_id)
+            if existing is not None and policy != POLICY_SKIP:
+                if previous is not None and dup_id not in previous:
+                    previous[dup_id] = dict(existing)
+                key_index.remove(existing)
+                if apply_duplicate_policy(existing, record, policy) and existing["id"] not in updated_ids:
+                    updated_ids.add(existing["id"])
+                    updated.append(existing)
+                key_index.add(existing)
+            continue
+        # Сразу компактная запись: она же попадёт в хранилище и в by_id
+        account = Account(record, id=next_id)
+        next_id += 1
+        key_index.add(account)
+        by_id[account["id"]] = account
+        new_accounts.append(account)
+    return new_accounts, duplicates, updated, next_id
+
+
+def derived_copy(account: Dict[str, Any]) -> Dict[str, Any]:
+    """derive_addresses для пула процессов: принимает и возвращает копию."""
+    account = dict(account)
+    derive_addresses(account)
+    return account
+
+
+def iter_export_rows(accounts: Iterable[Dict[str, Any]], fmt: str) -> Iterator[Any]:
+    if fmt == "csv":
+        for acc in accounts:
+            yield [acc.get(h, "") for h in EXPORT_CSV_HEADERS]
+    else:
+        yield from accounts
@@ -0,0 +1,225 @@
+import heapq
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from expenses_data import TYPE_EXPENSE
+from fx import fx_table
+
+# ──────────────────────────────────────────────────────────────
+#  Распределение операций по аккаунтам и ROI кошельков
+# ──────────────────────────────────────────────────────────────
+# Сумма операции делится между её account_ids поровну или по весам
+# account_weights (список той же длины). Операция проекта без
+# аккаунтов делится между аккаунтами проекта (project["accounts"]);
+# глобальная без аккаунтов в распределение не попадает.
+NO_PROJECT = -1                     # ключ проекта в массивах rebuild
+_PAIR_SHIFT = 32                    # ключ пары: (проект + 1) << 32 | аккаунт — одно int64
+SORT_KEYS = ("roi", "profit", "spent", "earned", "operations")
+
+
+def shares(exp: Dict[str, Any], project_accounts: Optional[Sequence[int]] = None
+           ) -> List[Tuple[int, float]]:
+    """[(id аккаунта, доля)] для операции; сумма долей — 1 (или пусто)."""
+    account_ids = exp.get("account_ids") or []
+    if not account_ids:
+        account_ids = project_accounts or []
+        if not account_ids:
+            return []
+        return [(acc_id, 1.0 / len(account_ids)) for acc_id in account_ids]
+    weights = exp.get("account_weights")
+    if weights and len(weights) == len(account_ids):
+        try:
+            total = float(sum(weights))
+        except TypeError:
+            total = 0.0
+        if total > 0:
+            return [(acc_id, float(w) / total) for acc_id, w in zip(account_ids, weights)]
+    return [(acc_id, 1.0 / len(account_ids)) for acc_id in account_ids]
+
+
+def roi(spent: float, earned: float) -> Optional[float]:
+    """(доходы - расходы) / расходы; None, если расходов нет."""
+    return (earned - spent) / spent if spent > 0 else None
+
+
+class AccountAttribution:
+    """Расходы и доходы (USD) по аккаунтам и по парам (проект, аккаунт).
+
+    Первое чтение собирает всё разом (numpy, как ExpenseAggregates.rebuild
+    для валют); дальше add/remove меняют только корзины аккаунтов одной
+    операции. invalidate() откладывает пересборку до следующего чтения —
+    после смены курсов или аккаунтов проекта, от которых зависят доли
+    операций без своих аккаунтов. Корзина: [расходы, доходы, операций].
+    """
+
+    def __init__(self, expenses: List[Dict[str, Any]], projects: List[Dict[str, Any]]):
+        self._expenses = expenses           # общие списки хранилища, меняются на месте
+        self._projects = projects
+        self.by_account: Dict[int, List[float]] = {}
+        self.by_project: Dict[Optional[int], Dict[int, List[float]]] = {}
+        self.unattributed = [0.0, 0.0, 0]
+        self._fallback_projects: Dict[int, int] = {}    # проект -> операций с долями по его аккаунтам
+        self._accounts_by_project: Dict[int, List[int]] = {}
+        self._built = False
+        self._lock = threading.RLock()
+        self.version = 0
+
+    # ------------------------------------------------------------------
+    def _refresh_projects(self) -> None:
+        self._accounts_by_project = {proj["id"]: list(proj.get("accounts") or []) for proj in self._projects}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built = False
+            self.version += 1
+
+    def ensure_built(self) -> None:
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+
+    def rebuild(self) -> None:
+        """Полный пересчёт: доли раскладываются в плоские массивы и
+        суммируются по группам через np.unique/np.bincount."""
+        with self._lock:
+            expenses = list(self._expenses)
+            amounts = np.nan_to_num(fx_table().to_usd_many(expenses), nan=0.0)
+            self._refresh_projects()
+            project_accounts = self._accounts_by_project
+            accounts: List[int] = []
+            projects: List[int] = []
+            weights: List[float] = []
+            op_index: List[int] = []
+            self.unattributed = [0.0, 0.0, 0]
+            self._fallback_projects = {}
+            for i, exp in enumerate(expenses):
+                project_id = exp.get("project_id")
+                split = shares(exp, project_accounts.get(project_id))
+                if not split:
+                    self.unattributed[0 if exp.get("type") == TYPE_EXPENSE else 1] += float(amounts[i])
+                    self.unattributed[2] += 1
+                    continue
+                if not exp.get("account_ids"):
+                    self._fallback_projects[project_id] = self._fallback_projects.get(project_id, 0) + 1
+                n = len(split)
+                accounts.extend([acc_id for acc_id, _ in split])
+                weights.extend([share for _, share in split])
+                projects.extend([NO_PROJECT if project_id is None else project_id] * n)
+                op_index.extend([i] * n)
+
+            is_expense = np.array([exp.get("type") == TYPE_EXPENSE for exp in expenses], dtype=bool)
+            op_index_arr = np.array(op_index, dtype=np.int64)
+            values = np.array(weights, dtype=np.float64) * amounts[op_index_arr]
+            spent = np.where(is_expense[op_index_arr], values, 0.0)
+            earned = values - spent
+            accounts_arr = np.array(accounts, dtype=np.int64)
+            projects_arr = np.array(projects, dtype=np.int64)
+
+            self.by_account = self._group(accounts_arr, spent, earned)
+            pairs = self._group(((projects_arr + 1) << _PAIR_SHIFT) | accounts_arr, spent, earned)
+            self.by_project = {}
+            mask = (1 << _PAIR_SHIFT) - 1
+            for pair, bucket in pairs.items():
+                project_key = (pair >> _PAIR_SHIFT) - 1
+                project_id = None if project_key == NO_PROJECT else project_key
+                self.by_project.setdefault(project_id, {})[pair & mask] = bucket
+            self._built = True
+            self.version += 1
+
+    @staticmethod
+    def _group(keys: np.ndarray, spent: np.ndarray, earned: np.ndarray) -> Dict[Any, List[float]]:
+        if not len(keys):
+            return {}
+        groups, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        spent_sum = np.bincount(inverse, weights=spent, minlength=len(groups))
+        earned_sum = np.bincount(inverse, weights=earned, minlength=len(groups))
+        return {key: [s, e, c] for key, s, e, c in
+                zip(groups.tolist(), spent_sum.tolist(), earned_sum.tolist(), counts.tolist())}
+
+    # ------------------------------------------------------------------
+    #  Инкрементальные изменения (store.DataStore)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _apply(buckets: Dict[Any, List[float]], key: Any, column: int, amount: float, sign: int) -> None:
+        bucket = buckets.setdefault(key, [0.0, 0.0, 0])
+        bucket[column] += sign * amount
+        bucket[2] += sign
+        if bucket[2] <= 0:
+            del buckets[key]
+
+    def _change(self, exp: Dict[str, Any], sign: int) -> None:
+        with self._lock:
+            if not self._built:
+                return
+            amount = fx_table().to_usd(exp.get("amount", 0) or 0, exp.get("currency"), exp.get("date"))
+            if amount != amount:        # NaN — курса нет, как в ExpenseAggregates
+                amount = 0.0
+            column = 0 if exp.get("type") == TYPE_EXPENSE else 1
+            project_id = exp.get("project_id")
+            split = shares(exp, self._accounts_by_project.get(project_id))
+            if not split:
+                self.unattributed[column] += sign * amount
+                self.unattributed[2] += sign
+            else:
+                if not exp.get("account_ids"):
+                    self._fallback_projects[project_id] = self._fallback_projects.get(project_id, 0) + sign
+                pairs = self.by_project.setdefault(project_id, {})
+                for acc_id, share in split:
+                    self._apply(self.by_account, acc_id, column, amount * share, sign)
+                    self._apply(pairs, acc_id, column, amount * share, sign)
+                if not pairs:
+                    del self.by_project[project_id]
+            self.version += 1
+
+    def add(self, exp: Dict[str, Any]) -> None:
+        self._change(exp, 1)
+
+    def remove(self, exp: Dict[str, Any]) -> None:
+        self._change(exp, -1)
+
+    def project_changed(self, project_ids: Iterable[int]) -> None:
+        """Аккаунты проектов могли измениться: пересборка, если на них есть доли."""
+        with self._lock:
+            old = self._accounts_by_project
+            self._refresh_projects()
+            if any(self._fallback_projects.get(pid) and old.get(pid) != self._accounts_by_project.get(pid)
+                   for pid in project_ids):
+                self.invalidate()
+
+    # ------------------------------------------------------------------
+    #  Чтение
+    # ------------------------------------------------------------------
+    def account(self, account_id: int, project_id: Optional[int] = None) -> Tuple[float, float]:
+        """(расходы, доходы) аккаунта — всего или в одном проекте."""
+        self.ensure_built()
+        buckets = self.by_account if project_id is None else self.by_project.get(project_id, {})
+        bucket = buckets.get(account_id)
+        return (bucket[0], bucket[1]) if bucket else (0.0, 0.0)
+
+    def leaderboard(self, sort: str = "roi", descending: bool = True, limit: Optional[int] = None,
+                    project_id: Optional[int] = None, min_spent: float = 0.0) -> List[Dict[str, Any]]:
+        """Аккаунты по ROI (или прибыли, расходам, доходам, числу операций).
+
+        Аккаунты без расходов (ROI не определён) всегда в конце. С limit
+        берутся верхние через heapq, без сортировки всех 10k строк.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"unknown sort key {sort!r}; expected one of {', '.join(SORT_KEYS)}")
+        self.ensure_built()
+        with self._lock:
+            buckets = self.by_account if project_id is None else self.by_project.get(project_id, {})
+            rows = [{"account_id": acc_id, "spent": b[0], "earned": b[1], "profit": b[1] - b[0],
+                     "roi": roi(b[0], b[1]), "operations": b[2]}
+                    for acc_id, b in buckets.items() if b[0] >= min_spent]
+        sign = 1 if descending else -1
+
+        def key(row: Dict[str, Any]) -> Tuple[bool, float, int]:
+            value = row[sort]
+            return (value is not None, sign * value if value is not None else 0.0, -row["account_id"])
+
+        if limit is not None and limit < len(rows):
+            return heapq.nlargest(limit, rows, key=key)
+        return sorted(rows, key=key, reverse=True)
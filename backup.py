@@ -0,0 +1,275 @@
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ──────────────────────────────────────────────────────────────
+#  Инкрементальные бэкапы каталога данных
+# ──────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+BACKUP_DIR = Path("backups")
+
+# Что входит в снимок (пути относительно data/); трассы профилировщика — нет
+BACKUP_INCLUDE = ("*.json", "images/*")
+BACKUP_EXCLUDE = ("trace_*.json", "*.tmp", "*.part")
+
+# Границы чанков определяются содержимым: строка, после которой чанк
+# набрал CHUNK_MIN байт и crc32 которой делится на CHUNK_DIVISOR. JSON
+# пишется с отступами, поэтому вставка аккаунта меняет один-два чанка,
+# а не весь хвост файла. CHUNK_MAX режет длинные бинарные строки.
+CHUNK_MIN = 16 * 1024
+CHUNK_MAX = 256 * 1024
+CHUNK_DIVISOR = 64
+
+SNAPSHOT_ID_FORMAT = "%Y%m%dT%H%M%S"
+AUTO_BACKUP_INTERVAL = 10 * 60          # секунд между автоматическими снимками
+DEFAULT_RETENTION = {"last": 10, "daily": 7, "weekly": 8}
+
+
+def iter_chunks(f) -> Iterator[bytes]:
+    """Content-defined чанки бинарного файла."""
+    parts: List[bytes] = []
+    size = 0
+    for line in f:
+        while len(line) > CHUNK_MAX - size:
+            cut = CHUNK_MAX - size
+            parts.append(line[:cut])
+            yield b"".join(parts)
+            parts, size, line = [], 0, line[cut:]
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_MIN and zlib.crc32(line) % CHUNK_DIVISOR == 0:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotResult:
+    def __init__(self, snapshot_id: str, files: int, total_bytes: int,
+                 new_chunks: int, new_bytes: int, reused_files: int):
+        self.snapshot_id = snapshot_id
+        self.files = files
+        self.total_bytes = total_bytes
+        self.new_chunks = new_chunks
+        self.new_bytes = new_bytes          # сжатых байт, реально записанных
+        self.reused_files = reused_files    # файлов без изменений (не читались)
+
+    def summary(self) -> str:
+        return (f"{self.snapshot_id}: {self.files} files, {self.total_bytes / 1024:.0f} KB, "
+                f"{self.new_chunks} new chunks ({self.new_bytes / 1024:.0f} KB written), "
+                f"{self.reused_files} unchanged")
+
+
+class BackupStore:
+    """Хранилище снимков: чанки по sha256 + манифест на каждый снимок.
+
+    backups/chunks/ab/abcd… — сжатые zlib чанки, общие для всех снимков;
+    backups/snapshots/<id>.json — список файлов снимка с их чанками.
+    Файл с теми же размером и mtime, что в прошлом снимке, не читается.
+    """
+
+    def __init__(self, root: Path = BACKUP_DIR, source: Path = DATA_DIR):
+        self.root = Path(root)
+        self.source = Path(source)
+        self.chunks_dir = self.root / "chunks"
+        self.snapshots_dir = self.root / "snapshots"
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    #  Чанки и манифесты
+    # ------------------------------------------------------------------
+    def _chunk_path(self, digest: str) -> Path:
+        return self.chunks_dir / digest[:2] / digest
+
+    def _put_chunk(self, data: bytes) -> Tuple[str, int]:
+        """Сохраняет чанк, если его ещё нет; (хеш, записано байт)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if path.exists():
+            return digest, 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        packed = zlib.compress(data, 6)
+        _write_atomic(path, packed)
+        return digest, len(packed)
+
+    def _get_chunk(self, digest: str) -> bytes:
+        data = zlib.decompress(self._chunk_path(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"backup chunk {digest[:12]} is corrupted")
+        return data
+
+    def list_snapshots(self) -> List[str]:
+        if not self.snapshots_dir.exists():
+            return []
+        return sorted(p.stem for p in self.snapshots_dir.glob("*.json"))
+
+    def load_manifest(self, snapshot_id: str) -> Dict[str, Any]:
+        path = self.snapshots_dir / f"{snapshot_id}.json"
+        if not path.exists():
+            raise ValueError(f"no such snapshot: {snapshot_id}")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _source_files(self) -> Iterator[Tuple[str, Path]]:
+        if not self.source.exists():
+            return
+        for path in sorted(self.source.rglob("*")):
+            if not path.is_file():
+                continue
+            rel = path.relative_to(self.source).as_posix()
+            if (any(fnmatch.fnmatchcase(rel, p) for p in BACKUP_INCLUDE)
+                    and not any(fnmatch.fnmatchcase(path.name, p) for p in BACKUP_EXCLUDE)):
+                yield rel, path
+
+    # ------------------------------------------------------------------
+    #  Снимок
+    # ------------------------------------------------------------------
+    def snapshot(self, label: str = "") -> SnapshotResult:
+        with self._lock:
+            return self._snapshot(label)
+
+    def _snapshot(self, label: str) -> SnapshotResult:
+        snapshots = self.list_snapshots()
+        previous = self.load_manifest(snapshots[-1])["files"] if snapshots else {}
+        files: Dict[str, Dict[str, Any]] = {}
+        total = new_chunks = new_bytes = reused = 0
+
+        for rel, path in self._source_files():
+            st = path.stat()
+            old = previous.get(rel)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                files[rel] = old
+                reused += 1
+                total += st.st_size
+                continue
+            whole = hashlib.sha256()
+            chunks = []
+            with open(path, "rb") as f:
+                for data in iter_chunks(f):
+                    whole.update(data)
+                    digest, written = self._put_chunk(data)
+                    chunks.append(digest)
+                    if written:
+                        new_chunks += 1
+                        new_bytes += written
+            files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                          "sha256": whole.hexdigest(), "chunks": chunks}
+            total += st.st_size
+
+        now = datetime.now()
+        while (snapshot_id := now.strftime(SNAPSHOT_ID_FORMAT)) in snapshots:
+            now += timedelta(seconds=1)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {"id": snapshot_id, "created": now.isoformat(timespec="seconds"),
+                    "label": label, "files": files}
+        _write_atomic(self.snapshots_dir / f"{snapshot_id}.json",
+                      json.dumps(manifest, indent=1).encode("utf-8"))
+        return SnapshotResult(snapshot_id, len(files), total, new_chunks, new_bytes, reused)
+
+    def maybe_snapshot(self, min_interval: float = AUTO_BACKUP_INTERVAL,
+                       retention: Optional[Dict[str, int]] = None) -> Optional[SnapshotResult]:
+        """Снимок, если с прошлого прошло не меньше min_interval секунд, и затем prune."""
+        snapshots = self.list_snapshots()
+        if snapshots:
+            last = datetime.strptime(snapshots[-1], SNAPSHOT_ID_FORMAT)
+            if (datetime.now() - last).total_seconds() < min_interval:
+                return None
+        result = self.snapshot("auto")
+        self.prune(retention or DEFAULT_RETENTION)
+        return result
+
+    # ------------------------------------------------------------------
+    #  Восстановление
+    # ------------------------------------------------------------------
+    def restore(self, snapshot_id: str, target: Optional[Path] = None,
+                only: Optional[Iterable[str]] = None) -> List[str]:
+        """Восстанавливает файлы снимка; возвращает перезаписанные пути.
+
+        Файл, совпадающий со снимком по размеру и mtime, не трогается.
+        Каждый файл собирается во временный, сверяется по sha256 и
+        подменяется атомарно. Файлы, которых в снимке нет, не удаляются.
+        """
+        target = Path(target) if target is not None else self.source
+        files = self.load_manifest(snapshot_id)["files"]
+        wanted = set(only) if only else None
+        restored = []
+        for rel, entry in files.items():
+            if wanted is not None and rel not in wanted:
+                continue
+            dest = target / rel
+            if dest.exists():
+                st = dest.stat()
+                if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                    continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(dest.name + ".tmp")
+            whole = hashlib.sha256()
+            with open(tmp, "wb") as f:
+                for digest in entry["chunks"]:
+                    data = self._get_chunk(digest)
+                    whole.update(data)
+                    f.write(data)
+            if whole.hexdigest() != entry["sha256"]:
+                tmp.unlink(missing_ok=True)
+                raise ValueError(f"{rel}: restored content does not match snapshot")
+            os.replace(tmp, dest)
+            os.utime(dest, ns=(time.time_ns(), entry["mtime_ns"]))
+            restored.append(rel)
+        return restored
+
+    # ------------------------------------------------------------------
+    #  Хранение
+    # ------------------------------------------------------------------
+    def prune(self, retention: Dict[str, int] = DEFAULT_RETENTION) -> List[str]:
+        """Удаляет снимки вне правил хранения и неиспользуемые чанки.
+
+        Остаются: last последних, самый свежий за каждый из daily
+        последних дней и за каждую из weekly последних недель.
+        """
+        with self._lock:
+            snapshots = self.list_snapshots()
+            days: Dict[Any, str] = {}
+            weeks: Dict[Any, str] = {}
+            for snapshot_id in snapshots:      # по возрастанию: свежий перезапишет
+                created = datetime.strptime(snapshot_id, SNAPSHOT_ID_FORMAT)
+                days[created.date()] = snapshot_id
+                weeks[created.isocalendar()[:2]] = snapshot_id
+
+            def newest(ids: List[Any], count: int) -> List[Any]:
+                return ids[-count:] if count > 0 else []
+
+            keep = set(newest(snapshots, retention.get("last", 0)))
+            keep.update(days[d] for d in newest(sorted(days), retention.get("daily", 0)))
+            keep.update(weeks[w] for w in newest(sorted(weeks), retention.get("weekly", 0)))
+
+            removed = [s for s in snapshots if s not in keep]
+            for snapshot_id in removed:
+                (self.snapshots_dir / f"{snapshot_id}.json").unlink(missing_ok=True)
+            if removed:
+                self._collect_garbage()
+            return removed
+
+    def _collect_garbage(self) -> int:
+        used = set()
+        for snapshot_id in self.list_snapshots():
+            for entry in self.load_manifest(snapshot_id)["files"].values():
+                used.update(entry["chunks"])
+        removed = 0
+        for path in self.chunks_dir.glob("*/*"):
+            if path.name not in used:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
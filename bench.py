@@ -0,0 +1,306 @@
+"""Бенчмарк построения view, памяти на запись и сохранения аккаунтов против базовой линии.
+
+    python bench.py                      # сравнить с bench_baseline.json
+    python bench.py --rows 2000          # другой объём синтетических данных
+    python bench.py --update-baseline    # принять текущие значения как базовые
+
+bench_baseline.json лежит в репозитории; без него bench.py завершается с кодом 1.
+
+Данные синтетические, всё пишется во временный каталог — data/ не трогается.
+Код возврата 1, если контролов на строку или памяти на view стало больше
+базовой линии с учётом допуска, если выросла память на компактную запись,
+если повторное зашифрованное сохранение трогает неизменённые записи
+или если правка одной операции в долях по кошелькам стоит сопоставимо
+с их полной пересборкой.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+from budgets import VIEW_BUILDERS, check_budget, load_budgets, measure_build
+
+BASELINE_FILE = Path(__file__).resolve().parent / "bench_baseline.json"
+DEFAULT_ROWS = 1000
+CONTROLS_TOLERANCE = 0.05    # допустимый рост контролов на строку
+MEMORY_TOLERANCE = 0.15      # допустимый рост памяти (аллокатор шумит сильнее)
+SAVE_CHANGED_ROWS = 10       # сколько аккаунтов меняется между сохранениями
+
+PROJECT_TYPES = ["testnet", "mainnet", "dex", "social", "gamefi", "other"]
+PROJECT_STATUSES = ["active", "waiting", "completed", "cancelled"]
+
+
+# ──────────────────────────────────────────────────────────────
+#  Синтетические данные
+# ──────────────────────────────────────────────────────────────
+def make_accounts(n: int, rnd: random.Random) -> List[Dict[str, Any]]:
+    accounts = []
+    for i in range(1, n + 1):
+        key = f"{rnd.getrandbits(256):064x}"
+        accounts.append({
+            "id": i,
+            "evm_private_key": "0x" + key, "evm_address": "0x" + key[:40],
+            "sol_private_key": "", "solana_address": "",
+            "sui_private_key": "", "sui_address": "",
+            "aptos_private_key": "", "aptos_address": "",
+            "btc_private_key": "", "btc_address": "",
+            "email": f"user{i}@example.com",
+            "twitter_token": f"tw_{key[:24]}",
+            "discord_token": f"dc_{key[24:48]}",
+        })
+    return accounts
+
+
+def make_projects(n: int, accounts: List[Dict[str, Any]], rnd: random.Random) -> List[Dict[str, Any]]:
+    ids = [acc["id"] for acc in accounts]
+    return [{
+        "id": i,
+        "name": f"Project {i}",
+        "description": "Synthetic project " * 3,
+        "status": rnd.choice(PROJECT_STATUSES),
+        "type": rnd.choice(PROJECT_TYPES),
+        "network": "EVM",
+        "start_date": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "end_date": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "accounts": rnd.sample(ids, min(len(ids), 20)),
+        "image_path": None,
+        "archived": False,
+        "tags": ["airdrop", f"tag{i % 7}"],
+    } for i in range(1, n + 1)]
+
+
+def make_expenses(n: int, projects: List[Dict[str, Any]], rnd: random.Random) -> List[Dict[str, Any]]:
+    from expenses_data import CATEGORIES, TYPE_EXPENSE, TYPE_INCOME
+    return [{
+        "id": i,
+        "date": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "type": TYPE_INCOME if i % 5 == 0 else TYPE_EXPENSE,
+        "project_id": rnd.choice(projects)["id"] if projects and i % 3 else None,
+        "account_ids": [rnd.randint(1, 50) for _ in range(3)],
+        "network": "evm",
+        "category": rnd.choice(CATEGORIES),
+        "amount": round(rnd.uniform(1, 500), 2),
+        "description": f"Operation {i}",
+    } for i in range(1, n + 1)]
+
+
+# ──────────────────────────────────────────────────────────────
+#  Замер
+# ──────────────────────────────────────────────────────────────
+def build_managers(rows: int, seed: int) -> Dict[str, Any]:
+    """Менеджеры без страницы Flet: построение view к page не обращается."""
+    from accounts import AccountsManager
+    from dashboard import DashboardManager
+    from expenses import ExpensesManager
+    from projects import ProjectsManager
+    from store import DataStore
+
+    rnd = random.Random(seed)
+    account_rows = make_accounts(rows, rnd)
+    project_rows = make_projects(max(rows // 10, 1), account_rows, rnd)
+    store = DataStore(account_rows, project_rows, make_expenses(rows, project_rows, rnd))
+
+    noop = lambda view: None
+    accounts = AccountsManager(None, noop, store)
+    projects = ProjectsManager(None, noop, accounts, store)
+    expenses = ExpensesManager(None, noop, accounts, projects, store)
+    projects.set_expenses_manager(expenses)
+    dashboard = DashboardManager(None, accounts, projects, expenses, store)
+    return {"wallets": accounts, "projects": projects, "expenses": expenses, "dashboard": dashboard}
+
+
+def run(rows: int, seed: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    budgets = load_budgets()
+    for view, manager in build_managers(rows, seed).items():
+        method_name, rows_fn = VIEW_BUILDERS[view]
+        build = getattr(manager, method_name)
+        build()   # прогрев: импорты и кеши не должны попадать в замер
+        _, report = measure_build(view, build, rows_fn(manager) if rows_fn else None)
+        results[view] = report.as_dict()
+        print(report.summary())
+        for problem in check_budget(report, budgets.get(view, {})):
+            print(f"  budget: {problem}")
+    return results
+
+
+def _bytes_per_record(build) -> float:
+    tracemalloc.start()
+    try:
+        records = build()
+        return tracemalloc.get_traced_memory()[0] / max(len(records), 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run_records(rows: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """Память на запись: dict после json.loads против records.Account/Operation."""
+    from records import Account, Operation
+
+    rnd = random.Random(seed)
+    accounts = make_accounts(rows, rnd)
+    samples = {
+        "accounts": (json.dumps(accounts), Account),
+        "expenses": (json.dumps(make_expenses(rows * 10, make_projects(max(rows // 10, 1), accounts, rnd), rnd)),
+                     Operation),
+    }
+    results = {}
+    for name, (text, factory) in samples.items():
+        # Из JSON, как при загрузке: строки не разделяются между записями
+        as_dict = _bytes_per_record(lambda: json.loads(text))
+        compact = _bytes_per_record(lambda: [factory(rec) for rec in json.loads(text)])
+        results[name] = {"dict_bytes": round(as_dict), "compact_bytes": round(compact)}
+        print(f"records/{name}: {as_dict:.0f} B/record as dict, {compact:.0f} B/record compact "
+              f"({1 - compact / as_dict:.0%} less)")
+    return results
+
+
+def run_save(rows: int, seed: int) -> Dict[str, Any]:
+    """Полное сохранение зашифрованных аккаунтов, затем повторное после правки нескольких."""
+    from accounts_data import save_accounts
+    from crypto_store import enable_encryption
+
+    rnd = random.Random(seed)
+    accounts = make_accounts(rows, rnd)
+    started = time.perf_counter()
+    cipher = enable_encryption("bench")
+    kdf_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    save_accounts(accounts)
+    full_ms = (time.perf_counter() - started) * 1000
+
+    changed = rnd.sample(accounts, min(SAVE_CHANGED_ROWS, len(accounts)))
+    for acc in changed:
+        acc["email"] = f"changed{acc['id']}@example.com"
+    cipher.encrypted = cipher.reused = 0
+    started = time.perf_counter()
+    save_accounts(accounts)
+    incremental_ms = (time.perf_counter() - started) * 1000
+
+    result = {"rows": rows, "changed": len(changed), "kdf_ms": round(kdf_ms, 1),
+              "full_ms": round(full_ms, 1), "incremental_ms": round(incremental_ms, 1),
+              "encrypted": cipher.encrypted, "reused": cipher.reused}
+    print(f"save: kdf {result['kdf_ms']} ms, full {result['full_ms']} ms, "
+          f"{len(changed)} changed {result['incremental_ms']} ms "
+          f"({cipher.encrypted} encrypted, {cipher.reused} reused)")
+    return result
+
+
+def run_attribution(rows: int, seed: int) -> Dict[str, Any]:
+    """Доли операций по кошелькам: rows*10 аккаунтов, rows*100 операций."""
+    from attribution import AccountAttribution
+
+    rnd = random.Random(seed)
+    n_accounts = rows * 10
+    projects = [{"id": i, "accounts": rnd.sample(range(1, n_accounts + 1), 20)} for i in range(1, rows // 10 + 2)]
+    expenses = make_expenses(rows * 100, projects, rnd)
+    for exp in expenses:
+        exp["account_ids"] = rnd.sample(range(1, n_accounts + 1), rnd.randint(0, 5))
+    attribution = AccountAttribution(expenses, projects)
+
+    started = time.perf_counter()
+    attribution.rebuild()
+    rebuild_ms = (time.perf_counter() - started) * 1000
+
+    changed = rnd.sample(expenses, min(SAVE_CHANGED_ROWS * 10, len(expenses)))
+    started = time.perf_counter()
+    for exp in changed:
+        attribution.remove(exp)
+        attribution.add(exp)
+    incremental_us = (time.perf_counter() - started) * 1e6 / max(len(changed), 1)
+
+    started = time.perf_counter()
+    attribution.leaderboard("roi")
+    sort_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    attribution.leaderboard("roi", limit=20)
+    top_ms = (time.perf_counter() - started) * 1000
+
+    result = {"accounts": n_accounts, "operations": len(expenses), "rebuild_ms": round(rebuild_ms, 1),
+              "incremental_us": round(incremental_us, 1), "sort_ms": round(sort_ms, 1), "top_ms": round(top_ms, 1)}
+    print(f"attribution: {n_accounts} accounts x {len(expenses)} operations, rebuild {result['rebuild_ms']} ms, "
+          f"update {result['incremental_us']} us/op, leaderboard {result['sort_ms']} ms (top-20 {result['top_ms']} ms)")
+    return result
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    regressions = []
+    for view, current in results.items():
+        base = baseline.get(view)
+        if not base:
+            continue
+        if base.get("controls_per_row") and current.get("controls_per_row"):
+            limit = base["controls_per_row"] * (1 + CONTROLS_TOLERANCE)
+            if current["controls_per_row"] > limit:
+                regressions.append(f"{view}: controls/row {current['controls_per_row']} "
+                                   f"> baseline {base['controls_per_row']}")
+        elif current["controls"] > base["controls"] * (1 + CONTROLS_TOLERANCE):
+            regressions.append(f"{view}: controls {current['controls']} > baseline {base['controls']}")
+        if current["memory_mb"] > base["memory_mb"] * (1 + MEMORY_TOLERANCE):
+            regressions.append(f"{view}: memory {current['memory_mb']} MB > baseline {base['memory_mb']} MB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="View build benchmark")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+    baseline_path = args.baseline.resolve()
+    if not args.update_baseline and not baseline_path.exists():
+        # Без базовой линии сравнивать не с чем — это провал, а не молчаливый успех
+        print(f"No baseline at {baseline_path}; run with --update-baseline to record one")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            results = run(args.rows, args.seed)
+            records = run_records(args.rows, args.seed)
+            save = run_save(args.rows, args.seed)
+            attribution = run_attribution(args.rows, args.seed)
+        finally:
+            os.chdir(cwd)
+
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps({"rows": args.rows, "views": results, "records": records, "save": save,
+                                             "attribution": attribution}, indent=4), encoding="utf-8")
+        print(f"Baseline written: {baseline_path}")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    same_rows = baseline.get("rows") == args.rows
+    regressions: List[str] = []
+    if same_rows:
+        regressions += compare(results, baseline.get("views", {}))
+    else:
+        # Шапки и фильтры делятся на другое число строк — контролы на строку тоже несравнимы
+        print(f"Baseline was recorded with --rows {baseline.get('rows')}; views are not compared")
+    for name, current in records.items():
+        base = baseline.get("records", {}).get(name)
+        if base and current["compact_bytes"] > base["compact_bytes"] * (1 + MEMORY_TOLERANCE):
+            regressions.append(f"records/{name}: {current['compact_bytes']} B/record "
+                               f"> baseline {base['compact_bytes']} B/record")
+    if save["encrypted"] > save["changed"]:
+        regressions.append(f"save: {save['encrypted']} records re-encrypted for {save['changed']} changed")
+    # Правка одной операции не должна стоить заметной доли полной пересборки
+    if attribution["incremental_us"] / 1000 > attribution["rebuild_ms"] / 100:
+        regressions.append(f"attribution: update {attribution['incremental_us']} us/op "
+                           f"is close to a full rebuild ({attribution['rebuild_ms']} ms)")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
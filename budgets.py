@@ -0,0 +1,193 @@
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from profiler import iter_controls
+
+# ──────────────────────────────────────────────────────────────
+#  Бюджеты контролов и памяти на view
+# ──────────────────────────────────────────────────────────────
+BUDGETS_ENV = "RETROHUNTER_BUDGETS"     # RETROHUNTER_BUDGETS=1 python main.py
+BUDGETS_FILE = Path("data") / "budgets.json"
+
+# Свои значения задаются в data/budgets.json в том же формате. По умолчанию —
+# замер bench.py (1000 строк: wallets 23.1, projects 40.1, expenses 21.2
+# контролов на строку, 43/7/38 MB) плюс ~30% запаса
+DEFAULT_BUDGETS: Dict[str, Dict[str, float]] = {
+    "wallets":   {"max_controls": 30000, "max_controls_per_row": 30, "max_memory_mb": 64},
+    "projects":  {"max_controls": 15000, "max_controls_per_row": 52, "max_memory_mb": 64},
+    "expenses":  {"max_controls": 28000, "max_controls_per_row": 28, "max_memory_mb": 64},
+    "dashboard": {"max_controls": 500, "max_controls_per_row": 0, "max_memory_mb": 32},
+}
+
+# view -> (метод-построитель менеджера, число строк в view)
+VIEW_BUILDERS: Dict[str, tuple] = {
+    # get_view у Wallets кеширует результат, поэтому меряем именно построение
+    "wallets": ("_build_table", lambda m: len(m._filter_accounts())),
+    "projects": ("get_view", lambda m: sum(1 for p in m.projects if m._matches_filters(p))),
+    "expenses": ("get_view", lambda m: len(m._filtered_expenses())),
+    "dashboard": ("_build_view", None),
+}
+
+TOP_ALLOCATIONS = 5
+
+
+def load_budgets(path: Path = BUDGETS_FILE) -> Dict[str, Dict[str, float]]:
+    budgets = {view: dict(limits) for view, limits in DEFAULT_BUDGETS.items()}
+    if path.exists():
+        try:
+            for view, limits in json.loads(path.read_text(encoding="utf-8")).items():
+                budgets.setdefault(view, {}).update(limits)
+        except (OSError, ValueError) as exc:
+            print(f"[budgets] cannot read {path}: {exc}")
+    return budgets
+
+
+def current_rss() -> Optional[int]:
+    """Резидентная память процесса в байтах (None, если не удалось узнать)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss — пик, а не текущее значение; в Linux в КБ, в macOS в байтах
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class ViewReport:
+    """Результат замера одного построения view."""
+
+    def __init__(self, view: str, rows: Optional[int], by_type: Counter, seconds: float,
+                 allocated: int, peak: int, rss_delta: Optional[int], top: List[str]):
+        self.view = view
+        self.rows = rows
+        self.by_type = by_type
+        self.controls = sum(by_type.values())
+        self.seconds = seconds
+        self.allocated = allocated      # байт, удерживаемых после построения
+        self.peak = peak                # пик tracemalloc во время построения
+        self.rss_delta = rss_delta
+        self.top = top                  # крупнейшие места аллокаций
+
+    @property
+    def controls_per_row(self) -> Optional[float]:
+        if not self.rows:
+            return None
+        return self.controls / self.rows
+
+    @property
+    def memory_mb(self) -> float:
+        return self.allocated / (1 << 20)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "controls": self.controls,
+            "controls_per_row": round(self.controls_per_row, 2) if self.controls_per_row else None,
+            "memory_mb": round(self.memory_mb, 3),
+            "peak_mb": round(self.peak / (1 << 20), 3),
+            "seconds": round(self.seconds, 4),
+            "by_type": dict(self.by_type.most_common()),
+        }
+
+    def summary(self) -> str:
+        per_row = f", {self.controls_per_row:.1f}/row" if self.controls_per_row else ""
+        rss = f", RSS {self.rss_delta / (1 << 20):+.1f} MB" if self.rss_delta is not None else ""
+        return (f"{self.view}: {self.controls} controls{per_row}, "
+                f"{self.memory_mb:.1f} MB retained (peak {self.peak / (1 << 20):.1f} MB){rss}, "
+                f"{self.seconds * 1000:.0f} ms")
+
+
+def measure_build(view: str, build: Callable[[], Any], rows: Optional[int] = None) -> tuple:
+    """Строит view под tracemalloc и считает контролы по типам.
+
+    Возвращает (результат build, ViewReport). Если tracemalloc не был
+    включён, он включается только на время замера.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    rss_before = current_rss()
+    before = tracemalloc.take_snapshot()
+    base, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    rss_after = current_rss()
+    if started_tracing:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, "lineno")
+    top = [str(stat) for stat in stats[:TOP_ALLOCATIONS] if stat.size_diff > 0]
+    by_type = Counter(type(control).__name__ for control in iter_controls(result))
+    report = ViewReport(
+        view, rows, by_type, seconds,
+        allocated=max(current - base, 0),
+        peak=max(peak - base, 0),
+        rss_delta=None if rss_before is None or rss_after is None else rss_after - rss_before,
+        top=top,
+    )
+    return result, report
+
+
+def check_budget(report: ViewReport, budget: Dict[str, float]) -> List[str]:
+    """Список нарушений бюджета (пустой, если всё в пределах)."""
+    problems = []
+    max_controls = budget.get("max_controls")
+    if max_controls and report.controls > max_controls:
+        problems.append(f"{report.controls} controls > {max_controls:g}")
+    max_per_row = budget.get("max_controls_per_row")
+    if max_per_row and report.controls_per_row and report.controls_per_row > max_per_row:
+        problems.append(f"{report.controls_per_row:.1f} controls/row > {max_per_row:g}")
+    max_memory = budget.get("max_memory_mb")
+    if max_memory and report.memory_mb > max_memory:
+        problems.append(f"{report.memory_mb:.1f} MB > {max_memory:g} MB")
+    return problems
+
+
+class BudgetTracker:
+    """Замеряет каждое построение view и предупреждает о превышении бюджета."""
+
+    def __init__(self, budgets: Optional[Dict[str, Dict[str, float]]] = None):
+        self.budgets = budgets if budgets is not None else load_budgets()
+        self.reports: Dict[str, ViewReport] = {}
+        self.on_violation: Optional[Callable[[ViewReport, List[str]], None]] = None
+
+    def instrument(self, view: str, manager: Any) -> None:
+        method_name, rows_fn = VIEW_BUILDERS[view]
+        build = getattr(manager, method_name)
+
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            rows = rows_fn(manager) if rows_fn else None
+            result, report = measure_build(view, lambda: build(*args, **kwargs), rows)
+            self.reports[view] = report
+            problems = check_budget(report, self.budgets.get(view, {}))
+            print(f"[budgets] {report.summary()}")
+            if problems:
+                print(f"[budgets] {view} over budget: {'; '.join(problems)}")
+                for line in report.top:
+                    print(f"[budgets]   {line}")
+                if self.on_violation:
+                    self.on_violation(report, problems)
+            return result
+
+        setattr(manager, method_name, wrapper)
+
+
+def tracker_from_env() -> Optional[BudgetTracker]:
+    return BudgetTracker() if os.environ.get(BUDGETS_ENV) else None
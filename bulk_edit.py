@@ -0,0 +1,71 @@
+import re
+from typing import Any, Dict, Iterable, List
+
+# ──────────────────────────────────────────────────────────────
+#  Массовое редактирование аккаунтов
+# ──────────────────────────────────────────────────────────────
+MODE_CONSTANT = "constant"      # одно значение для всех
+MODE_LINES = "lines"            # N строк для N выбранных, по возрастанию id
+MODE_TEMPLATE = "template"      # шаблон с подстановками {id}, {index}, {email}…
+BULK_MODES = [MODE_CONSTANT, MODE_LINES, MODE_TEMPLATE]
+
+EDITABLE_FIELDS = ["email", "twitter_token", "discord_token"]
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def render_template(template: str, record: Dict[str, Any], index: int) -> str:
+    """Подставляет поля записи и {index} (1…N); неизвестные имена не трогает."""
+    def sub(match: "re.Match[str]") -> str:
+        name = match.group(1)
+        if name == "index":
+            return str(index)
+        if name in record:
+            value = record[name]
+            return "" if value is None else str(value)
+        return match.group(0)
+    return _PLACEHOLDER_RE.sub(sub, template)
+
+
+class BulkEdit:
+    """Подготовленное изменение: новые значения по id (откат — через историю хранилища)."""
+
+    def __init__(self, field: str, changes: Dict[int, Dict[str, Any]]):
+        self.field = field
+        self.changes = changes
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+
+def plan_bulk_edit(collection, ids: Iterable[int], field: str, value: str, mode: str) -> BulkEdit:
+    """Считает изменения только по выбранным id, ничего не меняя.
+
+    Ошибка (например, число строк не совпадает с числом выбранных)
+    поднимает ValueError до того, как тронута хоть одна запись.
+    """
+    if field not in EDITABLE_FIELDS:
+        raise ValueError(f"field {field!r} cannot be bulk-edited")
+    records = [rec for rec in (collection.get(i) for i in sorted(ids)) if rec is not None]
+    if mode == MODE_LINES:
+        values = value.splitlines()
+        while values and not values[-1].strip():
+            values.pop()
+        if len(values) != len(records):
+            raise ValueError(f"{len(values)} lines for {len(records)} selected wallets")
+        values = [v.strip() for v in values]
+    elif mode == MODE_TEMPLATE:
+        values = [render_template(value, rec, i) for i, rec in enumerate(records, 1)]
+    elif mode == MODE_CONSTANT:
+        values = [value] * len(records)
+    else:
+        raise ValueError(f"unknown bulk edit mode {mode!r}")
+
+    changes = {rec["id"]: {field: new_value}
+               for rec, new_value in zip(records, values) if rec.get(field, "") != new_value}
+    return BulkEdit(field, changes)
+
+
+def apply_bulk_edit(collection, edit: BulkEdit) -> List[Dict[str, Any]]:
+    """Применяет всё изменение одним вызовом update_many — одно событие, одна запись на диск."""
+    return collection.update_many(edit.changes)
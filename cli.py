@@ -0,0 +1,496 @@
+"""Пакетные операции без GUI (flet не импортируется).
+
+    python cli.py import wallets.txt --policy merge --workers 8
+    python cli.py export wallets --format csv --gzip -o wallets.csv
+    python cli.py export operations --from 2025-01-01 --format json > ops.json
+    python cli.py derive --workers 8
+    python cli.py totals --by month
+    python cli.py backup create | list | restore 20250101T120000 | prune
+    python cli.py encrypt            # зашифровать секреты accounts.json паролем
+    python cli.py fx import rates.csv   # курсы к USD: date,currency,rate
+    python cli.py recurring run | list | upcoming --to 2025-12-31
+    python cli.py roi --sort profit --limit 20 [--project 3]
+
+Если accounts.json зашифрован, пароль берётся из RETROHUNTER_PASSWORD
+или спрашивается в терминале.
+
+Все пути данных — относительно текущего каталога (data/*.json), как у main.py.
+Сводка и ошибки пишутся в stderr, данные — в stdout или в файл.
+"""
+import argparse
+import csv
+import datetime
+import getpass
+import gzip
+import io
+import json
+import os
+import sys
+from contextlib import contextmanager
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from accounts_data import (
+    EXPORT_CSV_HEADERS as ACCOUNT_CSV_HEADERS, IMPORT_BATCH_SIZE,
+    derived_copy, ingest_records, iter_export_rows as iter_account_rows,
+    iter_import_file, key_fields, load_accounts, parse_import_line, save_accounts,
+)
+from attribution import SORT_KEYS as ROI_SORT_KEYS, AccountAttribution
+from backup import DEFAULT_RETENTION, BackupStore
+from crypto_store import (
+    PASSWORD_ENV, disable_encryption, enable_encryption, encryption_enabled, session_cipher, unlock,
+)
+from expenses_data import (
+    EXPORT_CSV_HEADERS as OPERATION_CSV_HEADERS,
+    filter_expenses, iter_export_rows as iter_operation_rows, load_expenses, manifest_totals, monthly_totals,
+    save_expenses, shards_for_project, totals_by,
+)
+from fx import FX_FILE, import_rates_csv, reload_fx_table
+from export_jobs import ExportJob, STATUS_DONE, export_path, project_name_lookup
+from key_index import DUPLICATE_POLICIES, POLICY_SKIP, KeyIndex
+from networks import NETWORKS, NETWORKS_BY_ID
+from projects_data import load_projects
+from recurring import load_recurring, materialize_due, occurrences, save_recurring
+
+DERIVE_CHUNK_SIZE = 64   # аккаунтов на одну задачу пула
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def ensure_unlocked() -> None:
+    """Ключ сессии для зашифрованного accounts.json (KDF — один раз за запуск)."""
+    if not encryption_enabled() or session_cipher() is not None:
+        return
+    unlock(os.environ.get(PASSWORD_ENV) or getpass.getpass("Accounts password: "))
+
+
+# ──────────────────────────────────────────────────────────────
+#  Вывод адресов в пуле процессов
+# ──────────────────────────────────────────────────────────────
+@contextmanager
+def derive_mapper(workers: int):
+    """map-функция для derived_copy: пул процессов при workers > 1, иначе обычный map.
+
+    imap сохраняет порядок и читает вход лениво, поэтому большой файл
+    импорта не загружается в память целиком.
+    """
+    if workers <= 1:
+        yield lambda items: map(derived_copy, items)
+        return
+    with Pool(workers) as pool:
+        yield lambda items: pool.imap(derived_copy, items, DERIVE_CHUNK_SIZE)
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ──────────────────────────────────────────────────────────────
+#  Команды
+# ──────────────────────────────────────────────────────────────
+def cmd_import(args: argparse.Namespace) -> int:
+    ensure_unlocked()
+    accounts = load_accounts()
+    key_index = KeyIndex(key_fields())
+    key_index.rebuild(accounts)
+    by_id = {acc["id"]: acc for acc in accounts}
+    next_id = max(by_id, default=0) + 1
+    errors = 0
+
+    def records() -> Iterator[Dict[str, Any]]:
+        nonlocal errors
+        for line_num, line, _ in iter_import_file(args.file):
+            try:
+                record = parse_import_line(line)
+            except ValueError as exc:
+                errors += 1
+                log(f"line {line_num}: {exc}")
+                continue
+            if record is not None:
+                yield record
+
+    added = duplicates = updated = 0
+    with derive_mapper(args.workers) as derive:
+        for batch in batched(derive(records()), IMPORT_BATCH_SIZE):
+            new, dups, upd, next_id = ingest_records(batch, key_index, args.policy, by_id, next_id)
+            accounts.extend(new)
+            added += len(new)
+            duplicates += dups
+            updated += len(upd)
+
+    if added or updated:
+        save_accounts(accounts)
+    log(f"Imported {added}, duplicates {duplicates} (updated {updated}), errors {errors}")
+    return 1 if errors and not added and not updated else 0
+
+
+def cmd_derive(args: argparse.Namespace) -> int:
+    ensure_unlocked()
+    accounts = load_accounts(derive=False)
+    nets = [NETWORKS_BY_ID[args.network]] if args.network else NETWORKS
+
+    def pending(acc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [net for net in nets
+                if acc.get(net["field"]) and (args.force or not acc.get(net["address_field"]))]
+
+    todo = [i for i, acc in enumerate(accounts) if pending(acc)]
+    if not todo:
+        log("Nothing to derive")
+        return 0
+    changed = 0
+    with derive_mapper(args.workers) as derive:
+        for i, derived in zip(todo, derive(accounts[i] for i in todo)):
+            acc = accounts[i]
+            for net in pending(acc):
+                field = net["address_field"]
+                if acc.get(field) != derived[field]:
+                    acc[field] = derived[field]
+                    changed += 1
+    if changed:
+        save_accounts(accounts)
+    log(f"Derived {changed} addresses for {len(todo)} accounts")
+    return 0
+
+
+def _filtered_operations(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    # С --project читаются только шард проекта и global
+    shards = shards_for_project(int(args.project)) if args.project else None
+    return filter_expenses(
+        load_expenses(shards),
+        project_filter=args.project or "all",
+        account_filter=args.account or "all",
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
+
+
+@contextmanager
+def stdout_stream(compress: bool):
+    """Текстовый поток в stdout, при compress — через gzip."""
+    if compress:
+        with gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") as raw:
+            stream = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            yield stream
+            stream.flush()
+            stream.detach()
+    else:
+        sys.stdout.reconfigure(newline="")
+        yield sys.stdout
+        sys.stdout.flush()
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    if args.what == "wallets":
+        ensure_unlocked()
+        rows: List[Dict[str, Any]] = load_accounts()
+        if args.ids:
+            wanted = {int(x) for x in args.ids.split(",") if x.strip()}
+            rows = [acc for acc in rows if acc["id"] in wanted]
+        source = iter_account_rows(rows, args.format)
+        headers = ACCOUNT_CSV_HEADERS
+    else:
+        rows = _filtered_operations(args)
+        source = iter_operation_rows(rows, args.format, project_name_lookup(load_projects()))
+        headers = OPERATION_CSV_HEADERS
+
+    to_stdout = not args.output or args.output == "-"
+    job = ExportJob(
+        Path("-") if to_stdout else export_path(Path(args.output), args.format, args.gzip),
+        args.format,
+        source,
+        total=len(rows),
+        headers=headers if args.format == "csv" else None,
+        compress=args.gzip,
+    )
+    if to_stdout:
+        with stdout_stream(args.gzip) as f:
+            job.write(f)
+    else:
+        # В файл — как из GUI: через .part и атомарную подмену
+        job.run()
+        if job.status != STATUS_DONE:
+            log(f"Export failed: {job.error}")
+            return 1
+        log(f"Saved {job.path}")
+    log(f"Exported {job.written} rows")
+    return 0
+
+
+def cmd_totals(args: argparse.Namespace) -> int:
+    unfiltered = not (args.project or args.account or args.date_from or args.date_to)
+    if args.by == "project" and unfiltered:
+        # Итоги по проектам без фильтров — из манифеста шардов, операции не читаются
+        project_name = project_name_lookup(load_projects())
+        totals = {project_name(project_id): t for project_id, t in manifest_totals().items()}
+    elif not args.account:
+        # Без фильтра по аккаунту — по бинарному журналу (ledger.py), без разбора JSON
+        from ledger import open_ledger
+        ledger = open_ledger()
+        rows = ledger.select(args.date_from, args.date_to, int(args.project) if args.project else None)
+        if args.by == "month":
+            totals = ledger.by_month(rows)
+        elif args.by == "category":
+            totals = ledger.by_category(rows)
+        else:
+            project_name = project_name_lookup(load_projects())
+            totals = {project_name(project_id): t for project_id, t in ledger.by_project(rows).items()}
+    elif args.by == "month":
+        totals = monthly_totals(_filtered_operations(args))
+    elif args.by == "category":
+        totals = totals_by(_filtered_operations(args), lambda exp: exp.get("category") or "Other")
+    else:
+        project_name = project_name_lookup(load_projects())
+        totals = totals_by(_filtered_operations(args), lambda exp: project_name(exp.get("project_id")))
+    rows = [
+        {args.by: group, "expenses": round(t["expenses"], 2), "incomes": round(t["incomes"], 2),
+         "balance": round(t["incomes"] - t["expenses"], 2)}
+        for group, t in sorted(totals.items())
+    ]
+    if args.format == "json":
+        json.dump(rows, sys.stdout, indent=4, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        writer = csv.DictWriter(sys.stdout, fieldnames=[args.by, "expenses", "incomes", "balance"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return 0
+
+
+def cmd_roi(args: argparse.Namespace) -> int:
+    attribution = AccountAttribution(load_expenses(), load_projects())
+    board = attribution.leaderboard(args.sort, descending=not args.asc, limit=args.limit,
+                                    project_id=int(args.project) if args.project else None,
+                                    min_spent=args.min_spent)
+    rows = [
+        {"account_id": row["account_id"], "spent": round(row["spent"], 2), "earned": round(row["earned"], 2),
+         "profit": round(row["profit"], 2), "roi": None if row["roi"] is None else round(row["roi"], 4),
+         "operations": row["operations"]}
+        for row in board
+    ]
+    if args.format == "json":
+        json.dump(rows, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    else:
+        writer = csv.DictWriter(sys.stdout, fieldnames=["account_id", "spent", "earned", "profit", "roi", "operations"])
+        writer.writeheader()
+        writer.writerows(rows)
+    spent, earned, count = attribution.unattributed
+    if count:
+        log(f"{count} operations without accounts are not attributed "
+            f"(expenses {spent:.2f}, incomes {earned:.2f} USD)")
+    return 0
+
+
+def cmd_encrypt(args: argparse.Namespace) -> int:
+    if args.disable:
+        if not encryption_enabled():
+            log("accounts.json is not encrypted")
+            return 1
+        ensure_unlocked()
+        accounts = load_accounts()
+        # Сначала открытый файл, потом keystore: при сбое между ними
+        # остаётся расшифрованный accounts.json, а не запечатанный без соли
+        save_accounts(accounts, encrypt=False)
+        disable_encryption()
+        log(f"Decrypted {len(accounts)} accounts")
+        return 0
+    if encryption_enabled():
+        log("accounts.json is already encrypted")
+        return 1
+    password = os.environ.get(PASSWORD_ENV)
+    if not password:
+        password = getpass.getpass("New password: ")
+        if password != getpass.getpass("Repeat password: "):
+            log("Passwords do not match")
+            return 1
+    if not password:
+        log("Empty password")
+        return 1
+    accounts = load_accounts()
+    enable_encryption(password)
+    save_accounts(accounts)
+    log(f"Encrypted {len(accounts)} accounts")
+    return 0
+
+
+def cmd_fx(args: argparse.Namespace) -> int:
+    if args.action == "import":
+        if not args.file:
+            log("fx import: CSV file required")
+            return 1
+        imported, errors = import_rates_csv(Path(args.file))
+        log(f"Imported {imported} rates into {FX_FILE}, errors: {errors}")
+        # Итоги в манифесте шардов и журнал считаются в USD — пересчитываем
+        table = reload_fx_table()
+        save_expenses(load_expenses())
+        log(f"Currencies: {', '.join(table.currencies()) or 'none'}")
+        return 0 if imported or not errors else 1
+    table = reload_fx_table()
+    for currency in table.currencies():
+        points = table.points(currency)
+        print(f"{currency}\t{len(points)} rates\t{points[0][0]} .. {points[-1][0]}\tlast {points[-1][1]:g}")
+    return 0
+
+
+def cmd_recurring(args: argparse.Namespace) -> int:
+    templates = load_recurring()
+    if args.action == "list":
+        for t in templates:
+            print(f"{t['id']}\t{t['interval']}\t{t['start']} .. {t.get('end') or '-'}\t"
+                  f"{t.get('amount')} {t.get('currency') or 'USD'}\t{t.get('category')}\t"
+                  f"done to {t.get('materialized_to') or '-'}")
+        return 0
+    if args.action == "upcoming":
+        # Прогноз: повторения окна вычисляются на лету и никуда не пишутся
+        today = datetime.date.today()
+        date_from = args.date_from or today.isoformat()
+        date_to = args.date_to or (today + datetime.timedelta(days=30)).isoformat()
+        project_name = project_name_lookup(load_projects())
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["date", "type", "amount", "currency", "category", "project", "template"])
+        for op in occurrences(templates, date_from, date_to):
+            writer.writerow([op["date"], op["type"], op["amount"], op.get("currency") or "USD",
+                             op["category"], project_name(op.get("project_id")), op["recurring_id"]])
+        return 0
+    # run — то же, что при запуске GUI: дописать наступившие повторения
+    expenses = load_expenses()
+    next_id = max((exp["id"] for exp in expenses), default=0) + 1
+    ops, changes = materialize_due(templates, expenses, next_id)
+    if ops:
+        save_expenses(expenses + ops)
+    for t in templates:
+        t.update(changes.get(t["id"], {}))
+    if changes:
+        save_recurring(templates)
+    log(f"Added {len(ops)} operations from {len(changes)} recurring templates")
+    return 0
+
+
+def cmd_backup(args: argparse.Namespace) -> int:
+    store = BackupStore()
+    if args.action == "create":
+        log(store.snapshot(args.label or "manual").summary())
+    elif args.action == "list":
+        for snapshot_id in store.list_snapshots():
+            manifest = store.load_manifest(snapshot_id)
+            size = sum(entry["size"] for entry in manifest["files"].values())
+            print(f"{snapshot_id}\t{len(manifest['files'])} files\t{size / 1024:.0f} KB\t{manifest.get('label', '')}")
+    elif args.action == "restore":
+        snapshots = store.list_snapshots()
+        snapshot_id = args.snapshot or (snapshots[-1] if snapshots else None)
+        if snapshot_id is None:
+            log("No snapshots")
+            return 1
+        restored = store.restore(snapshot_id, target=args.target, only=args.file)
+        log(f"Restored {len(restored)} files from {snapshot_id}: {', '.join(restored) or 'nothing changed'}")
+    else:
+        retention = {"last": args.keep_last, "daily": args.keep_daily, "weekly": args.keep_weekly}
+        removed = store.prune(retention)
+        log(f"Removed {len(removed)} snapshots")
+    return 0
+
+
+# ──────────────────────────────────────────────────────────────
+#  Аргументы
+# ──────────────────────────────────────────────────────────────
+def _add_operation_filters(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--project", help="id проекта (глобальные операции тоже попадают)")
+    parser.add_argument("--account", help="id аккаунта")
+    parser.add_argument("--from", dest="date_from", help="с даты YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="по дату YYYY-MM-DD")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Retrohunter batch operations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    workers = max(1, (os.cpu_count() or 1) - 1)
+
+    p = sub.add_parser("import", help="импорт кошельков из текстового файла (формат как в GUI)")
+    p.add_argument("file")
+    p.add_argument("--policy", choices=DUPLICATE_POLICIES, default=POLICY_SKIP)
+    p.add_argument("--workers", type=int, default=workers, help="процессов для вывода адресов")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("derive", help="вычислить адреса по приватным ключам")
+    p.add_argument("--network", choices=[net["id"] for net in NETWORKS])
+    p.add_argument("--force", action="store_true", help="пересчитать и заполненные адреса")
+    p.add_argument("--workers", type=int, default=workers)
+    p.set_defaults(func=cmd_derive)
+
+    p = sub.add_parser("export", help="экспорт кошельков или операций")
+    p.add_argument("what", choices=["wallets", "operations"])
+    p.add_argument("--format", choices=["csv", "json"], default="csv")
+    p.add_argument("--gzip", action="store_true")
+    p.add_argument("-o", "--output", help="файл; '-' или без параметра — stdout")
+    p.add_argument("--ids", help="только эти id кошельков, через запятую")
+    _add_operation_filters(p)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("totals", help="итоги операций")
+    p.add_argument("--by", choices=["month", "category", "project"], default="month")
+    p.add_argument("--format", choices=["csv", "json"], default="csv")
+    _add_operation_filters(p)
+    p.set_defaults(func=cmd_totals)
+
+    p = sub.add_parser("roi", help="расходы, доходы и ROI по кошелькам")
+    p.add_argument("--sort", choices=ROI_SORT_KEYS, default="roi")
+    p.add_argument("--asc", action="store_true", help="по возрастанию")
+    p.add_argument("--limit", type=int, help="только первые N")
+    p.add_argument("--project", help="id проекта — доли только его операций")
+    p.add_argument("--min-spent", type=float, default=0.0, help="не показывать аккаунты с меньшими расходами")
+    p.add_argument("--format", choices=["csv", "json"], default="csv")
+    p.set_defaults(func=cmd_roi)
+
+    p = sub.add_parser("encrypt", help="зашифровать секреты accounts.json (или --disable)")
+    p.add_argument("--disable", action="store_true", help="расшифровать обратно в открытый вид")
+    p.set_defaults(func=cmd_encrypt)
+
+    p = sub.add_parser("fx", help="курсы валют к USD для итогов")
+    p.add_argument("action", choices=["import", "list"])
+    p.add_argument("file", nargs="?", help="CSV с колонками date, currency, rate для import")
+    p.set_defaults(func=cmd_fx)
+
+    p = sub.add_parser("recurring", help="повторяющиеся операции")
+    p.add_argument("action", choices=["run", "list", "upcoming"])
+    p.add_argument("--from", dest="date_from", help="upcoming: с даты (по умолчанию сегодня)")
+    p.add_argument("--to", dest="date_to", help="upcoming: по дату (по умолчанию +30 дней)")
+    p.set_defaults(func=cmd_recurring)
+
+    p = sub.add_parser("backup", help="инкрементальные снимки каталога data/")
+    p.add_argument("action", choices=["create", "list", "restore", "prune"])
+    p.add_argument("snapshot", nargs="?", help="id снимка для restore (по умолчанию последний)")
+    p.add_argument("--label", help="подпись снимка для create")
+    p.add_argument("--target", type=Path, help="куда восстановить (по умолчанию data/)")
+    p.add_argument("--file", action="append", help="восстановить только этот файл (можно несколько)")
+    p.add_argument("--keep-last", type=int, default=DEFAULT_RETENTION["last"])
+    p.add_argument("--keep-daily", type=int, default=DEFAULT_RETENTION["daily"])
+    p.add_argument("--keep-weekly", type=int, default=DEFAULT_RETENTION["weekly"])
+    p.set_defaults(func=cmd_backup)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # `cli.py export ... | head` — читатель закрыл поток раньше времени
+        sys.stderr.close()
+        return 0
+    except (OSError, ValueError) as exc:
+        log(f"error: {exc}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import base64
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from nacl import pwhash, secret, utils
+from nacl.exceptions import CryptoError
+
+from networks import NETWORKS
+
+# ──────────────────────────────────────────────────────────────
+#  Шифрование секретов аккаунтов на диске
+# ──────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+KEYSTORE_FILE = DATA_DIR / "keystore.json"
+PASSWORD_ENV = "RETROHUNTER_PASSWORD"       # пароль без диалога (cli, автозапуск)
+
+SEALED_FIELD = "sealed"
+# Приватные ключи и учётные данные; id и адреса остаются открытыми
+SECRET_FIELDS = tuple(net["field"] for net in NETWORKS) + ("email", "twitter_token", "discord_token")
+
+# scrypt «moderate»: ~128 MiB и доли секунды — один раз за сессию
+KDF_OPSLIMIT = pwhash.scrypt.OPSLIMIT_MODERATE
+KDF_MEMLIMIT = pwhash.scrypt.MEMLIMIT_MODERATE
+_CHECK_PLAINTEXT = b"retrohunter-keystore"
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text.encode("ascii"))
+
+
+def _derive_key(password: str, salt: bytes, opslimit: int, memlimit: int) -> bytes:
+    return pwhash.scrypt.kdf(secret.SecretBox.KEY_SIZE, password.encode("utf-8"), salt,
+                             opslimit=opslimit, memlimit=memlimit)
+
+
+class RecordCipher:
+    """Шифрует секретные поля каждой записи отдельно (XSalsa20-Poly1305).
+
+    Запечатанный блок кешируется вместе с открытыми значениями: при
+    сохранении шифруются только записи, секреты которых изменились с
+    прошлой загрузки/записи, остальные блоки переиспользуются как есть
+    (заодно байты файла не меняются и бэкап их дедуплицирует).
+    """
+
+    def __init__(self, key: bytes):
+        self._box = secret.SecretBox(key)
+        self._cache: Dict[int, Tuple[Tuple[str, ...], str]] = {}
+        self._lock = threading.Lock()
+        self.encrypted = 0      # счётчики для bench.py
+        self.reused = 0
+
+    @staticmethod
+    def _secrets(record: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(record.get(field) or "" for field in SECRET_FIELDS)
+
+    def seal(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Запись в том виде, в каком она пишется на диск."""
+        values = self._secrets(record)
+        with self._lock:
+            cached = self._cache.get(record["id"])
+            if cached is not None and cached[0] == values:
+                blob = cached[1]
+                self.reused += 1
+            else:
+                # id внутри блока: блок нельзя незаметно переставить в чужую запись
+                payload = json.dumps([record["id"], values], ensure_ascii=False).encode("utf-8")
+                blob = _b64(bytes(self._box.encrypt(payload)))
+                self._cache[record["id"]] = (values, blob)
+                self.encrypted += 1
+        stored = {k: v for k, v in record.items() if k not in SECRET_FIELDS}
+        stored[SEALED_FIELD] = blob
+        return stored
+
+    def open(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        blob = stored[SEALED_FIELD]
+        try:
+            record_id, values = json.loads(self._box.decrypt(_unb64(blob)).decode("utf-8"))
+        except (CryptoError, ValueError) as exc:
+            raise ValueError(f"account #{stored.get('id')}: cannot decrypt ({exc})") from None
+        if record_id != stored.get("id"):
+            raise ValueError(f"account #{stored.get('id')}: sealed block belongs to #{record_id}")
+        values = tuple(values)
+        with self._lock:
+            self._cache[record_id] = (values, blob)
+        record = {k: v for k, v in stored.items() if k != SEALED_FIELD}
+        record.update(zip(SECRET_FIELDS, values))
+        return record
+
+    def forget(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Ключ сессии
+# ──────────────────────────────────────────────────────────────
+_session: Optional[RecordCipher] = None
+
+
+def encryption_enabled() -> bool:
+    return KEYSTORE_FILE.exists()
+
+
+def session_cipher() -> Optional[RecordCipher]:
+    return _session
+
+
+def unlock(password: str) -> RecordCipher:
+    """Выводит ключ из пароля (один раз) и делает его ключом сессии."""
+    global _session
+    meta = json.loads(KEYSTORE_FILE.read_text(encoding="utf-8"))
+    key = _derive_key(password, _unb64(meta["salt"]), meta["opslimit"], meta["memlimit"])
+    try:
+        if secret.SecretBox(key).decrypt(_unb64(meta["check"])) != _CHECK_PLAINTEXT:
+            raise CryptoError("check mismatch")
+    except CryptoError:
+        raise ValueError("wrong password") from None
+    _session = RecordCipher(key)
+    return _session
+
+
+def unlock_from_env() -> Optional[RecordCipher]:
+    password = os.environ.get(PASSWORD_ENV)
+    return unlock(password) if password and encryption_enabled() else None
+
+
+def enable_encryption(password: str) -> RecordCipher:
+    """Создаёт keystore.json с новой солью; аккаунты затем нужно пересохранить."""
+    global _session
+    DATA_DIR.mkdir(exist_ok=True)
+    salt = utils.random(pwhash.scrypt.SALTBYTES)
+    key = _derive_key(password, salt, KDF_OPSLIMIT, KDF_MEMLIMIT)
+    meta = {
+        "version": 1,
+        "kdf": "scrypt",
+        "salt": _b64(salt),
+        "opslimit": KDF_OPSLIMIT,
+        "memlimit": KDF_MEMLIMIT,
+        "check": _b64(bytes(secret.SecretBox(key).encrypt(_CHECK_PLAINTEXT))),
+    }
+    tmp = KEYSTORE_FILE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, indent=4), encoding="utf-8")
+    os.replace(tmp, KEYSTORE_FILE)
+    _session = RecordCipher(key)
+    return _session
+
+
+def disable_encryption() -> None:
+    """Удаляет keystore.json; аккаунты перед этим нужно пересохранить открытыми."""
+    global _session
+    KEYSTORE_FILE.unlink(missing_ok=True)
+    _session = None
@@ -4,15 +4,28 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import io
 import base64
-from collections import defaultdict
+from typing import Optional, Tuple
 import numpy as np
+from store import ChangeEvent, DataStore
+
+TOP_WALLETS = 5     # строк в карточке ROI
 
 class DashboardManager:
-    def __init__(self, page: ft.Page, accounts_manager, projects_manager, expenses_manager):
+    def __init__(self, page: ft.Page, accounts_manager, projects_manager, expenses_manager,
+                 store: Optional[DataStore] = None):
         self.page = page
         self.accounts_manager = accounts_manager
         self.projects_manager = projects_manager
         self.expenses_manager = expenses_manager
+        self.store = store if store is not None else accounts_manager.store
+
+        # View собирается заново только после изменений в хранилище,
+        # графики — только после изменения итогов операций
+        self._cached_view: Optional[ft.Container] = None
+        self._charts: Optional[Tuple[str, Optional[str]]] = None
+        self._charts_version: Optional[int] = None
+        for collection in (self.store.accounts, self.store.projects, self.store.expenses):
+            collection.subscribe(self._on_store_changed)
 
     @staticmethod
     def _bytesio_to_data_url(buf: io.BytesIO, mime: str = "image/png") -> str:
@@ -20,36 +33,22 @@ class DashboardManager:
         b64 = base64.b64encode(raw).decode("utf-8")
         return f"data:{mime};base64,{b64}"
 
-    def get_view(self) -> ft.Container:
-        total_accounts = len(self.accounts_manager.accounts)
-        total_projects = len(self.projects_manager.projects)
-
-        expenses = []
-        incomes = []
-        for exp in self.expenses_manager.expenses:
-            amount = exp.get("amount", 0)
-            if exp.get("type") == "expense":
-                expenses.append(amount)
-            else:
-                incomes.append(amount)
-        total_expenses = sum(expenses)
-        total_incomes = sum(incomes)
-        balance = total_incomes - total_expenses
+    def _on_store_changed(self, event: ChangeEvent) -> None:
+        self._cached_view = None
+
+    def invalidate(self) -> None:
+        """Сбросить кеш вида (итоги пересчитаны без изменения данных)."""
+        self._cached_view = None
 
-        monthly_data = defaultdict(lambda: {"expenses": 0, "incomes": 0})
-        for exp in self.expenses_manager.expenses:
-            date_str = exp.get("date", "")
-            if date_str and len(date_str) >= 7:
-                year_month = date_str[:7]
-                amount = exp.get("amount", 0)
-                if exp.get("type") == "expense":
-                    monthly_data[year_month]["expenses"] += amount
-                else:
-                    monthly_data[year_month]["incomes"] += amount
-
-        months = sorted(monthly_data.keys())
-        expenses_by_month = [monthly_data[m]["expenses"] for m in months]
-        incomes_by_month = [monthly_data[m]["incomes"] for m in months]
+    def _render_charts(self) -> Tuple[str, Optional[str]]:
+        """PNG-графики из итогов хранилища; перерисовываются только при их изменении."""
+        totals = self.store.expense_totals
+        if self._charts is not None and self._charts_version == totals.version:
+            return self._charts
+
+        months = sorted(totals.by_month)
+        expenses_by_month = [totals.by_month[m][0] for m in months]
+        incomes_by_month = [totals.by_month[m][1] for m in months]
 
         fig1, ax1 = plt.subplots(figsize=(8, 4))
         x = np.arange(len(months))
@@ -71,11 +70,7 @@ class DashboardManager:
 
         img1_src = self._bytesio_to_data_url(buf1)
 
-        category_expenses = defaultdict(float)
-        for exp in self.expenses_manager.expenses:
-            if exp.get("type") == "expense":
-                cat = exp.get("category", "Other")
-                category_expenses[cat] += exp.get("amount", 0)
+        category_expenses = {cat: bucket[0] for cat, bucket in totals.by_category.items()}
 
         if category_expenses:
             fig2, ax2 = plt.subplots(figsize=(6, 6))
@@ -95,6 +90,23 @@ class DashboardManager:
         else:
             img2_src = None
 
+        self._charts = (img1_src, img2_src)
+        self._charts_version = totals.version
+        return self._charts
+
+    def get_view(self) -> ft.Container:
+        if self._cached_view is None:
+            self._cached_view = self._build_view()
+        return self._cached_view
+
+    def _build_view(self) -> ft.Container:
+        total_accounts = len(self.store.accounts)
+        total_projects = len(self.store.projects)
+        total_expenses, total_incomes, _ = self.store.expense_totals.totals
+        balance = total_incomes - total_expenses
+
+        img1_src, img2_src = self._render_charts()
+
         stats_row = ft.Row([
             ft.Container(
                 content=ft.Column([
@@ -182,6 +194,26 @@ class DashboardManager:
 
         charts_row = ft.Row([chart1, chart2], spacing=10, expand=True)
 
+        # Лучшие кошельки по ROI (доли операций — store.attribution)
+        top_rows = []
+        for row in self.store.attribution.leaderboard("roi", limit=TOP_WALLETS):
+            top_rows.append(ft.Row([
+                ft.Text(f"Wallet #{row['account_id']}", expand=True),
+                ft.Text(f"ROI {row['roi']:.0%}" if row["roi"] is not None else "ROI —", width=110,
+                        color=ft.Colors.GREEN_400 if (row["roi"] or 0) >= 0 else ft.Colors.RED_400),
+                ft.Text(f"${row['profit']:.2f}", width=110),
+            ]))
+        top_wallets = ft.Container(
+            content=ft.Column(
+                [ft.Text("Top Wallets by ROI", size=16, weight=ft.FontWeight.BOLD)]
+                + (top_rows or [ft.Text("No operations assigned to wallets", color=ft.Colors.GREY_400)]),
+                spacing=6,
+            ),
+            border=ft.Border.all(1, ft.Colors.GREY_800),
+            border_radius=10,
+            padding=10,
+        )
+
         return ft.Container(
             content=ft.Column([
                 ft.Text("Dashboard", size=24, weight=ft.FontWeight.BOLD),
@@ -189,6 +221,8 @@ class DashboardManager:
                 stats_row,
                 ft.Container(height=20),
                 charts_row,
+                ft.Container(height=10),
+                top_wallets,
             ]),
             padding=20,
         )
@@ -1,8 +1,6 @@
 import flet as ft
-import json
-import csv
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from datetime import datetime, timedelta
 import matplotlib
 matplotlib.use('Agg')
@@ -10,50 +8,26 @@ import matplotlib.pyplot as plt
 import io
 import base64
 
-DATA_DIR = Path("data")
-EXPENSES_FILE = DATA_DIR / "expenses.json"
-
-CATEGORIES = ["Proxy", "Captcha", "Gas", "Software", "Other"]
-
-TYPE_EXPENSE = "expense"
-TYPE_INCOME = "income"
-
-def ensure_data_dir():
-    DATA_DIR.mkdir(exist_ok=True)
-
-def load_expenses() -> List[Dict[str, Any]]:
-    ensure_data_dir()
-    if not EXPENSES_FILE.exists():
-        with open(EXPENSES_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=4, ensure_ascii=False)
-        return []
-    with open(EXPENSES_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        for exp in data:
-            if "account_id" in exp and exp["account_id"] is not None:
-                exp["account_ids"] = [exp["account_id"]]
-                del exp["account_id"]
-            elif "account_ids" not in exp:
-                exp["account_ids"] = []
-            if "network" not in exp:
-                exp["network"] = "evm"
-            if "type" not in exp:
-                exp["type"] = TYPE_EXPENSE
-        return data
-
-def save_expenses(expenses: List[Dict[str, Any]]):
-    ensure_data_dir()
-    with open(EXPENSES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(expenses, f, indent=4, ensure_ascii=False)
+from expenses_data import (
+    DATA_DIR, EXPENSES_MANIFEST, CATEGORIES, TYPE_EXPENSE, TYPE_INCOME, EXPORT_CSV_HEADERS,
+    ensure_data_dir, load_expenses, filter_expenses, format_accounts, format_amount, iter_export_rows,
+)
+from fx import BASE_CURRENCY, CURRENCIES, fx_table
+from export_dialog import run_export_job
+from export_jobs import ExportJob, export_path, project_name_lookup
+from networks import NETWORKS, get_network, short_display
+from recurring import INTERVALS, check_repeat, is_active, make_template
+from store import DataStore
 
 
 class ExpensesManager:
-    def __init__(self, page: ft.Page, update_content_callback, accounts_manager, projects_manager):
+    def __init__(self, page: ft.Page, update_content_callback, accounts_manager, projects_manager,
+                 store: Optional[DataStore] = None):
         self.page = page
         self.update_content = update_content_callback
         self.accounts_manager = accounts_manager
         self.projects_manager = projects_manager
-        self.expenses = load_expenses()
+        self.store = store if store is not None else accounts_manager.store
 
         self.filter_project_dropdown = None
         self.filter_account_dropdown = None
@@ -61,6 +35,7 @@ class ExpensesManager:
         self.date_to_field = None
         self.quick_filter_dropdown = None
         self.show_charts = False
+        self._export_options: Dict[str, Any] = {"fmt": "csv", "compress": False}
 
         # Поля диалога
         self.type_radio = None
@@ -71,7 +46,10 @@ class ExpensesManager:
         self.accounts_list = None
         self.category_dropdown = None
         self.amount_field = None
+        self.currency_dropdown = None
         self.desc_field = None
+        self.repeat_dropdown = None
+        self.repeat_end_field = None
         self.dialog_modal = None
         self.editing_expense_id = None
         self.current_expense_accounts = []
@@ -112,13 +90,20 @@ class ExpensesManager:
         )
 
     @staticmethod
-    def amount_cell(amount: float, type_: str, width: int) -> ft.Container:
+    def amount_cell(amount: float, type_: str, width: int, currency: str = BASE_CURRENCY,
+                    usd: Optional[float] = None) -> ft.Container:
         color = ft.Colors.RED_400 if type_ == TYPE_EXPENSE else ft.Colors.GREEN_400
         sign = "-" if type_ == TYPE_EXPENSE else "+"
-        text = f"{sign}${abs(amount):.2f}"
+        if currency == BASE_CURRENCY:
+            text = f"{sign}${abs(amount):.2f}"
+            tooltip = None
+        else:
+            text = f"{sign}{format_amount(abs(amount))} {currency}"
+            tooltip = f"≈ ${abs(usd):.2f}" if usd else "no USD rate"
         return ft.Container(
             content=ft.Text(
                 text,
+                tooltip=tooltip,
                 size=15,
                 selectable=True,
                 max_lines=1,
@@ -136,16 +121,15 @@ class ExpensesManager:
         b64 = base64.b64encode(raw).decode("utf-8")
         return f"data:{mime};base64,{b64}"
 
-    def _build_charts(self, filtered: List[Dict[str, Any]]) -> ft.Container:
-        # Данные по месяцам
+    def _build_charts(self, filtered: List[Dict[str, Any]], usd: List[float]) -> ft.Container:
+        # Данные по месяцам (usd — суммы filtered, пересчитанные в USD)
         monthly_expenses = {}
         monthly_incomes = {}
-        for exp in filtered:
+        for exp, amount in zip(filtered, usd):
             date_str = exp.get("date", "")
             if not date_str or len(date_str) < 7:
                 continue
             year_month = date_str[:7]
-            amount = exp.get("amount", 0)
             if exp.get("type") == TYPE_EXPENSE:
                 monthly_expenses[year_month] = monthly_expenses.get(year_month, 0) + amount
             else:
@@ -176,10 +160,10 @@ class ExpensesManager:
 
         # Круговая диаграмма расходов по категориям
         category_expenses = {}
-        for exp in filtered:
+        for exp, amount in zip(filtered, usd):
             if exp.get("type") == TYPE_EXPENSE:
                 cat = exp.get("category", "Other")
-                category_expenses[cat] = category_expenses.get(cat, 0) + exp.get("amount", 0)
+                category_expenses[cat] = category_expenses.get(cat, 0) + amount
 
         if category_expenses:
             fig2, ax2 = plt.subplots(figsize=(6, 6))
@@ -216,9 +200,9 @@ class ExpensesManager:
             ft.Text("Expenses & Incomes", size=24, weight=ft.FontWeight.BOLD),
             ft.Container(expand=True),
             ft.ElevatedButton(
-                "Export CSV",
+                "Export",
                 icon=ft.Icons.DOWNLOAD,
-                on_click=self.export_to_csv,
+                on_click=self.open_export_dialog,
                 style=ft.ButtonStyle(
                     color=ft.Colors.WHITE,
                     bgcolor=ft.Colors.GREY_700,
@@ -295,8 +279,10 @@ class ExpensesManager:
 
         # Получаем отфильтрованные операции
         filtered = self._filtered_expenses()
-        total_expenses = sum(exp.get("amount", 0) for exp in filtered if exp.get("type", TYPE_EXPENSE) == TYPE_EXPENSE)
-        total_incomes = sum(exp.get("amount", 0) for exp in filtered if exp.get("type", TYPE_EXPENSE) == TYPE_INCOME)
+        # Все валюты переводятся в USD одним векторным проходом
+        usd = fx_table().usd_amounts(filtered)
+        total_expenses = sum(a for exp, a in zip(filtered, usd) if exp.get("type", TYPE_EXPENSE) == TYPE_EXPENSE)
+        total_incomes = sum(a for exp, a in zip(filtered, usd) if exp.get("type", TYPE_EXPENSE) == TYPE_INCOME)
 
         # Карточки итогов
         expenses_card = ft.Container(
@@ -330,9 +316,9 @@ class ExpensesManager:
 
         # Таблица или графики
         if self.show_charts:
-            main_content = self._build_charts(filtered)
+            main_content = self._build_charts(filtered, usd)
         else:
-            main_content = self._create_expenses_table(filtered)
+            main_content = self._create_expenses_table(filtered, usd)
 
         return ft.Container(
             content=ft.Column([
@@ -370,7 +356,7 @@ class ExpensesManager:
             ))
         return options
 
-    def _create_expenses_table(self, filtered: List[Dict[str, Any]]) -> ft.Container:
+    def _create_expenses_table(self, filtered: List[Dict[str, Any]], usd: List[float]) -> ft.Container:
         if not filtered:
             return ft.Container(
                 content=ft.Column([
@@ -412,8 +398,9 @@ class ExpensesManager:
             bgcolor=ft.Colors.GREY_900,
         )
 
+        project_name_of = project_name_lookup(self.projects_manager.projects)
         rows_content = []
-        for exp in filtered:
+        for exp, usd_amount in zip(filtered, usd):
             edit_btn = ft.IconButton(
                 icon=ft.Icons.EDIT_OUTLINED,
                 icon_color=ft.Colors.BLUE_400,
@@ -437,10 +424,7 @@ class ExpensesManager:
                 icon_size=20,
             )
 
-            if exp.get("project_id"):
-                project_name = self._get_project_name(exp["project_id"])
-            else:
-                project_name = "Global"
+            project_name = project_name_of(exp.get("project_id") or None)
 
             account_ids = exp.get("account_ids", [])
             accounts_text = self._format_accounts(account_ids, exp.get("network", "evm"))
@@ -460,7 +444,8 @@ class ExpensesManager:
                     self.centered_cell(project_name, col_widths["project"], tooltip=project_name),
                     self.centered_cell(accounts_text, col_widths["accounts"], tooltip=accounts_tooltip),
                     self.centered_cell(category, col_widths["category"]),
-                    self.amount_cell(amount, op_type, col_widths["amount"]),
+                    self.amount_cell(amount, op_type, col_widths["amount"],
+                                     exp.get("currency") or BASE_CURRENCY, usd_amount),
                     self.centered_cell(description, col_widths["description"], tooltip=description),
                     ft.Container(
                         content=ft.Row([edit_btn, delete_btn], spacing=2, alignment=ft.MainAxisAlignment.CENTER),
@@ -496,18 +481,13 @@ class ExpensesManager:
         )
 
     def _format_accounts(self, account_ids: List[int], network: str) -> str:
-        if not account_ids:
-            return "-"
-        count = len(account_ids)
-        network_label = "EVM" if network == "evm" else "Solana"
-        return f"{count} {network_label}"
+        return format_accounts(account_ids, network)
 
     def _get_accounts_tooltip(self, account_ids: List[int], network: str) -> str:
         if not account_ids:
             return ""
-        network_label = "EVM" if network == "evm" else "Solana"
         ids_str = ", ".join(str(id) for id in account_ids)
-        return f"{network_label}: {ids_str}"
+        return f"{get_network(network)['label']}: {ids_str}"
 
     def _filtered_expenses(self) -> List[Dict[str, Any]]:
         project_filter = self.filter_project_dropdown.value if self.filter_project_dropdown else "all"
@@ -515,42 +495,16 @@ class ExpensesManager:
         date_from = self.date_from_field.value if self.date_from_field else None
         date_to = self.date_to_field.value if self.date_to_field else None
 
-        filtered = []
-        for exp in self.expenses:
-            exp_project = str(exp.get("project_id")) if exp.get("project_id") else None
-            exp_accounts = exp.get("account_ids", [])
-
-            # Фильтр по проекту
-            if project_filter != "all":
-                if exp_project is None:
-                    pass
-                elif exp_project != project_filter:
-                    continue
-
-            # Фильтр по аккаунту
-            if account_filter != "all":
-                if not exp_accounts:
-                    continue
-                if int(account_filter) not in exp_accounts:
-                    continue
-
-            # Фильтр по датам
-            exp_date = exp.get("date", "")
-            if date_from and exp_date < date_from:
-                continue
-            if date_to and exp_date > date_to:
-                continue
+        return filter_expenses(self.expenses, project_filter, account_filter, date_from, date_to)
 
-            filtered.append(exp)
-        return filtered
+    @property
+    def expenses(self) -> List[Dict[str, Any]]:
+        return self.store.expenses.records
 
-    def _get_project_name(self, project_id: Optional[int]) -> str:
-        if project_id is None:
-            return "Global"
-        for proj in self.projects_manager.projects:
-            if proj["id"] == project_id:
-                return proj.get("name", "Unknown")
-        return f"ID {project_id} (deleted)"
+    def reload_from_disk(self) -> bool:
+        """Подтягивает внешние изменения expenses.json; итоги проектов обновятся по событиям."""
+        with self.store.history.external_change():
+            return self.store.expenses.replace_all(load_expenses())
 
     def apply_filters(self, e):
         self.update_content(self.get_view())
@@ -575,50 +529,65 @@ class ExpensesManager:
         self.show_charts = not self.show_charts
         self.update_content(self.get_view())
 
-    def export_to_csv(self, e):
-        filtered = self._filtered_expenses()
-        if not filtered:
-            return
-        # Используем FilePicker для сохранения
-        if not hasattr(self, 'file_picker'):
-            self.file_picker = ft.FilePicker()
-            self.page.overlay.append(self.file_picker)
-        self.file_picker.save_file(
-            dialog_title="Save CSV",
-            allowed_extensions=["csv"],
-            on_result=self._on_export_file_selected,
-        )
-
-    def _on_export_file_selected(self, e):
-        if not e.path:
+    # ---------- ЭКСПОРТ ----------
+    EXPORT_CSV_HEADERS = EXPORT_CSV_HEADERS
+
+    def open_export_dialog(self, e):
+        if not self._filtered_expenses():
             return
-        path = Path(e.path)
-        if path.suffix.lower() != '.csv':
-            path = path.with_suffix('.csv')
-        self._do_export(path)
+        compress_cb = ft.Checkbox(label="Compress (gzip)", value=self._export_options["compress"])
+
+        def close(ev):
+            dlg.open = False
+            self.page.update()
+
+        async def on_export_format(ev):
+            self._export_options = {"fmt": ev.control.data, "compress": bool(compress_cb.value)}
+            close(ev)
+            await self.export_to_file(ev)
+
+        dlg = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Export operations"),
+            content=ft.Column([
+                ft.Text("Exports the operations matching the current filters", size=12, color=ft.Colors.GREY_400),
+                compress_cb,
+                ft.ElevatedButton("CSV", data="csv", on_click=on_export_format),
+                ft.ElevatedButton("JSON", data="json", on_click=on_export_format),
+            ], spacing=10, tight=True),
+            actions=[ft.TextButton("Cancel", on_click=close)],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self.page.show_dialog(dlg)
+
+    async def export_to_file(self, e):
+        fmt = self._export_options["fmt"]
+        file_picker = ft.FilePicker()
+        self.page.services.append(file_picker)
+        dest = await file_picker.save_file(
+            dialog_title=f"Save {fmt.upper()}",
+            allowed_extensions=[fmt],
+        )
+        if dest:
+            self._do_export(Path(dest))
+
+    def _iter_export_rows(self, rows: List[Dict[str, Any]], fmt: str) -> Iterator[Any]:
+        """Генератор строк экспорта; названия проектов — из словаря, а не поиском по списку."""
+        return iter_export_rows(rows, fmt, project_name_lookup(self.projects_manager.projects))
 
     def _do_export(self, path: Path):
-        try:
-            with open(path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                headers = ["Date", "Type", "Project", "Accounts", "Category", "Amount", "Description"]
-                writer.writerow(headers)
-                for exp in self._filtered_expenses():
-                    project_name = self._get_project_name(exp.get("project_id"))
-                    accounts_str = self._format_accounts(exp.get("account_ids", []), exp.get("network", "evm"))
-                    writer.writerow([
-                        exp.get("date", ""),
-                        "Expense" if exp.get("type") == TYPE_EXPENSE else "Income",
-                        project_name,
-                        accounts_str,
-                        exp.get("category", ""),
-                        f"{exp.get('amount', 0):.2f}",
-                        exp.get("description", "")
-                    ])
-            self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Exported to {path}"), open=True)
-        except Exception as ex:
-            self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Export failed: {ex}"), open=True)
-        self.page.update()
+        fmt = self._export_options["fmt"]
+        compress = self._export_options["compress"]
+        rows = self._filtered_expenses()
+        job = ExportJob(
+            export_path(path, fmt, compress),
+            fmt,
+            self._iter_export_rows(rows, fmt),
+            total=len(rows),
+            headers=self.EXPORT_CSV_HEADERS if fmt == "csv" else None,
+            compress=compress,
+        )
+        run_export_job(self.page, job, "Exporting operations")
 
     # ---------- ДИАЛОГ ДОБАВЛЕНИЯ/РЕДАКТИРОВАНИЯ ----------
     def open_add_expense_dialog(self, e: ft.ControlEvent = None):
@@ -630,10 +599,10 @@ class ExpensesManager:
     def open_edit_expense_dialog(self, e: ft.ControlEvent):
         expense_id = e.control.data
         self.editing_expense_id = expense_id
-        expense = next((exp for exp in self.expenses if exp["id"] == expense_id), None)
+        expense = self.store.expenses.get(expense_id)
         if expense:
             self.current_expense_accounts = expense.get("account_ids", [])
-            self.current_network = expense.get("network", "evm")
+            self.current_network = get_network(expense.get("network"))["id"]
             self._show_expense_dialog(expense)
 
     def _show_expense_dialog(self, expense: Optional[Dict] = None):
@@ -646,9 +615,9 @@ class ExpensesManager:
         )
         self.network_radio = ft.RadioGroup(
             content=ft.Row([
-                ft.Radio(value="evm", label="EVM", fill_color=ft.Colors.BLUE_400),
-                ft.Radio(value="solana", label="Solana", fill_color=ft.Colors.PURPLE_400),
-            ]),
+                ft.Radio(value=net["id"], label=net["label"], fill_color=net["color"])
+                for net in NETWORKS
+            ], wrap=True),
             value=self.current_network,
             on_change=self.on_network_change,
         )
@@ -663,10 +632,21 @@ class ExpensesManager:
             value=expense.get("category") if expense else CATEGORIES[0],
         )
         self.amount_field = ft.TextField(
-            label="Amount (USD)",
+            label="Amount",
             value=str(expense.get("amount", "")) if expense else "",
             keyboard_type=ft.KeyboardType.NUMBER,
             hint_text="0.00",
+            expand=True,
+        )
+        currency = (expense.get("currency") if expense else None) or BASE_CURRENCY
+        currencies = CURRENCIES + sorted(set(fx_table().currencies()) - set(CURRENCIES))
+        if currency not in currencies:
+            currencies.append(currency)
+        self.currency_dropdown = ft.Dropdown(
+            label="Currency",
+            options=[ft.dropdown.Option(c, c) for c in currencies],
+            value=currency,
+            width=130,
         )
         self.desc_field = ft.TextField(
             label="Description",
@@ -675,6 +655,20 @@ class ExpensesManager:
             min_lines=2,
             max_lines=4,
         )
+        # Повтор: для новой операции создаёт шаблон, для повторяющейся — меняет или останавливает его
+        template = self.store.recurring.get(expense.get("recurring_id")) if expense else None
+        self.repeat_dropdown = ft.Dropdown(
+            label="Repeat",
+            options=[ft.dropdown.Option("", "Never")] + [ft.dropdown.Option(i, i.capitalize()) for i in INTERVALS],
+            value=template["interval"] if template and is_active(template) else "",
+            width=160,
+        )
+        self.repeat_end_field = ft.TextField(
+            label="Repeat until (optional)",
+            value=(template.get("end") or "") if template else "",
+            hint_text="2025-12-31",
+            expand=True,
+        )
         self.project_dropdown = ft.Dropdown(
             label="Project (leave empty for global)",
             options=[ft.dropdown.Option("", "-- Global --")] + self._get_project_options(),
@@ -716,8 +710,9 @@ class ExpensesManager:
                         height=220,
                     ),
                     self.category_dropdown,
-                    self.amount_field,
+                    ft.Row([self.amount_field, self.currency_dropdown], spacing=10),
                     self.desc_field,
+                    ft.Row([self.repeat_dropdown, self.repeat_end_field], spacing=10),
                 ], scroll=ft.ScrollMode.AUTO, height=650),
                 width=600,
             ),
@@ -736,15 +731,12 @@ class ExpensesManager:
 
         checkboxes = []
         filter_text = filter_text.lower()
-        network = self.network_radio.value if self.network_radio else self.current_network
+        net = get_network(self.network_radio.value if self.network_radio else self.current_network)
+        key_field, address_field = net["field"], net["address_field"]
 
         for acc in self.accounts_manager.accounts:
-            if network == "evm":
-                key = acc.get("evm_private_key", "")
-                addr = acc.get("evm_address")
-            else:
-                key = acc.get("sol_private_key", "")
-                addr = acc.get("solana_address")
+            key = acc.get(key_field, "")
+            addr = acc.get(address_field)
             if not key:
                 continue
 
@@ -757,9 +749,7 @@ class ExpensesManager:
             if filter_text and filter_text not in searchable_string:
                 continue
 
-            network_label = "EVM" if network == "evm" else "Solana"
-            display = self._get_account_display(acc, network)
-            label = f"{network_label} {acc['id']} ({display})"
+            label = f"{net['label']} {acc['id']} ({short_display(acc, net)})"
             cb = ft.Checkbox(
                 label=label,
                 value=acc["id"] in self.current_expense_accounts,
@@ -771,22 +761,7 @@ class ExpensesManager:
         self.page.update()
 
     def _get_account_display(self, acc: Dict, network: str) -> str:
-        if network == "evm":
-            address = acc.get("evm_address")
-            if address:
-                return address[:4] + "..." + address[-4:]
-            key = acc.get("evm_private_key", "")
-            if key:
-                return key[:4] + "..." + key[-4:]
-            return "No EVM"
-        else:
-            address = acc.get("solana_address")
-            if address:
-                return address[:4] + "..." + address[-4:]
-            key = acc.get("sol_private_key", "")
-            if key:
-                return key[:4] + "..." + key[-4:]
-            return "No Solana"
+        return short_display(acc, get_network(network))
 
     def on_network_change(self, e):
         self.current_network = self.network_radio.value
@@ -816,7 +791,7 @@ class ExpensesManager:
         self.dialog_modal.open = False
         self.page.update()
 
-    def save_expense(self, e: ft.ControlEvent = None):
+    async def save_expense(self, e: ft.ControlEvent = None):
         if not self.date_field.value or not self.amount_field.value:
             return
         try:
@@ -839,6 +814,7 @@ class ExpensesManager:
             "network": network,
             "category": self.category_dropdown.value,
             "amount": amount,
+            "currency": self.currency_dropdown.value or BASE_CURRENCY,
             "description": self.desc_field.value,
             "account_ids": selected_accounts,
         }
@@ -847,20 +823,59 @@ class ExpensesManager:
         else:
             expense_data["project_id"] = None
 
-        if self.editing_expense_id is None:
-            new_id = max([exp["id"] for exp in self.expenses], default=0) + 1
-            expense_data["id"] = new_id
-            self.expenses.append(expense_data)
-        else:
-            for i, exp in enumerate(self.expenses):
-                if exp["id"] == self.editing_expense_id:
+        existing = self.store.expenses.get(self.editing_expense_id) if self.editing_expense_id else None
+        template = self.store.recurring.get(existing.get("recurring_id")) if existing else None
+        interval = self.repeat_dropdown.value or ""
+        repeat_end = (self.repeat_end_field.value or "").strip() or None
+        if template is not None:
+            expense_data["recurring_id"] = template["id"]
+
+        try:
+            with self.store.history.transaction("save operation"):
+                repeat_changed = self._apply_repeat(expense_data, template, interval, repeat_end)
+                if self.editing_expense_id is None:
+                    expense_data["id"] = self.store.expenses.next_id()
+                    self.store.expenses.add([expense_data])
+                else:
                     expense_data["id"] = self.editing_expense_id
-                    self.expenses[i] = expense_data
-                    break
+                    self.store.expenses.replace(expense_data)
+                if repeat_changed:
+                    # Дата операции в прошлом — сразу дописываем пропущенные повторения
+                    self.store.materialize_recurring()
+        except ValueError as exc:
+            self.page.snack_bar = ft.SnackBar(ft.Text(str(exc)), open=True)
+            self.page.update()
+            return
 
-        save_expenses(self.expenses)
         self.close_dialog()
         self.update_content(self.get_view())
+        await self.store.save("expenses")
+        if repeat_changed:
+            await self.store.save("recurring")
+
+    def _apply_repeat(self, expense_data: Dict[str, Any], template: Optional[Dict[str, Any]],
+                      interval: str, repeat_end: Optional[str]) -> bool:
+        """Создаёт, меняет или останавливает шаблон повтора; True, если шаблоны изменились.
+
+        Правка полей повторяющейся операции меняет только её саму.
+        """
+        if template is None:
+            if not interval:
+                return False
+            new_template = make_template(expense_data, interval, repeat_end)
+            new_template["id"] = self.store.recurring.next_id()
+            self.store.recurring.add([new_template])
+            expense_data["recurring_id"] = new_template["id"]
+            return True
+        if not interval:
+            if not is_active(template):
+                return False
+            # «Never» для повторяющейся операции — больше не повторять после сегодняшнего дня
+            changes = {"end": datetime.now().strftime("%Y-%m-%d")}
+        else:
+            check_repeat(interval, repeat_end)
+            changes = {"interval": interval, "end": repeat_end}
+        return bool(self.store.recurring.update(template["id"], changes))
 
     # ---------- УДАЛЕНИЕ ----------
     def _confirm_delete(self, expense_id):
@@ -885,9 +900,18 @@ class ExpensesManager:
         self.page.show_dialog(dlg)
 
     def _delete_expense(self, expense_id):
-        self.expenses = [exp for exp in self.expenses if exp["id"] != expense_id]
-        save_expenses(self.expenses)
+        self.store.expenses.delete([expense_id])
         self.update_content(self.get_view())
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Operation #{expense_id} deleted"), action="Undo",
+                                          on_action=self._undo_last, open=True)
+        self.page.update()
+        self.page.run_task(self.store.save, "expenses")
+
+    async def _undo_last(self, e=None):
+        entry = self.store.history.undo()
+        if entry:
+            self.update_content(self.get_view())
+            await self.store.save_entry(entry)
 
     def delete_expense(self, e: ft.ControlEvent):
         expense_id = e.control.data
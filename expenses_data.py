@@ -0,0 +1,356 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fx import BASE_CURRENCY, fx_table
+from migrations import (
+    decode_records, encode_records, log_migration, migrate, read_records, replace_file,
+)
+from networks import get_network
+from watcher import remember_file
+
+DATA_DIR = Path("data")
+EXPENSES_FILE = DATA_DIR / "expenses.json"         # прежний единый файл, переносится в шарды
+EXPENSES_DIR = DATA_DIR / "expenses"
+EXPENSES_MANIFEST = EXPENSES_DIR / "manifest.json"
+GLOBAL_SHARD = "global"                             # операции без проекта
+
+CATEGORIES = ["Proxy", "Captcha", "Gas", "Software", "Other"]
+
+TYPE_EXPENSE = "expense"
+TYPE_INCOME = "income"
+
+def ensure_data_dir():
+    DATA_DIR.mkdir(exist_ok=True)
+    EXPENSES_DIR.mkdir(exist_ok=True)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Шарды: data/expenses/<проект>.json + manifest.json
+# ──────────────────────────────────────────────────────────────
+# Операции лежат по файлу на проект (и global.json для операций без
+# проекта). В манифесте на каждый шард — число операций, суммы и
+# диапазон дат: общие итоги по проектам считаются без чтения шардов,
+# а отбор по проекту читает только свой шард и global. Манифест
+# пишется последним, поэтому DataWatcher следит только за ним.
+_shard_digests: Dict[str, bytes] = {}      # шард -> хеш последнего записанного/прочитанного текста
+_shard_lock = threading.Lock()
+
+
+def shard_key(project_id: Optional[int]) -> str:
+    return GLOBAL_SHARD if project_id is None else f"project_{project_id}"
+
+
+def shards_for_project(project_id: Optional[int]) -> List[str]:
+    """Шарды, нужные отбору по проекту: глобальные операции проходят любой фильтр."""
+    return [GLOBAL_SHARD] if project_id is None else [shard_key(project_id), GLOBAL_SHARD]
+
+
+def _shard_path(key: str) -> Path:
+    return EXPENSES_DIR / f"{key}.json"
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _shard_summary(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводка шарда; суммы — в USD по курсам на момент сохранения."""
+    spent = earned = 0.0
+    dates = [exp["date"] for exp in records if exp.get("date")]
+    for exp, amount in zip(records, fx_table().usd_amounts(records)):
+        if exp.get("type") == TYPE_EXPENSE:
+            spent += amount
+        else:
+            earned += amount
+    return {
+        "project_id": records[0].get("project_id"),
+        "count": len(records),
+        "expenses": round(spent, 2),
+        "incomes": round(earned, 2),
+        "date_from": min(dates) if dates else None,
+        "date_to": max(dates) if dates else None,
+    }
+
+
+def load_manifest() -> Dict[str, Dict[str, Any]]:
+    """{шард: сводка}; при первом запуске переносит expenses.json в шарды."""
+    ensure_data_dir()
+    if not EXPENSES_MANIFEST.exists():
+        _create_manifest()
+    return json.loads(EXPENSES_MANIFEST.read_text(encoding="utf-8"))["shards"]
+
+
+def _create_manifest() -> None:
+    """Манифеста нет: собрать его по шардам на диске, иначе разложить expenses.json.
+
+    Пустой журнал пишется только при пустом каталоге — save_expenses([])
+    удалил бы все шарды, если манифест просто потерян.
+    """
+    shards = sorted(path for path in EXPENSES_DIR.glob("*.json") if path != EXPENSES_MANIFEST)
+    if shards:
+        _rebuild_manifest(shards)
+    elif EXPENSES_FILE.exists():
+        _split_legacy_file()
+    else:
+        save_expenses([])
+
+
+def _rebuild_manifest(shards: List[Path]) -> None:
+    # Нечитаемый шард бросает исключение до записи: ничего не удаляется
+    data: List[Dict[str, Any]] = []
+    for path in shards:
+        records, version = read_records(path)
+        migrate("expenses", records, version)
+        data.extend(records)
+    data.sort(key=lambda exp: exp["id"])
+    save_expenses(data)
+    print(f"[expenses] {EXPENSES_MANIFEST.name} was missing: rebuilt from {len(shards)} shards "
+          f"({len(data)} operations)")
+
+
+def _split_legacy_file() -> None:
+    data, version = read_records(EXPENSES_FILE)
+    migrate("expenses", data, version)
+    save_expenses(data)
+    # Старый файл остаётся рядом как .bak (в бэкапы он уже не попадает)
+    EXPENSES_FILE.replace(EXPENSES_FILE.with_suffix(".json.bak"))
+    print(f"[expenses] {EXPENSES_FILE.name}: {len(data)} operations split into "
+          f"{len(load_manifest())} shards in {EXPENSES_DIR}")
+
+
+def load_expenses(shards: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Операции всех шардов (или только перечисленных), по возрастанию id."""
+    manifest = load_manifest()
+    keys = list(manifest) if shards is None else [key for key in shards if key in manifest]
+    data: List[Dict[str, Any]] = []
+    for key in keys:
+        path = _shard_path(key)
+        text = path.read_text(encoding="utf-8")
+        records, version = decode_records(path, text)
+        if migrate("expenses", records, version):
+            text = encode_records("expenses", records)
+            replace_file(path, text)
+            log_migration(path, "expenses", version, len(records))
+        with _shard_lock:
+            _shard_digests[key] = _digest(text)
+        data.extend(records)
+    if len(keys) > 1:
+        data.sort(key=lambda exp: exp["id"])
+    return data
+
+
+def save_expenses(expenses: List[Dict[str, Any]], ledger_path: Optional[Path] = None):
+    """Пишет весь журнал: на диск попадают только изменившиеся шарды и манифест.
+
+    Принимает все операции — шард, которого в списке нет, удаляется.
+    Бинарный журнал для аналитики (ledger.py) обновляется до манифеста.
+    """
+    ensure_data_dir()
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for exp in expenses:
+        groups.setdefault(shard_key(exp.get("project_id")), []).append(exp)
+
+    manifest: Dict[str, Dict[str, Any]] = {}
+    with _shard_lock:
+        for key, records in groups.items():
+            text = encode_records("expenses", records)
+            digest = _digest(text)
+            if _shard_digests.get(key) != digest or not _shard_path(key).exists():
+                replace_file(_shard_path(key), text)
+                _shard_digests[key] = digest
+            manifest[key] = _shard_summary(records)
+            manifest[key]["digest"] = digest.hex()
+        for path in EXPENSES_DIR.glob("*.json"):
+            if path != EXPENSES_MANIFEST and path.stem not in groups:
+                path.unlink(missing_ok=True)
+                _shard_digests.pop(path.stem, None)
+
+    try:
+        from ledger import LEDGER_FILE, update_ledger     # numpy — только при записи
+        update_ledger(groups, {key: info["digest"] for key, info in manifest.items()},
+                      ledger_path or LEDGER_FILE)
+    except Exception as exc:
+        print(f"[ledger] update failed: {exc}")
+
+    text = json.dumps({"version": 1, "shards": manifest}, indent=4, ensure_ascii=False)
+    if not EXPENSES_MANIFEST.exists() or EXPENSES_MANIFEST.read_text(encoding="utf-8") != text:
+        replace_file(EXPENSES_MANIFEST, text)
+    remember_file(EXPENSES_MANIFEST)
+
+
+def manifest_totals(manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[Optional[int], Dict[str, float]]:
+    """Итоги по проектам (None — без проекта) прямо из манифеста, без чтения операций."""
+    manifest = manifest if manifest is not None else load_manifest()
+    return {info["project_id"]: {"expenses": info["expenses"], "incomes": info["incomes"]}
+            for info in manifest.values()}
+
+
+def filter_expenses(expenses: Iterable[Dict[str, Any]], project_filter: str = "all",
+                    account_filter: str = "all", date_from: Optional[str] = None,
+                    date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Отбор операций по проекту, аккаунту и диапазону дат (YYYY-MM-DD).
+
+    Глобальные операции (без проекта) проходят фильтр по любому проекту.
+    """
+    filtered = []
+    for exp in expenses:
+        exp_project = str(exp.get("project_id")) if exp.get("project_id") else None
+        exp_accounts = exp.get("account_ids", [])
+
+        # Фильтр по проекту
+        if project_filter != "all":
+            if exp_project is None:
+                pass
+            elif exp_project != project_filter:
+                continue
+
+        # Фильтр по аккаунту
+        if account_filter != "all":
+            if not exp_accounts:
+                continue
+            if int(account_filter) not in exp_accounts:
+                continue
+
+        # Фильтр по датам
+        exp_date = exp.get("date", "")
+        if date_from and exp_date < date_from:
+            continue
+        if date_to and exp_date > date_to:
+            continue
+
+        filtered.append(exp)
+    return filtered
+
+
+def format_accounts(account_ids: List[int], network: str) -> str:
+    if not account_ids:
+        return "-"
+    return f"{len(account_ids)} {get_network(network)['label']}"
+
+
+def format_amount(amount: float) -> str:
+    """Сумма в валюте операции: 2 знака для долларов, до 8 значащих для монет."""
+    return f"{amount:.2f}" if abs(amount) >= 1 or amount == 0 else f"{amount:.8g}"
+
+
+EXPORT_CSV_HEADERS = ["Date", "Type", "Project", "Accounts", "Category", "Amount", "Currency", "Description"]
+
+
+def iter_export_rows(rows: Iterable[Dict[str, Any]], fmt: str,
+                     project_name: Callable[[Optional[int]], str]) -> Iterator[Any]:
+    """Генератор строк экспорта; project_name — см. export_jobs.project_name_lookup."""
+    for exp in rows:
+        name = project_name(exp.get("project_id"))
+        if fmt == "csv":
+            yield [
+                exp.get("date", ""),
+                "Expense" if exp.get("type") == TYPE_EXPENSE else "Income",
+                name,
+                format_accounts(exp.get("account_ids", []), exp.get("network", "evm")),
+                exp.get("category", ""),
+                format_amount(exp.get("amount", 0)),
+                exp.get("currency") or BASE_CURRENCY,
+                exp.get("description", ""),
+            ]
+        else:
+            yield {**exp, "project_name": name}
+
+
+# ──────────────────────────────────────────────────────────────
+#  Итоги
+# ──────────────────────────────────────────────────────────────
+def totals_by(expenses: Iterable[Dict[str, Any]],
+              key: Callable[[Dict[str, Any]], Optional[str]]) -> Dict[str, Dict[str, float]]:
+    """Суммы расходов и доходов в USD по группам: {группа: {"expenses", "incomes"}}.
+
+    Операции, для которых key вернул пустое значение, пропускаются.
+    """
+    expenses = list(expenses)
+    result: Dict[str, Dict[str, float]] = defaultdict(lambda: {"expenses": 0, "incomes": 0})
+    for exp, amount in zip(expenses, fx_table().usd_amounts(expenses)):
+        group = key(exp)
+        if not group:
+            continue
+        if exp.get("type") == TYPE_EXPENSE:
+            result[group]["expenses"] += amount
+        else:
+            result[group]["incomes"] += amount
+    return dict(result)
+
+
+def month_key(exp: Dict[str, Any]) -> Optional[str]:
+    date_str = exp.get("date", "")
+    return date_str[:7] if len(date_str) >= 7 else None
+
+
+def monthly_totals(expenses: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    return totals_by(expenses, month_key)
+
+
+class ExpenseAggregates:
+    """Итоги операций, обновляемые инкрементально (см. store.DataStore).
+
+    Для каждой группы (месяц, категория расходов, проект) хранится
+    [расходы, доходы, число операций] в USD; пустые группы удаляются,
+    чтобы после удаления всех операций проекта не оставались суммы вида
+    1e-17. rebuild пересчитывает валюты разом (после смены курсов);
+    add/remove — по кешированному курсу одной операции.
+    """
+
+    def __init__(self, expenses: Iterable[Dict[str, Any]] = ()):
+        self.rebuild(expenses)
+
+    def rebuild(self, expenses: Iterable[Dict[str, Any]]) -> None:
+        self.totals = [0.0, 0.0, 0]
+        self.by_month: Dict[str, List[float]] = {}
+        self.by_category: Dict[str, List[float]] = {}
+        self.by_project: Dict[int, List[float]] = {}
+        # Растёт при каждом изменении — по нему кешируют графики
+        self.version = getattr(self, "version", 0) + 1
+        expenses = list(expenses)
+        for exp, amount in zip(expenses, fx_table().usd_amounts(expenses)):
+            self._change(exp, 1, amount)
+
+    @staticmethod
+    def _usd(exp: Dict[str, Any]) -> float:
+        amount = fx_table().to_usd(exp.get("amount", 0), exp.get("currency"), exp.get("date"))
+        return amount if amount == amount else 0.0      # NaN — курса нет
+
+    @staticmethod
+    def _apply(buckets: Dict[Any, List[float]], key: Any, exp: Dict[str, Any], sign: int,
+               amount: float) -> None:
+        bucket = buckets.setdefault(key, [0.0, 0.0, 0])
+        bucket[0 if exp.get("type") == TYPE_EXPENSE else 1] += sign * amount
+        bucket[2] += sign
+        if bucket[2] <= 0:
+            del buckets[key]
+
+    def _change(self, exp: Dict[str, Any], sign: int, amount: Optional[float] = None) -> None:
+        if amount is None:
+            amount = self._usd(exp)
+        self.totals[0 if exp.get("type") == TYPE_EXPENSE else 1] += sign * amount
+        self.totals[2] += sign
+        if self.totals[2] <= 0:
+            self.totals = [0.0, 0.0, 0]
+        month = month_key(exp)
+        if month:
+            self._apply(self.by_month, month, exp, sign, amount)
+        if exp.get("type") == TYPE_EXPENSE:
+            self._apply(self.by_category, exp.get("category", "Other"), exp, sign, amount)
+        if exp.get("project_id") is not None:
+            self._apply(self.by_project, exp["project_id"], exp, sign, amount)
+        self.version += 1
+
+    def add(self, exp: Dict[str, Any]) -> None:
+        self._change(exp, 1)
+
+    def remove(self, exp: Dict[str, Any]) -> None:
+        self._change(exp, -1)
+
+    def project(self, project_id: int) -> Tuple[float, float]:
+        bucket = self.by_project.get(project_id)
+        return (bucket[0], bucket[1]) if bucket else (0.0, 0.0)
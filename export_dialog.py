@@ -0,0 +1,46 @@
+import flet as ft
+
+from export_jobs import ExportJob, STATUS_CANCELLED, STATUS_DONE
+
+# ──────────────────────────────────────────────────────────────
+#  Диалог прогресса экспорта (общий для кошельков и операций)
+# ──────────────────────────────────────────────────────────────
+# export_jobs.py остаётся без flet — его использует cli.py.
+
+
+def run_export_job(page: ft.Page, job: ExportJob, title: str) -> None:
+    """Запускает экспорт в фоне с прогрессом и кнопкой отмены."""
+    progress_bar = ft.ProgressBar(value=0, width=450)
+    status_text = ft.Text("Starting…", size=13, color=ft.Colors.GREY_400)
+    dlg = ft.AlertDialog(
+        modal=True,
+        title=ft.Text(title),
+        content=ft.Column([progress_bar, status_text], tight=True, spacing=10, width=450),
+        actions=[ft.TextButton("Cancel", on_click=lambda _: job.cancel())],
+        actions_alignment=ft.MainAxisAlignment.END,
+    )
+
+    def close(_) -> None:
+        dlg.open = False
+        page.update()
+
+    def on_progress(j: ExportJob) -> None:
+        progress_bar.value = j.progress
+        status_text.value = f"{j.written} / {j.total} rows · {j.rate:,.0f} rows/s"
+        page.update()
+
+    def on_done(j: ExportJob) -> None:
+        progress_bar.value = 1
+        if j.status == STATUS_DONE:
+            status_text.value = f"Exported {j.written} rows to {j.path}"
+        elif j.status == STATUS_CANCELLED:
+            status_text.value = "Export cancelled"
+        else:
+            status_text.value = f"Export failed: {j.error}"
+        dlg.actions = [ft.TextButton("Close", on_click=close)]
+        page.update()
+
+    job.on_progress = on_progress
+    job.on_done = on_done
+    page.show_dialog(dlg)
+    page.run_thread(job.run)
@@ -0,0 +1,180 @@
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# ──────────────────────────────────────────────────────────────
+#  Фоновый потоковый экспорт в CSV / JSON (опционально gzip)
+# ──────────────────────────────────────────────────────────────
+WRITE_BUFFER_SIZE = 1 << 20      # байт на буфер файла
+FLUSH_EVERY_ROWS = 1000          # строк между сбросами в буфер и отчётом о прогрессе
+PROGRESS_INTERVAL = 0.2          # секунд между вызовами on_progress
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+
+def export_path(path: Path, fmt: str, compress: bool = False) -> Path:
+    """Добавляет расширение формата и .gz, если их нет."""
+    path = Path(path)
+    if path.suffix.lower() == ".gz":
+        path = path.with_suffix("")
+    if path.suffix.lower() != f".{fmt}":
+        path = path.with_name(path.name + f".{fmt}")
+    if compress:
+        path = path.with_name(path.name + ".gz")
+    return path
+
+
+def project_name_lookup(projects: Iterable[Dict[str, Any]]) -> Callable[[Optional[int]], str]:
+    """Строит функцию id проекта -> название по словарю, собранному один раз."""
+    names = {p["id"]: p.get("name", "Unknown") for p in projects}
+
+    def lookup(project_id: Optional[int]) -> str:
+        if project_id is None:
+            return "Global"
+        return names.get(project_id, f"ID {project_id} (deleted)")
+
+    return lookup
+
+
+class ExportJob:
+    """Экспорт строк из генератора в файл в отдельном потоке.
+
+    rows — итерируемый источник: для CSV это списки значений (первой
+    строкой пишутся headers), для JSON — словари. Запись идёт во
+    временный файл, который подменяет целевой только при успехе.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fmt: str,
+        rows: Iterable[Any],
+        total: Optional[int] = None,
+        headers: Optional[List[str]] = None,
+        compress: bool = False,
+        on_progress: Optional[Callable[["ExportJob"], None]] = None,
+        on_done: Optional[Callable[["ExportJob"], None]] = None,
+    ):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.rows = rows
+        self.total = total
+        self.headers = headers
+        self.compress = compress
+        self.on_progress = on_progress
+        self.on_done = on_done
+
+        self.written = 0
+        self.status = STATUS_PENDING
+        self.error: Optional[str] = None
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self._cancel = threading.Event()
+
+    # ------------------------------------------------------------------
+    @property
+    def progress(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return min(self.written / self.total, 1.0)
+
+    @property
+    def rate(self) -> float:
+        end = self.finished_at or time.monotonic()
+        return self.written / max(end - self.started_at, 1e-6)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    # ------------------------------------------------------------------
+    def _open(self, tmp_path: Path):
+        if self.compress:
+            raw = gzip.open(tmp_path, "wb")
+            return io.TextIOWrapper(io.BufferedWriter(raw, WRITE_BUFFER_SIZE), encoding="utf-8", newline="")
+        return open(tmp_path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER_SIZE)
+
+    def _report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if self.on_progress and (force or now - self._last_report >= PROGRESS_INTERVAL):
+            self._last_report = now
+            try:
+                self.on_progress(self)
+            except Exception as exc:
+                print(f"[export] progress callback failed: {exc}")
+
+    def _write_csv(self, f) -> None:
+        writer = csv.writer(f)
+        if self.headers:
+            writer.writerow(self.headers)
+        chunk: List[Any] = []
+        for row in self.rows:
+            if self._cancel.is_set():
+                return
+            chunk.append(row)
+            if len(chunk) >= FLUSH_EVERY_ROWS:
+                writer.writerows(chunk)
+                self.written += len(chunk)
+                chunk.clear()
+                self._report()
+        writer.writerows(chunk)
+        self.written += len(chunk)
+
+    def _write_json(self, f) -> None:
+        f.write("[")
+        first = True
+        parts: List[str] = []
+        for row in self.rows:
+            if self._cancel.is_set():
+                return
+            item = json.dumps(row, indent=4, ensure_ascii=False, default=dict).replace("\n", "\n    ")
+            parts.append(("\n    " if first else ",\n    ") + item)
+            first = False
+            if len(parts) >= FLUSH_EVERY_ROWS:
+                f.write("".join(parts))
+                self.written += len(parts)
+                parts.clear()
+                self._report()
+        f.write("".join(parts))
+        self.written += len(parts)
+        f.write("\n]" if not first else "]")
+
+    def write(self, f) -> None:
+        """Пишет все строки в уже открытый текстовый поток (файл, stdout)."""
+        if not self.started_at:
+            self.started_at = self._last_report = time.monotonic()
+        if self.fmt == "csv":
+            self._write_csv(f)
+        else:
+            self._write_json(f)
+
+    def run(self) -> None:
+        self.status = STATUS_RUNNING
+        self.started_at = self._last_report = time.monotonic()
+        tmp_path = self.path.with_name(self.path.name + ".part")
+        try:
+            with self._open(tmp_path) as f:
+                self.write(f)
+            if self._cancel.is_set():
+                tmp_path.unlink(missing_ok=True)
+                self.status = STATUS_CANCELLED
+            else:
+                os.replace(tmp_path, self.path)
+                self.status = STATUS_DONE
+        except Exception as exc:
+            tmp_path.unlink(missing_ok=True)
+            self.status = STATUS_FAILED
+            self.error = str(exc)
+        self.finished_at = time.monotonic()
+        self._report(force=True)
+        if self.on_done:
+            self.on_done(self)
@@ -0,0 +1,235 @@
+import bisect
+import csv
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ──────────────────────────────────────────────────────────────
+#  Курсы валют к USD: локальная таблица с интерполяцией по датам
+# ──────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+FX_FILE = DATA_DIR / "fx_rates.json"
+
+BASE_CURRENCY = "USD"
+# Валюты в диалоге операции; курсы для любых других тоже можно импортировать
+CURRENCIES = ["USD", "ETH", "SOL", "SUI", "APT", "BTC", "BNB", "USDT", "USDC"]
+
+_EPOCH = datetime.date(1970, 1, 1)
+_NO_DAY = 10 ** 9           # позже любой даты курса: np.interp возьмёт последний
+
+
+def date_to_day(value: Optional[str]) -> Optional[int]:
+    """YYYY-MM-DD -> дней от 1970-01-01 (None, если дата не разбирается)."""
+    try:
+        return (datetime.date.fromisoformat(value[:10]) - _EPOCH).days
+    except (TypeError, ValueError):
+        return None
+
+
+def yyyymmdd_to_days(codes: np.ndarray) -> np.ndarray:
+    """Векторно: целые YYYYMMDD (как в ledger.bin) -> дни от эпохи."""
+    codes = np.asarray(codes, dtype=np.int64)
+    years = (codes // 10000 - 1970).astype("M8[Y]")
+    months = (codes // 100 % 100 - 1).astype("m8[M]")
+    days = (codes % 100 - 1).astype("m8[D]")
+    return (years.astype("M8[M]") + months).astype("M8[D]").astype(np.int64) + days.astype(np.int64)
+
+
+class FxTable:
+    """Курсы (дата, валюта) -> USD за единицу.
+
+    Между известными датами курс интерполируется линейно, за их
+    пределами берётся ближайший. Точечные запросы кешируются (одна
+    операция пересчитывается при каждом изменении итогов), массовые
+    (to_usd_many) идут через np.interp по каждой валюте разом.
+    Неизвестная валюта даёт NaN: такие операции в итоги не входят.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, Iterable[Tuple[str, float]]]] = None):
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._cache: Dict[Tuple[str, Optional[int]], float] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self._warned: set = set()
+        for currency, points in (rates or {}).items():
+            self.merge(currency, points)
+
+    # ------------------------------------------------------------------
+    def currencies(self) -> List[str]:
+        return sorted(self._series)
+
+    def points(self, currency: str) -> List[Tuple[str, float]]:
+        days, rates = self._series.get(currency, (np.empty(0), np.empty(0)))
+        return [((_EPOCH + datetime.timedelta(days=int(d))).isoformat(), float(r)) for d, r in zip(days, rates)]
+
+    def merge(self, currency: str, points: Iterable[Tuple[str, float]]) -> int:
+        """Добавляет/заменяет курсы валюты по датам; возвращает число принятых точек."""
+        currency = currency.upper()
+        merged = dict(zip(*self._series[currency])) if currency in self._series else {}
+        accepted = 0
+        for date, rate in points:
+            day = date_to_day(date)
+            if day is None or not rate or rate <= 0:
+                continue
+            merged[day] = float(rate)
+            accepted += 1
+        if merged:
+            days = np.array(sorted(merged), dtype=np.int64)
+            with self._lock:
+                self._series[currency] = (days, np.array([merged[d] for d in days], dtype=np.float64))
+                self._cache.clear()
+                self.version += 1
+        return accepted
+
+    # ------------------------------------------------------------------
+    def _warn_missing(self, currency: str) -> None:
+        if currency not in self._warned:
+            self._warned.add(currency)
+            print(f"[fx] no USD rates for {currency}; its operations are left out of totals")
+
+    def rate(self, currency: Optional[str], date: Optional[str]) -> float:
+        currency = (currency or BASE_CURRENCY).upper()
+        if currency == BASE_CURRENCY:
+            return 1.0
+        day = date_to_day(date)
+        key = (currency, day)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        series = self._series.get(currency)
+        if series is None:
+            self._warn_missing(currency)
+            return float("nan")
+        days, rates = series
+        if day is None:
+            value = float(rates[-1])
+        else:
+            i = bisect.bisect_left(days, day)
+            if i < len(days) and days[i] == day:
+                value = float(rates[i])
+            elif i == 0:
+                value = float(rates[0])
+            elif i == len(days):
+                value = float(rates[-1])
+            else:
+                d0, d1 = days[i - 1], days[i]
+                value = float(rates[i - 1] + (rates[i] - rates[i - 1]) * (day - d0) / (d1 - d0))
+        self._cache[key] = value
+        return value
+
+    def to_usd(self, amount: float, currency: Optional[str], date: Optional[str]) -> float:
+        return amount * self.rate(currency, date)
+
+    def to_usd_days(self, amounts: np.ndarray, currencies: Sequence[str], codes: np.ndarray,
+                    days: np.ndarray) -> np.ndarray:
+        """Векторный пересчёт: codes — индексы в currencies, days — дни от эпохи."""
+        result = np.asarray(amounts, dtype=np.float64).copy()
+        codes = np.asarray(codes)
+        days = np.asarray(days)
+        for code in np.unique(codes):
+            currency = currencies[int(code)].upper()
+            if currency == BASE_CURRENCY:
+                continue
+            mask = codes == code
+            series = self._series.get(currency)
+            if series is None:
+                self._warn_missing(currency)
+                result[mask] = np.nan
+                continue
+            result[mask] *= np.interp(days[mask], series[0], series[1])
+        return result
+
+    def to_usd_many(self, records: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Суммы операций в USD одним проходом по валютам (NaN — курса нет)."""
+        currencies: List[str] = []
+        codes_by_currency: Dict[str, int] = {}
+        amounts = np.empty(len(records), dtype=np.float64)
+        codes = np.empty(len(records), dtype=np.int32)
+        days = np.empty(len(records), dtype=np.int64)
+        for i, exp in enumerate(records):
+            currency = exp.get("currency") or BASE_CURRENCY
+            code = codes_by_currency.get(currency)
+            if code is None:
+                code = codes_by_currency[currency] = len(currencies)
+                currencies.append(currency)
+            day = date_to_day(exp.get("date"))
+            amounts[i] = exp.get("amount", 0) or 0
+            codes[i] = code
+            # Операция без даты — по самому свежему курсу
+            days[i] = day if day is not None else _NO_DAY
+        return self.to_usd_days(amounts, currencies, codes, days)
+
+    def usd_amounts(self, records: Sequence[Dict[str, Any]]) -> List[float]:
+        """to_usd_many для обычного кода: список, операции без курса — 0."""
+        return np.nan_to_num(self.to_usd_many(records), nan=0.0).tolist()
+
+    def as_dict(self) -> Dict[str, List[Tuple[str, float]]]:
+        return {currency: self.points(currency) for currency in self.currencies()}
+
+
+# ──────────────────────────────────────────────────────────────
+#  Файл курсов и импорт CSV
+# ──────────────────────────────────────────────────────────────
+_table: Optional[FxTable] = None
+_table_lock = threading.Lock()
+
+
+def load_fx_table(path: Path = FX_FILE) -> FxTable:
+    if not path.exists():
+        return FxTable()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return FxTable({currency: [tuple(p) for p in points] for currency, points in data.get("rates", {}).items()})
+
+
+def save_fx_table(table: FxTable, path: Path = FX_FILE) -> None:
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({"version": 1, "rates": table.as_dict()}, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def fx_table() -> FxTable:
+    """Таблица курсов процесса (читается с диска один раз)."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = load_fx_table()
+    return _table
+
+
+def reload_fx_table() -> FxTable:
+    global _table
+    with _table_lock:
+        _table = load_fx_table()
+    return _table
+
+
+def import_rates_csv(csv_path: Path, path: Path = FX_FILE) -> Tuple[int, int]:
+    """Импорт курсов из CSV с колонками date, currency, rate (USD за единицу).
+
+    Возвращает (принято точек, строк с ошибками); таблица сохраняется в path.
+    """
+    table = load_fx_table(path)
+    by_currency: Dict[str, List[Tuple[str, float]]] = {}
+    errors = 0
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for line_num, row in enumerate(csv.DictReader(f), 2):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            try:
+                rate = float(row["rate"])
+                if not row["currency"] or date_to_day(row["date"]) is None or rate <= 0:
+                    raise ValueError("bad date, currency or rate")
+            except (KeyError, ValueError) as exc:
+                print(f"Line {line_num}: {exc}")
+                errors += 1
+                continue
+            by_currency.setdefault(row["currency"].upper(), []).append((row["date"], rate))
+    imported = sum(table.merge(currency, points) for currency, points in by_currency.items())
+    save_fx_table(table, path)
+    return imported, errors
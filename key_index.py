@@ -0,0 +1,101 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# ──────────────────────────────────────────────────────────────
+#  Индекс дубликатов: приватные ключи и адреса -> id аккаунта
+# ──────────────────────────────────────────────────────────────
+POLICY_SKIP = "skip"
+POLICY_MERGE = "merge"
+POLICY_OVERWRITE = "overwrite"
+DUPLICATE_POLICIES = [POLICY_SKIP, POLICY_MERGE, POLICY_OVERWRITE]
+
+_HEX_RE = re.compile(r"^(0x)?[0-9a-fA-F]+$")
+
+
+def normalize_value(value: Any) -> str:
+    """Приводит ключ/адрес к каноническому виду.
+
+    Hex-строки сравниваются без префикса 0x и без учёта регистра
+    (так совпадут checksum- и lowercase-адреса EVM), остальные
+    форматы (base58, WIF) регистрозависимы и только обрезаются.
+    """
+    if not value:
+        return ""
+    value = str(value).strip()
+    if _HEX_RE.match(value):
+        value = value.lower()
+        if value.startswith("0x"):
+            value = value[2:]
+    return value
+
+
+class KeyIndex:
+    """Хеш-индекс по ключевым полям аккаунтов с поиском за O(1).
+
+    Для каждого поля (приватный ключ или адрес сети) хранится
+    словарь «нормализованное значение -> id аккаунтов». Id — множество:
+    в старых accounts.json у двух аккаунтов бывает один ключ, и удаление
+    одного не должно убирать ключ из индекса, пока его держит другой.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields: List[str] = list(fields)
+        self._index: Dict[str, Dict[str, Set[int]]] = {f: {} for f in self.fields}
+
+    def rebuild(self, accounts: Iterable[Dict[str, Any]]) -> None:
+        for bucket in self._index.values():
+            bucket.clear()
+        for acc in accounts:
+            self.add(acc)
+
+    def add(self, account: Dict[str, Any]) -> None:
+        acc_id = account["id"]
+        for field in self.fields:
+            norm = normalize_value(account.get(field))
+            if norm:
+                self._index[field].setdefault(norm, set()).add(acc_id)
+
+    def remove(self, account: Dict[str, Any]) -> None:
+        acc_id = account["id"]
+        for field in self.fields:
+            norm = normalize_value(account.get(field))
+            holders = self._index[field].get(norm) if norm else None
+            if holders is not None:
+                holders.discard(acc_id)
+                if not holders:
+                    del self._index[field][norm]
+
+    def find(self, account: Dict[str, Any], exclude_id: Optional[int] = None) -> Optional[int]:
+        """Возвращает id существующего аккаунта с тем же ключом или адресом."""
+        for field in self.fields:
+            norm = normalize_value(account.get(field))
+            if not norm:
+                continue
+            found = min((acc_id for acc_id in self._index[field].get(norm, ())
+                         if acc_id != exclude_id), default=None)
+            if found is not None:
+                return found
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._index.values())
+
+
+def apply_duplicate_policy(existing: Dict[str, Any], incoming: Dict[str, Any], policy: str) -> bool:
+    """Сливает входящую запись в существующую согласно политике.
+
+    merge — заполняет только пустые поля, overwrite — заменяет поля
+    непустыми входящими значениями. Возвращает True, если запись изменилась.
+    """
+    if policy == POLICY_SKIP:
+        return False
+    changed = False
+    for field, value in incoming.items():
+        if field == "id" or not value:
+            continue
+        if policy == POLICY_MERGE and existing.get(field):
+            continue
+        if existing.get(field) != value:
+            existing[field] = value
+            changed = True
+    return changed
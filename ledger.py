@@ -0,0 +1,250 @@
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from expenses_data import (
+    CATEGORIES, DATA_DIR, TYPE_EXPENSE, TYPE_INCOME, load_expenses, load_manifest, save_expenses,
+)
+from fx import BASE_CURRENCY, CURRENCIES, FxTable, fx_table, yyyymmdd_to_days
+
+# ──────────────────────────────────────────────────────────────
+#  Бинарный журнал операций только для чтения (для аналитики)
+# ──────────────────────────────────────────────────────────────
+# data/ledger.bin: MAGIC, длина заголовка (uint32), JSON-заголовок с
+# таблицами кодов и сегментами по шардам, выравнивание до 8 байт и
+# дальше строки фиксированной ширины LEDGER_DTYPE. Файл открывается
+# через np.memmap, и агрегаты считаются по столбцам без разбора JSON
+# и без словарей. Суммы хранятся в валюте операции и переводятся в USD
+# при агрегации (fx.FxTable.to_usd_days). Это производные данные: в бэкап не входят и
+# пересобираются из шардов, если отстали от манифеста.
+LEDGER_FILE = DATA_DIR / "ledger.bin"
+LEDGER_MAGIC = b"RHLEDGR1"
+LEDGER_VERSION = 2
+
+LEDGER_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("date", "<i4"),        # YYYYMMDD, 0 — без даты
+    ("amount", "<f8"),      # в валюте операции
+    ("currency", "u1"),     # индекс в header["currencies"]
+    ("type", "u1"),         # индекс в header["types"]
+    ("category", "<u2"),    # индекс в header["categories"]
+    ("project", "<i4"),     # id проекта, -1 — без проекта
+])
+TYPE_CODES = [TYPE_EXPENSE, TYPE_INCOME]
+NO_PROJECT = -1
+
+_HEADER_PREFIX = struct.Struct("<8sI")
+
+
+def _date_code(value: Optional[str]) -> int:
+    if not value or len(value) < 10:
+        return 0
+    try:
+        return int(value[:4] + value[5:7] + value[8:10])
+    except ValueError:
+        return 0
+
+
+def _code(value: str, table: List[str], codes: Dict[str, int]) -> int:
+    code = codes.get(value)
+    if code is None:
+        # Коды только добавляются: старые строки остаются верными
+        code = codes[value] = len(table)
+        table.append(value)
+    return code
+
+
+def _encode(records: List[Dict[str, Any]], tables: Dict[str, List[str]],
+            codes: Dict[str, Dict[str, int]]) -> np.ndarray:
+    rows = np.empty(len(records), dtype=LEDGER_DTYPE)
+    for i, exp in enumerate(records):
+        project_id = exp.get("project_id")
+        rows[i] = (exp["id"], _date_code(exp.get("date")), exp.get("amount", 0) or 0,
+                   _code(exp.get("currency") or BASE_CURRENCY, tables["currencies"], codes["currencies"]),
+                   0 if exp.get("type") == TYPE_EXPENSE else 1,
+                   _code(exp.get("category") or "Other", tables["categories"], codes["categories"]),
+                   NO_PROJECT if project_id is None else project_id)
+    return rows
+
+
+# ──────────────────────────────────────────────────────────────
+#  Чтение
+# ──────────────────────────────────────────────────────────────
+def _read_header(path: Path) -> Tuple[Dict[str, Any], int]:
+    with open(path, "rb") as f:
+        magic, size = _HEADER_PREFIX.unpack(f.read(_HEADER_PREFIX.size))
+        if magic != LEDGER_MAGIC:
+            raise ValueError(f"{path.name}: not a ledger file")
+        header = json.loads(f.read(size).decode("utf-8"))
+    if header.get("version") != LEDGER_VERSION:
+        raise ValueError(f"{path.name}: unsupported ledger version {header.get('version')}")
+    return header, _data_offset(size)
+
+
+def _data_offset(header_size: int) -> int:
+    offset = _HEADER_PREFIX.size + header_size
+    return (offset + 7) // 8 * 8
+
+
+class Ledger:
+    """Журнал, отображённый в память; rows — структурированный массив LEDGER_DTYPE."""
+
+    def __init__(self, path: Path = LEDGER_FILE):
+        self.path = Path(path)
+        self.header, offset = _read_header(self.path)
+        self.types: List[str] = self.header["types"]
+        self.categories: List[str] = self.header["categories"]
+        self.currencies: List[str] = self.header["currencies"]
+        self.segments: Dict[str, Dict[str, Any]] = self.header["segments"]
+        count = self.header["count"]
+        # mmap нулевой длины невозможен — пустой журнал как обычный массив
+        self.rows = (np.memmap(self.path, dtype=LEDGER_DTYPE, mode="r", offset=offset, shape=(count,))
+                     if count else np.empty(0, dtype=LEDGER_DTYPE))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def is_current(self, manifest: Dict[str, Dict[str, Any]]) -> bool:
+        """Совпадают ли сегменты с шардами манифеста (по хешам их текста)."""
+        return ({key: seg["digest"] for key, seg in self.segments.items()}
+                == {key: info.get("digest") for key, info in manifest.items()})
+
+    # ------------------------------------------------------------------
+    #  Агрегаты
+    # ------------------------------------------------------------------
+    def select(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+               project_id: Optional[int] = None) -> np.ndarray:
+        """Строки в диапазоне дат (YYYY-MM-DD) и, при project_id, одного проекта
+        вместе с операциями без проекта — как в filter_expenses."""
+        rows = self.rows
+        mask = np.ones(len(rows), dtype=bool)
+        if date_from:
+            mask &= rows["date"] >= _date_code(date_from)
+        if date_to:
+            mask &= rows["date"] <= _date_code(date_to)
+        if project_id is not None:
+            mask &= (rows["project"] == project_id) | (rows["project"] == NO_PROJECT)
+        return rows[mask]
+
+    def usd(self, rows: np.ndarray, fx: Optional[FxTable] = None) -> np.ndarray:
+        """Суммы строк в USD; без курса — 0 (в итоги не входят)."""
+        dates = rows["date"]
+        days = np.where(dates > 0, yyyymmdd_to_days(np.where(dates > 0, dates, 19700101)), 10 ** 9)
+        amounts = (fx or fx_table()).to_usd_days(rows["amount"], self.currencies, rows["currency"], days)
+        return np.nan_to_num(amounts, nan=0.0)
+
+    def _grouped(self, rows: np.ndarray, keys: np.ndarray) -> Dict[Any, Dict[str, float]]:
+        groups, inverse = np.unique(keys, return_inverse=True)
+        is_expense = rows["type"] == 0
+        amounts = self.usd(rows)
+        spent = np.bincount(inverse, weights=np.where(is_expense, amounts, 0.0), minlength=len(groups))
+        earned = np.bincount(inverse, weights=np.where(is_expense, 0.0, amounts), minlength=len(groups))
+        return {group.item(): {"expenses": float(s), "incomes": float(e)}
+                for group, s, e in zip(groups, spent, earned)}
+
+    def totals(self, rows: Optional[np.ndarray] = None) -> Dict[str, float]:
+        rows = self.rows if rows is None else rows
+        is_expense = rows["type"] == 0
+        amounts = self.usd(rows)
+        return {"expenses": float(amounts[is_expense].sum()),
+                "incomes": float(amounts[~is_expense].sum())}
+
+    def by_month(self, rows: Optional[np.ndarray] = None) -> Dict[str, Dict[str, float]]:
+        rows = self.rows if rows is None else rows
+        rows = rows[rows["date"] > 0]
+        grouped = self._grouped(rows, rows["date"] // 100)
+        return {f"{month // 100:04d}-{month % 100:02d}": t for month, t in grouped.items()}
+
+    def by_year(self, rows: Optional[np.ndarray] = None) -> Dict[str, Dict[str, float]]:
+        rows = self.rows if rows is None else rows
+        rows = rows[rows["date"] > 0]
+        return {str(year): t for year, t in self._grouped(rows, rows["date"] // 10000).items()}
+
+    def by_category(self, rows: Optional[np.ndarray] = None) -> Dict[str, Dict[str, float]]:
+        rows = self.rows if rows is None else rows
+        return {self.categories[code]: t for code, t in self._grouped(rows, rows["category"]).items()}
+
+    def by_project(self, rows: Optional[np.ndarray] = None) -> Dict[Optional[int], Dict[str, float]]:
+        rows = self.rows if rows is None else rows
+        return {None if project == NO_PROJECT else project: t
+                for project, t in self._grouped(rows, rows["project"]).items()}
+
+
+def open_ledger(path: Path = LEDGER_FILE) -> Ledger:
+    """Журнал для отчётов; отсутствующий или отставший от шардов пересобирается."""
+    manifest = load_manifest()
+    if path.exists():
+        try:
+            ledger = Ledger(path)
+            if ledger.is_current(manifest):
+                return ledger
+        except (OSError, ValueError) as exc:
+            print(f"[ledger] {path.name}: {exc}; rebuilding")
+    rebuild_ledger(path)
+    return Ledger(path)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Запись
+# ──────────────────────────────────────────────────────────────
+def update_ledger(groups: Dict[str, List[Dict[str, Any]]], digests: Dict[str, str],
+                  path: Path = LEDGER_FILE) -> int:
+    """Пересобирает журнал после save_expenses; возвращает число перекодированных строк.
+
+    Сегмент шарда с тем же хешом, что в старом файле, копируется из
+    него как есть — кодируются только строки изменившихся шардов.
+    """
+    old: Optional[Ledger] = None
+    if path.exists():
+        try:
+            old = Ledger(path)
+        except (OSError, ValueError) as exc:
+            print(f"[ledger] {path.name}: {exc}; rebuilding")
+    tables = {
+        "categories": list(old.categories) if old is not None else list(CATEGORIES),
+        "currencies": list(old.currencies) if old is not None else list(CURRENCIES),
+    }
+    codes = {name: {value: code for code, value in enumerate(table)} for name, table in tables.items()}
+
+    parts: List[np.ndarray] = []
+    segments: Dict[str, Dict[str, Any]] = {}
+    offset = encoded = 0
+    for key in sorted(groups):
+        records = groups[key]
+        seg = old.segments.get(key) if old is not None else None
+        if seg is not None and seg["digest"] == digests[key] and seg["count"] == len(records):
+            part = np.array(old.rows[seg["offset"]:seg["offset"] + seg["count"]])
+        else:
+            part = _encode(records, tables, codes)
+            encoded += len(records)
+        parts.append(part)
+        segments[key] = {"offset": offset, "count": len(part), "digest": digests[key]}
+        offset += len(part)
+    rows = np.concatenate(parts) if parts else np.empty(0, dtype=LEDGER_DTYPE)
+    del old     # отпускаем mmap до подмены файла (Windows)
+
+    header = json.dumps({
+        "version": LEDGER_VERSION, "count": len(rows), "types": TYPE_CODES,
+        "categories": tables["categories"], "currencies": tables["currencies"], "segments": segments,
+    }, ensure_ascii=False).encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER_PREFIX.pack(LEDGER_MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\0" * (_data_offset(len(header)) - _HEADER_PREFIX.size - len(header)))
+        rows.tofile(f)
+    os.replace(tmp, path)
+    return encoded
+
+
+def rebuild_ledger(path: Path = LEDGER_FILE) -> None:
+    """Пересборка из шардов (после восстановления бэкапа, правки руками).
+
+    Это обычное сохранение прочитанного журнала: шарды не меняются и не
+    переписываются, манифест получает хеши, журнал — недостающие сегменты.
+    """
+    save_expenses(load_expenses(), ledger_path=path)
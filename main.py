@@ -1,28 +1,100 @@
 import flet as ft
 import asyncio
-from accounts import AccountsManager
-from projects import ProjectsManager
-from expenses import ExpensesManager
+from accounts import AccountsManager, DATA_DIR, JSON_FILE as ACCOUNTS_FILE
+from projects import ProjectsManager, PROJECTS_FILE
+from expenses import ExpensesManager, EXPENSES_MANIFEST
+from backup import BackupStore
+from budgets import tracker_from_env
+from crypto_store import encryption_enabled, unlock, unlock_from_env
 from dashboard import DashboardManager
+from fx import FX_FILE, reload_fx_table
+from profiler import profiler_from_env
+from recurring import RECURRING_FILE, load_recurring
+from store import DataStore
+from watcher import DataWatcher
 
 
-def main(page: ft.Page):
+async def ask_password(page: ft.Page) -> None:
+    """Пароль к зашифрованным аккаунтам; ключ выводится один раз за сессию."""
+    unlocked = asyncio.get_running_loop().create_future()
+    password_field = ft.TextField(label="Password", password=True, can_reveal_password=True, autofocus=True)
+
+    async def on_unlock(e):
+        try:
+            # scrypt занимает доли секунды и сотню МБ — не в event loop
+            await asyncio.to_thread(unlock, password_field.value or "")
+        except ValueError as exc:
+            password_field.error_text = str(exc)
+            dlg.update()
+            return
+        dlg.open = False
+        page.update()
+        unlocked.set_result(None)
+
+    password_field.on_submit = on_unlock
+    dlg = ft.AlertDialog(
+        modal=True,
+        title=ft.Text("Unlock accounts"),
+        content=password_field,
+        actions=[ft.ElevatedButton("Unlock", on_click=on_unlock)],
+    )
+    page.show_dialog(dlg)
+    await unlocked
+
+
+async def main(page: ft.Page):
     page.title = "Retro activities tracker"
     page.theme_mode = ft.ThemeMode.DARK
     page.padding = 0
     page.width = 1200
     page.height = 900
 
+    if encryption_enabled():
+        try:
+            cipher = unlock_from_env()
+        except ValueError as exc:
+            print(f"[crypto] {exc}")
+            cipher = None
+        if cipher is None:
+            await ask_password(page)
+
     def update_content_area(new_content: ft.Container):
         content_area.content = new_content
         page.update()
 
-    accounts_manager = AccountsManager(page, update_content_area)
-    projects_manager = ProjectsManager(page, update_content_area, accounts_manager)
-    expenses_manager = ExpensesManager(page, update_content_area, accounts_manager, projects_manager)
+    # Общие данные: менеджеры подписываются на события изменений
+    store = DataStore.from_disk()
+    accounts_manager = AccountsManager(page, update_content_area, store)
+    projects_manager = ProjectsManager(page, update_content_area, accounts_manager, store)
+    expenses_manager = ExpensesManager(page, update_content_area, accounts_manager, projects_manager, store)
     projects_manager.set_expenses_manager(expenses_manager)
 
-    dashboard_manager = DashboardManager(page, accounts_manager, projects_manager, expenses_manager)
+    dashboard_manager = DashboardManager(page, accounts_manager, projects_manager, expenses_manager, store)
+    current_view = {"name": "dashboard"}
+
+    # Профилировщик обработчиков (RETROHUNTER_PROFILE=1)
+    profiler = profiler_from_env()
+    if profiler:
+        for manager in (accounts_manager, projects_manager, expenses_manager, dashboard_manager):
+            profiler.instrument(manager)
+        profiler.instrument_page(page)
+
+    # Бюджеты контролов и памяти на view (RETROHUNTER_BUDGETS=1)
+    budget_tracker = tracker_from_env()
+    if budget_tracker:
+        views = {
+            "wallets": accounts_manager, "projects": projects_manager,
+            "expenses": expenses_manager, "dashboard": dashboard_manager,
+        }
+        for view_name, manager in views.items():
+            budget_tracker.instrument(view_name, manager)
+
+        def on_budget_violation(report, problems):
+            page.snack_bar = ft.SnackBar(
+                ft.Text(f"{report.view} over budget: {'; '.join(problems)}"), open=True
+            )
+
+        budget_tracker.on_violation = on_budget_violation
 
     def on_menu_click(e: ft.ControlEvent):
         for item in menu_items:
@@ -34,10 +106,11 @@ def main(page: ft.Page):
         if isinstance(e.control.content, ft.Row) and len(e.control.content.controls) > 1 and isinstance(e.control.content.controls[1], ft.Text):
             e.control.content.controls[1].color = ft.Colors.WHITE
 
+        current_view["name"] = e.control.data
         if e.control.data == "dashboard":
             content_area.content = dashboard_manager.get_view()
         elif e.control.data == "wallets":
-            asyncio.create_task(accounts_manager.get_view_async())
+            page.run_task(accounts_manager.get_view_async)
         elif e.control.data == "projects":
             content_area.content = projects_manager.get_view()
         elif e.control.data == "expenses":
@@ -114,7 +187,133 @@ def main(page: ft.Page):
         ], expand=True, vertical_alignment=ft.CrossAxisAlignment.STRETCH)
     )
 
+    # Индикатор фоновой записи: UI уже обновлён, файл пишется в executor-е
+    saving_indicator = ft.Container(
+        content=ft.Row([
+            ft.ProgressRing(width=14, height=14, stroke_width=2),
+            ft.Text("Saving…", size=12, color=ft.Colors.GREY_300),
+        ], spacing=8, tight=True),
+        left=10,
+        bottom=10,
+        padding=ft.padding.symmetric(horizontal=10, vertical=6),
+        border_radius=8,
+        bgcolor=ft.Colors.with_opacity(0.85, ft.Colors.BLACK),
+        visible=False,
+    )
+    page.overlay.append(saving_indicator)
+
+    def on_saving_state(pending: int):
+        if saving_indicator.visible != (pending > 0):
+            saving_indicator.visible = pending > 0
+            saving_indicator.update()
+        if pending == 0:
+            page.run_thread(auto_backup)
+
+    # Инкрементальный снимок data/ не чаще раза в AUTO_BACKUP_INTERVAL
+    backups = BackupStore()
+
+    def auto_backup():
+        try:
+            result = backups.maybe_snapshot()
+            if result:
+                print(f"[backup] {result.summary()}")
+        except Exception as exc:
+            print(f"[backup] snapshot failed: {exc}")
+
+    def on_save_error(name: str, exc: Exception):
+        page.snack_bar = ft.SnackBar(ft.Text(f"Failed to save {name}: {exc}"), open=True)
+        page.update()
+
+    store.saver.on_state = on_saving_state
+    store.saver.on_error = on_save_error
+
+    # Повторяющиеся операции: дописываем периоды, наступившие с прошлого запуска
+    materialized = store.materialize_recurring()
+    if materialized:
+        print(f"[recurring] added {len(materialized)} operations")
+
+        async def save_materialized():
+            await store.save("expenses")
+            await store.save("recurring")
+
+        page.run_task(save_materialized)
+
+    if profiler:
+        profiler.attach_overlay(page)
     page.update()
+    page.run_thread(auto_backup)
+
+    def render_current_view():
+        name = current_view["name"]
+        if name == "dashboard":
+            update_content_area(dashboard_manager.get_view())
+        elif name == "wallets":
+            update_content_area(accounts_manager.get_view())
+        elif name == "projects":
+            update_content_area(projects_manager.get_view())
+        elif name == "expenses":
+            update_content_area(expenses_manager.get_view())
+
+    # Undo/redo: Ctrl+Z, Ctrl+Shift+Z / Ctrl+Y (Cmd на macOS)
+    async def on_keyboard(e: ft.KeyboardEvent):
+        if not (e.ctrl or e.meta) or e.key.upper() not in ("Z", "Y"):
+            return
+        redo = e.key.upper() == "Y" or e.shift
+        entry = store.history.redo() if redo else store.history.undo()
+        if entry is None:
+            return
+        render_current_view()
+        page.snack_bar = ft.SnackBar(ft.Text(f"{'Redo' if redo else 'Undo'}: {entry.label}"), open=True)
+        page.update()
+        await store.save_entry(entry)
+
+    page.on_keyboard_event = on_keyboard
+
+    # Перезагрузка при внешних изменениях файлов данных; шарды операций
+    # всегда пишутся вместе с манифестом, поэтому следим за ним.
+    # Watchdog сообщает из потока таймера, а хранилище, индексы и UI
+    # меняются только в event loop — перезагрузка уходит туда через run_task
+    expenses_name = EXPENSES_MANIFEST.relative_to(DATA_DIR).as_posix()
+
+    async def on_data_files_changed(names):
+        affected = set()
+        if ACCOUNTS_FILE.name in names and accounts_manager.reload_from_disk():
+            affected |= {"wallets", "dashboard"}
+        if PROJECTS_FILE.name in names and projects_manager.reload_from_disk():
+            affected |= {"projects", "expenses", "dashboard"}
+        if expenses_name in names and expenses_manager.reload_from_disk():
+            affected |= {"expenses", "projects", "dashboard"}
+        if RECURRING_FILE.name in names:
+            # cli.py recurring run сдвигает materialized_to — иначе следующее
+            # сохранение шаблонов из GUI вернуло бы старые значения
+            with store.history.external_change():
+                if store.recurring.replace_all(load_recurring()):
+                    affected.add("expenses")
+        if FX_FILE.name in names:
+            # Новые курсы: итоги в USD пересчитываются, сами операции не меняются
+            reload_fx_table()
+            store.expense_totals.rebuild(store.expenses.records)
+            store.attribution.invalidate()
+            dashboard_manager.invalidate()
+            affected |= {"expenses", "projects", "dashboard"}
+
+        if current_view["name"] in affected:
+            render_current_view()
+
+    data_watcher = DataWatcher(
+        DATA_DIR,
+        [ACCOUNTS_FILE.name, PROJECTS_FILE.name, expenses_name, RECURRING_FILE.name, FX_FILE.name],
+        lambda names: page.run_task(on_data_files_changed, names),
+    )
+    data_watcher.start()
+
+    # Сессия aiohttp загрузчика балансов живёт до отключения страницы;
+    # после переподключения она создаётся заново при первом обновлении
+    async def on_page_closed(e):
+        await accounts_manager.close_async()
+
+    page.on_disconnect = on_page_closed
+    page.on_close = on_page_closed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from networks import NETWORKS, derive_address
+
+# ──────────────────────────────────────────────────────────────
+#  Версии схемы файлов данных и миграции
+# ──────────────────────────────────────────────────────────────
+# Файл пишется как {"schema_version": N, "records": [...]}; старый
+# формат — голый список — считается версией 0. Миграции прогоняются
+# один раз при загрузке файла старой версии, после чего файл
+# пересохраняется, и дальше загрузка — просто json.loads.
+VERSION_FIELD = "schema_version"
+RECORDS_FIELD = "records"
+
+Migration = Callable[[List[Dict[str, Any]], Dict[str, Any]], None]
+
+
+def _accounts_v1(records: List[Dict[str, Any]], options: Dict[str, Any]) -> None:
+    """Поля всех сетей и адреса по приватным ключам (раньше — при каждой загрузке)."""
+    derive = options.get("derive", True)
+    for acc in records:
+        for net in NETWORKS:
+            acc.setdefault(net["field"], "")
+            acc.setdefault(net["address_field"], "")
+            if derive and not acc[net["address_field"]] and acc[net["field"]]:
+                acc[net["address_field"]] = derive_address(net["id"], acc[net["field"]])
+
+
+def _projects_v1(records: List[Dict[str, Any]], options: Dict[str, Any]) -> None:
+    for proj in records:
+        proj.setdefault("network", "EVM")
+        proj.setdefault("image_path", None)
+        proj.setdefault("archived", False)
+        proj.setdefault("tags", [])
+
+
+def _expenses_v1(records: List[Dict[str, Any]], options: Dict[str, Any]) -> None:
+    """account_id → account_ids, сеть и тип по умолчанию."""
+    for exp in records:
+        if exp.get("account_id") is not None:
+            exp["account_ids"] = [exp["account_id"]]
+        else:
+            exp.setdefault("account_ids", [])
+        exp.pop("account_id", None)
+        exp.setdefault("network", "evm")
+        exp.setdefault("type", "expense")
+
+
+def _expenses_v2(records: List[Dict[str, Any]], options: Dict[str, Any]) -> None:
+    """Валюта операции; всё, что было до неё, записывалось в USD."""
+    for exp in records:
+        exp.setdefault("currency", "USD")
+
+
+# MIGRATIONS[name][i] переводит записи из версии i в i + 1. Шаги не
+# меняются задним числом: новое поле (в том числе новая сеть в
+# NETWORKS) — новый шаг в конце списка.
+MIGRATIONS: Dict[str, List[Migration]] = {
+    "accounts": [_accounts_v1],
+    "projects": [_projects_v1],
+    "expenses": [_expenses_v1, _expenses_v2],
+    "recurring": [],
+}
+
+
+def schema_version(name: str) -> int:
+    return len(MIGRATIONS[name])
+
+
+def migrate(name: str, records: List[Dict[str, Any]], version: int, **options: Any) -> int:
+    """Прогоняет шаги с version до текущей; возвращает число применённых."""
+    current = schema_version(name)
+    if version > current:
+        raise ValueError(f"{name}: data schema v{version} is newer than supported v{current}; update the app")
+    for step in MIGRATIONS[name][version:]:
+        step(records, options)
+    return current - version
+
+
+# ──────────────────────────────────────────────────────────────
+#  Чтение и запись версионированных файлов
+# ──────────────────────────────────────────────────────────────
+def decode_records(path: Path, text: str) -> Tuple[List[Dict[str, Any]], int]:
+    """Записи и версия схемы из текста файла (голый список — версия 0)."""
+    data = json.loads(text)
+    if isinstance(data, list):
+        return data, 0
+    if not isinstance(data, dict) or not isinstance(data.get(RECORDS_FIELD), list):
+        raise ValueError(f"{path.name}: unrecognised data file format")
+    return data[RECORDS_FIELD], int(data.get(VERSION_FIELD, 0))
+
+
+def read_records(path: Path) -> Tuple[List[Dict[str, Any]], int]:
+    return decode_records(path, path.read_text(encoding="utf-8"))
+
+
+def encode_records(name: str, records: List[Dict[str, Any]]) -> str:
+    payload = {VERSION_FIELD: schema_version(name), RECORDS_FIELD: records}
+    # default=dict — для компактных записей records.Record
+    return json.dumps(payload, indent=4, ensure_ascii=False, default=dict)
+
+
+def replace_file(path: Path, text: str) -> None:
+    """Пишет во временный файл и подменяет: при сбое старый файл остаётся целым."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_records(path: Path, name: str, records: List[Dict[str, Any]]) -> None:
+    """Пишет записи с текущей версией схемы через временный файл."""
+    replace_file(path, encode_records(name, records))
+
+
+def log_migration(path: Path, name: str, version: int, count: int) -> None:
+    print(f"[migrations] {path.name}: schema v{version} → v{schema_version(name)} ({count} records)")
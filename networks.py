@@ -0,0 +1,103 @@
+import hashlib
+import binascii
+from typing import Any, Dict, List, Optional
+
+from eth_account import Account as EthAccount
+from solders.keypair import Keypair as SolKeypair
+from aptos_sdk.account import Account as AptosAccount
+from bitcoinlib.keys import HDKey
+
+# ──────────────────────────────────────────────────────────────
+#  Вывод адресов из приватных ключей
+# ──────────────────────────────────────────────────────────────
+def _derive_evm(priv_key: str) -> str:
+    return EthAccount.from_key(priv_key).address
+
+
+def _derive_sol(priv_key: str) -> str:
+    try:
+        return str(SolKeypair.from_base58_string(priv_key).pubkey())
+    except Exception:
+        secret = bytes.fromhex(priv_key)
+        return str(SolKeypair.from_bytes(secret).pubkey())
+
+
+def _derive_sui(priv_key: str) -> str:
+    priv_bytes = bytes.fromhex(priv_key)
+    pub_bytes = EthAccount.from_key(priv_bytes).public_key
+    addr = hashlib.sha256(pub_bytes).digest()[:20]
+    return "0x" + binascii.hexlify(addr).decode()
+
+
+def _derive_aptos(priv_key: str) -> str:
+    return AptosAccount(priv_key).address().hex()
+
+
+def _derive_btc(priv_key: str) -> str:
+    return HDKey(import_key=priv_key).address()
+
+
+# ──────────────────────────────────────────────────────────────
+#  Реестр сетей
+# ──────────────────────────────────────────────────────────────
+# id      — ключ сети в аккаунтах и операциях
+# label   — подпись в UI (проекты хранят именно её)
+# aliases — прежние значения из сохранённых файлов
+# color   — цвет радиокнопки (строковое имя цвета Flet)
+# symbol  — нативная монета сети
+# rpc     — протокол RPC для балансов (см. rpc.py), None — не поддерживается
+NETWORKS: List[Dict[str, Any]] = [
+    {"id": "evm",   "label": "EVM",     "field": "evm_private_key",   "address_field": "evm_address",
+     "aliases": [], "color": "blue400", "symbol": "ETH", "rpc": "evm", "derive": _derive_evm},
+    {"id": "sol",   "label": "Solana",  "field": "sol_private_key",   "address_field": "solana_address",
+     "aliases": ["solana"], "color": "purple400", "symbol": "SOL", "rpc": "solana", "derive": _derive_sol},
+    {"id": "sui",   "label": "Sui",     "field": "sui_private_key",   "address_field": "sui_address",
+     "aliases": [], "color": "cyan400", "symbol": "SUI", "rpc": None, "derive": _derive_sui},
+    {"id": "aptos", "label": "Aptos",   "field": "aptos_private_key", "address_field": "aptos_address",
+     "aliases": [], "color": "teal400", "symbol": "APT", "rpc": None, "derive": _derive_aptos},
+    {"id": "btc",   "label": "Bitcoin", "field": "btc_private_key",   "address_field": "btc_address",
+     "aliases": [], "color": "orange400", "symbol": "BTC", "rpc": None, "derive": _derive_btc},
+]
+
+# Любое известное обозначение сети (id, подпись, алиас) -> описание сети
+NETWORKS_BY_ID: Dict[str, Dict[str, Any]] = {}
+for _net in NETWORKS:
+    for _name in [_net["id"], _net["label"], *_net["aliases"]]:
+        NETWORKS_BY_ID[_name] = NETWORKS_BY_ID[_name.lower()] = _net
+
+DEFAULT_NETWORK = NETWORKS[0]
+
+
+def get_network(value: Optional[str]) -> Dict[str, Any]:
+    """Описание сети по id, подписи или алиасу; по умолчанию EVM."""
+    if not value:
+        return DEFAULT_NETWORK
+    return NETWORKS_BY_ID.get(value) or NETWORKS_BY_ID.get(value.lower(), DEFAULT_NETWORK)
+
+
+def derive_address(network: str, priv_key: str) -> str:
+    if not priv_key:
+        return ""
+    net = NETWORKS_BY_ID.get(network)
+    if net is None:
+        return ""
+    try:
+        return net["derive"](priv_key)
+    except Exception as exc:
+        print(f"[derive_address] {network} error: {exc}")
+    return ""
+
+
+def shorten(value: str, head: int = 4, tail: int = 4, sep: str = "...") -> str:
+    if len(value) <= head + tail:
+        return value
+    return f"{value[:head]}{sep}{value[-tail:]}"
+
+
+def short_display(acc: Dict[str, Any], network: Dict[str, Any]) -> str:
+    """Короткое представление аккаунта в сети: адрес, иначе ключ."""
+    address = acc.get(network["address_field"])
+    if address:
+        return shorten(address)
+    key = acc.get(network["field"], "")
+    return shorten(key) if key else f"No {network['label']}"
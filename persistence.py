@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# ──────────────────────────────────────────────────────────────
+#  Фоновая запись файлов данных
+# ──────────────────────────────────────────────────────────────
+WORK_THREADS = 4        # потоков для вычислений вне event loop (вывод адресов и т.п.)
+
+Writer = Callable[[List[Dict[str, Any]]], None]
+Snapshot = Callable[[], List[Dict[str, Any]]]      # копия записей коллекции (store.Collection.snapshot)
+
+
+class AsyncSaver:
+    """Пишет коллекции на диск вне event loop, по одному писателю на файл.
+
+    Запись каждой коллекции идёт в своём однопоточном executor-е, поэтому
+    записи одного файла строго последовательны. Копия записей снимается
+    там же, в executor-е, а не в event loop: на 100k операций это доли
+    секунды. Если пока идёт запись пришло несколько новых сохранений,
+    копия снимается и пишется один раз — уже со всеми изменениями.
+    on_state(число незавершённых сохранений) — для индикатора.
+    """
+
+    def __init__(self, writers: Dict[str, Writer]):
+        self.writers = writers
+        self.on_state: Optional[Callable[[int], None]] = None
+        self.on_error: Optional[Callable[[str, Exception], None]] = None
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._work_executor: Optional[ThreadPoolExecutor] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._latest: Dict[str, Snapshot] = {}
+        self._pending = 0
+        self._state_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def _executor(self, name: str) -> ThreadPoolExecutor:
+        if name not in self._executors:
+            self._executors[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"save-{name}")
+        return self._executors[name]
+
+    def _set_pending(self, delta: int) -> None:
+        with self._state_lock:
+            self._pending += delta
+            pending = self._pending
+        if self.on_state:
+            try:
+                self.on_state(pending)
+            except Exception as exc:
+                print(f"[save] indicator failed: {exc}")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _write(self, name: str, snapshot: Snapshot) -> None:
+        try:
+            self.writers[name](snapshot())
+        except Exception as exc:
+            print(f"[save] {name}: {exc}")
+            if self.on_error:
+                self.on_error(name, exc)
+
+    # ------------------------------------------------------------------
+    async def save(self, name: str, snapshot: Snapshot) -> None:
+        """Копия (snapshot()) и запись — в фоне; в event loop только постановка в очередь."""
+        self._latest[name] = snapshot
+        self._set_pending(1)
+        try:
+            lock = self._locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                snapshot = self._latest.pop(name, None)
+                if snapshot is None:
+                    return      # уже записано вместе с предыдущим сохранением
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor(name), self._write, name, snapshot)
+        finally:
+            self._set_pending(-1)
+
+    def save_sync(self, name: str, snapshot: Snapshot) -> None:
+        """Запись из рабочего потока: через тот же executor и с ожиданием."""
+        # Отложенное асинхронное сохранение покрывается этим — писать его уже незачем
+        self._latest.pop(name, None)
+        self._set_pending(1)
+        try:
+            self._executor(name).submit(self._write, name, snapshot).result()
+        finally:
+            self._set_pending(-1)
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Выполняет вычисление в пуле потоков, не блокируя UI."""
+        if self._work_executor is None:
+            self._work_executor = ThreadPoolExecutor(max_workers=WORK_THREADS, thread_name_prefix="work")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._work_executor, func, *args)
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        if self._work_executor is not None:
+            self._work_executor.shutdown(wait=False)
@@ -0,0 +1,256 @@
+import asyncio
+import fnmatch
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import flet as ft
+
+# ──────────────────────────────────────────────────────────────
+#  Профилировщик обработчиков и построения view (опционально)
+# ──────────────────────────────────────────────────────────────
+PROFILE_ENV = "RETROHUNTER_PROFILE"   # RETROHUNTER_PROFILE=1 python main.py
+TRACE_DIR = Path("data")
+
+# Методы менеджеров, которые оборачиваются по умолчанию (шаблоны fnmatch)
+DEFAULT_HANDLERS = (
+    "get_view", "get_view_async", "_build_table", "_build_view", "_create_expenses_table", "_build_charts",
+    "apply_filters", "toggle_charts", "on_*_change", "save_*", "_store_account",
+    "reload_from_disk", "refresh_finances",
+)
+
+SAMPLES_PER_HANDLER = 1000       # длительностей на обработчик для p50/p95
+MAX_TRACE_EVENTS = 200_000
+OVERLAY_REFRESH = 1.0            # секунд между обновлениями оверлея
+
+# Атрибуты контролов, по которым обход дерева не идёт
+_SKIP_ATTRS = {"page", "parent", "data"}
+
+
+def iter_controls(root: Any) -> Iterator[Any]:
+    """Обходит дерево контролов Flet (content, controls, actions, options…)."""
+    stack = [root]
+    seen = set()
+    while stack:
+        control = stack.pop()
+        if id(control) in seen:
+            continue
+        seen.add(id(control))
+        yield control
+        for name, value in getattr(control, "__dict__", {}).items():
+            if name.startswith("_") or name in _SKIP_ATTRS:
+                continue
+            if isinstance(value, ft.BaseControl):
+                stack.append(value)
+            elif isinstance(value, (list, tuple)):
+                stack.extend(v for v in value if isinstance(v, ft.BaseControl))
+
+
+def measure_tree(root: Any) -> Tuple[int, int]:
+    """(число контролов, примерный объём строковых свойств в байтах).
+
+    Строки — основная часть того, что уходит клиенту при page.update():
+    тексты, подсказки и base64-картинки графиков.
+    """
+    count = payload = 0
+    for control in iter_controls(root):
+        count += 1
+        for name, value in control.__dict__.items():
+            if isinstance(value, str) and not name.startswith("_"):
+                payload += len(value)
+    return count, payload
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class HandlerStats:
+    def __init__(self):
+        self.calls = 0
+        self.durations: Deque[float] = deque(maxlen=SAMPLES_PER_HANDLER)
+        self.controls: Optional[int] = None
+        self.payload: Optional[int] = None
+
+    def summary(self) -> Tuple[float, float]:
+        values = sorted(self.durations)
+        return percentile(values, 0.5), percentile(values, 0.95)
+
+
+class Profiler:
+    """Замеряет время обработчиков, размер построенных деревьев и page.update().
+
+    Каждый вызов — span в формате Chrome Trace Event («X»); файл
+    открывается в chrome://tracing или ui.perfetto.dev. Вложенные
+    вызовы (apply_filters → get_view → _build_table) видны как стек.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, HandlerStats] = {}
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=MAX_TRACE_EVENTS)
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._overlay_rows: Optional[ft.Column] = None
+        self._overlay: Optional[ft.Container] = None
+        self._page: Optional[ft.Page] = None
+
+    # ------------------------------------------------------------------
+    #  Запись
+    # ------------------------------------------------------------------
+    def record(self, name: str, start: float, end: float, result: Any = None) -> None:
+        controls = payload = None
+        if isinstance(result, ft.BaseControl):
+            controls, payload = measure_tree(result)
+        duration = end - start
+        with self._lock:
+            stats = self.stats.setdefault(name, HandlerStats())
+            stats.calls += 1
+            stats.durations.append(duration)
+            if controls is not None:
+                stats.controls, stats.payload = controls, payload
+            args = {} if controls is None else {"controls": controls, "payload_bytes": payload}
+            self.events.append({
+                "name": name, "cat": name.split(".")[0], "ph": "X",
+                "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+                "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+            })
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = await func(*args, **kwargs)
+                self.record(name, start, time.perf_counter(), result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.record(name, start, time.perf_counter(), result)
+            return result
+        return wrapper
+
+    def instrument(self, manager: Any, patterns: Tuple[str, ...] = DEFAULT_HANDLERS) -> List[str]:
+        """Подменяет подходящие методы экземпляра обёртками; возвращает их имена.
+
+        Обёртка ставится на экземпляр, поэтому и обработчики, привязанные
+        при следующем построении view, и внутренние вызовы self.* идут через неё.
+        """
+        wrapped = []
+        cls_name = type(manager).__name__
+        for attr, value in inspect.getmembers(type(manager), inspect.isfunction):
+            if any(fnmatch.fnmatchcase(attr, p) for p in patterns):
+                setattr(manager, attr, self.wrap(f"{cls_name}.{attr}", getattr(manager, attr)))
+                wrapped.append(attr)
+        return wrapped
+
+    def instrument_page(self, page: ft.Page) -> None:
+        # Мимо __setattr__ контрола: это не свойство страницы для клиента
+        object.__setattr__(page, "update", self.wrap("page.update", page.update))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+            self.events.clear()
+
+    # ------------------------------------------------------------------
+    #  Экспорт трассы
+    # ------------------------------------------------------------------
+    def export_trace(self, path: Optional[Path] = None) -> Path:
+        path = Path(path or TRACE_DIR / f"trace_{datetime.now():%Y%m%d_%H%M%S}.json")
+        path.parent.mkdir(exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        meta = [{"name": "process_name", "ph": "M", "pid": os.getpid(),
+                 "args": {"name": "retrohunter"}}]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    # ------------------------------------------------------------------
+    #  Оверлей p50/p95
+    # ------------------------------------------------------------------
+    def attach_overlay(self, page: ft.Page) -> None:
+        self._page = page
+        self._overlay_rows = ft.Column(spacing=2, tight=True)
+
+        def on_export(e):
+            path = self.export_trace()
+            page.snack_bar = ft.SnackBar(ft.Text(f"Trace saved: {path}"), open=True)
+            page.update()
+
+        def on_reset(e):
+            self.reset()
+            self._refresh_overlay()
+
+        def on_toggle(e):
+            self._overlay_rows.visible = not self._overlay_rows.visible
+            self._overlay.update()
+
+        self._overlay = ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Text("Profiler", weight=ft.FontWeight.BOLD, size=12),
+                    ft.TextButton("Trace", on_click=on_export),
+                    ft.TextButton("Reset", on_click=on_reset),
+                    ft.TextButton("Hide/Show", on_click=on_toggle),
+                ], spacing=4),
+                self._overlay_rows,
+            ], spacing=4, tight=True),
+            right=10,
+            bottom=10,
+            width=560,
+            padding=8,
+            border_radius=8,
+            bgcolor=ft.Colors.with_opacity(0.85, ft.Colors.BLACK),
+        )
+        page.overlay.append(self._overlay)
+        page.run_task(self._overlay_loop)
+
+    def _overlay_lines(self) -> List[str]:
+        with self._lock:
+            items = [(name, s.calls, *s.summary(), s.controls, s.payload) for name, s in self.stats.items()]
+        items.sort(key=lambda item: item[3], reverse=True)
+        lines = [f"{'handler':<36}{'n':>5}{'p50ms':>8}{'p95ms':>8}{'ctrls':>8}{'KB':>8}"]
+        for name, calls, p50, p95, controls, payload in items:
+            lines.append(
+                f"{name[-36:]:<36}{calls:>5}{p50 * 1000:>8.1f}{p95 * 1000:>8.1f}"
+                f"{controls if controls is not None else '-':>8}"
+                f"{f'{payload / 1024:.0f}' if payload is not None else '-':>8}"
+            )
+        return lines
+
+    def _refresh_overlay(self) -> None:
+        if self._overlay_rows is None:
+            return
+        self._overlay_rows.controls = [
+            ft.Text(line, size=11, font_family="monospace", no_wrap=True) for line in self._overlay_lines()
+        ]
+        self._overlay.update()
+
+    async def _overlay_loop(self) -> None:
+        while self._overlay is not None:
+            await asyncio.sleep(OVERLAY_REFRESH)
+            try:
+                if self._overlay_rows.visible:
+                    self._refresh_overlay()
+            except Exception as exc:
+                print(f"[profiler] overlay refresh failed: {exc}")
+
+
+def profiler_from_env() -> Optional[Profiler]:
+    """Profiler, если задана переменная RETROHUNTER_PROFILE, иначе None."""
+    return Profiler() if os.environ.get(PROFILE_ENV) else None
@@ -1,54 +1,16 @@
 import flet as ft
-import json
 import datetime
 import shutil
 import os
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from accounts import AccountsManager
-
-# ──────────────────────────────────────────────────────────────────────────────
-# Константы и утилиты
-# ──────────────────────────────────────────────────────────────────────────────
-DATA_DIR = Path("data")
-PROJECTS_FILE = DATA_DIR / "projects.json"
-IMAGES_DIR = DATA_DIR / "images"
-
-NETWORK_EVM = "EVM"
-NETWORK_SOLANA = "Solana"
-
-
-def ensure_data_dir() -> None:
-    DATA_DIR.mkdir(exist_ok=True)
-    IMAGES_DIR.mkdir(exist_ok=True)
-
-
-def load_projects() -> List[Dict[str, Any]]:
-    """Читает файл с проектами, создаёт его при отсутствии."""
-    ensure_data_dir()
-    if not PROJECTS_FILE.exists():
-        with open(PROJECTS_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, indent=4, ensure_ascii=False)
-        return []
-
-    with open(PROJECTS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for proj in data:
-        proj.setdefault("network", NETWORK_EVM)
-        proj.setdefault("image_path", None)
-        proj.setdefault("archived", False)
-        proj.setdefault("tags", [])
-
-    return data
-
-
-def save_projects(projects: List[Dict[str, Any]]) -> None:
-    """Записывает список проектов в JSON‑файл."""
-    ensure_data_dir()
-    with open(PROJECTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(projects, f, indent=4, ensure_ascii=False)
-
+from networks import NETWORKS, get_network, short_display
+from projects_data import (
+    DATA_DIR, PROJECTS_FILE, IMAGES_DIR, NETWORK_EVM,
+    ensure_data_dir, load_projects, parse_date,
+)
+from store import DELETED, UPDATED, ChangeEvent, DataStore
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Основной класс‑менеджер
@@ -59,12 +21,22 @@ class ProjectsManager:
         page: ft.Page,
         update_content_callback,
         accounts_manager: AccountsManager,
+        store: Optional[DataStore] = None,
     ):
         self.page = page
         self.update_content = update_content_callback
         self.accounts_manager = accounts_manager
         self.expenses_manager = None
-        self.projects = load_projects()
+        self.store = store if store is not None else accounts_manager.store
+
+        # Производные поля проектов (даты, ключи сортировки, финансы).
+        # Считаются при загрузке и по событиям хранилища, а не на каждый рендер.
+        self._derived: Dict[int, Dict[str, Any]] = {}
+        self._progress_cache: Dict[int, Optional[float]] = {}
+        self._progress_day: Optional[datetime.date] = None
+        self._rebuild_derived()
+        self.store.projects.subscribe(self._on_projects_changed)
+        self.store.expenses.subscribe(self._on_expenses_changed)
 
         # UI‑элементы диалога
         self.name_field: Optional[ft.TextField] = None
@@ -187,6 +159,7 @@ class ProjectsManager:
     # --------------------------------------------------------------------- #
     def set_expenses_manager(self, expenses_manager) -> None:
         self.expenses_manager = expenses_manager
+        self.refresh_finances()
 
     def _format_tooltip(self, text: str, max_chars: int = 50) -> str:
         if not text:
@@ -203,17 +176,98 @@ class ProjectsManager:
             lines.append(cur)
         return "\n".join(lines)
 
+    @property
+    def projects(self) -> List[Dict]:
+        return self.store.projects.records
+
     def _get_project_finances(self, project_id: int) -> tuple[float, float]:
-        expenses, incomes = 0.0, 0.0
-        if self.expenses_manager:
-            for exp in self.expenses_manager.expenses:
-                if exp.get("project_id") == project_id:
-                    amount = exp.get("amount", 0)
-                    if exp.get("type") == "expense":
-                        expenses += amount
-                    else:
-                        incomes += amount
-        return expenses, incomes
+        return self.store.expense_totals.project(project_id)
+
+    # --------------------------------------------------------------------- #
+    #  Производные поля (кеш)
+    # --------------------------------------------------------------------- #
+    def _derive_fields(self, project: Dict) -> Dict[str, Any]:
+        expenses, incomes = self._get_project_finances(project["id"])
+        return {
+            "start_dt": parse_date(project.get("start_date")),
+            "end_dt": parse_date(project.get("end_date")),
+            "name_key": project.get("name", "").strip().casefold(),
+            "accounts_count": len(project.get("accounts", [])),
+            "expenses": expenses,
+            "incomes": incomes,
+        }
+
+    def _rebuild_derived(self) -> None:
+        self._derived = {p["id"]: self._derive_fields(p) for p in self.projects}
+        self._progress_cache.clear()
+
+    def _refresh_derived(self, project: Dict) -> None:
+        self._derived[project["id"]] = self._derive_fields(project)
+        self._progress_cache.pop(project["id"], None)
+
+    def _get_derived(self, project: Dict) -> Dict[str, Any]:
+        derived = self._derived.get(project["id"])
+        if derived is None:
+            derived = self._derived[project["id"]] = self._derive_fields(project)
+        return derived
+
+    def _on_projects_changed(self, event: ChangeEvent) -> None:
+        for project in event.records:
+            if event.kind == DELETED:
+                self._derived.pop(project["id"], None)
+                self._progress_cache.pop(project["id"], None)
+            else:
+                self._refresh_derived(project)
+
+    def _on_expenses_changed(self, event: ChangeEvent) -> None:
+        """Итоги уже пересчитаны хранилищем — обновляем только затронутые проекты."""
+        if event.kind == UPDATED and None in event.previous:
+            self.refresh_finances()
+            return
+        project_ids = {rec.get("project_id") for rec in event.records}
+        project_ids |= {prev.get("project_id") for prev in event.previous if prev}
+        for project_id in project_ids - {None}:
+            project = self.store.projects.get(project_id)
+            if project is not None:
+                derived = self._get_derived(project)
+                derived["expenses"], derived["incomes"] = self._get_project_finances(project_id)
+
+    def reload_from_disk(self) -> bool:
+        """Подтягивает внешние изменения projects.json, пересчитывая кеш только изменённых."""
+        with self.store.history.external_change():
+            return self.store.projects.replace_all(load_projects())
+
+    def refresh_finances(self) -> None:
+        """Обновляет финансовые поля всех проектов из итогов хранилища."""
+        for project in self.projects:
+            derived = self._get_derived(project)
+            derived["expenses"], derived["incomes"] = self._get_project_finances(project["id"])
+
+    def _get_progress(self, project: Dict) -> Optional[float]:
+        """Прогресс проекта по датам; кеш сбрасывается раз в сутки."""
+        today = datetime.date.today()
+        if today != self._progress_day:
+            self._progress_cache.clear()
+            self._progress_day = today
+
+        project_id = project["id"]
+        if project_id in self._progress_cache:
+            return self._progress_cache[project_id]
+
+        derived = self._get_derived(project)
+        start_dt, end_dt = derived["start_dt"], derived["end_dt"]
+        progress_value: Optional[float] = None
+        if start_dt and end_dt:
+            if today < start_dt:
+                progress_value = 0.0
+            elif today >= end_dt:
+                progress_value = 1.0
+            else:
+                total = (end_dt - start_dt).days
+                if total > 0:
+                    progress_value = (today - start_dt).days / total
+        self._progress_cache[project_id] = progress_value
+        return progress_value
 
     def _get_status_color(self, status: str) -> ft.Colors:
         return {
@@ -224,18 +278,7 @@ class ProjectsManager:
         }.get(status, ft.Colors.GREY_400)
 
     def _get_account_display(self, acc: Dict, network: str) -> str:
-        if network == NETWORK_EVM:
-            address = acc.get("evm_address")
-            if address:
-                return f"{address[:4]}...{address[-4:]}"
-            key = acc.get("evm_private_key", "")
-            return f"{key[:4]}...{key[-4:]}" if key else "No EVM"
-        else:
-            address = acc.get("solana_address")
-            if address:
-                return f"{address[:4]}...{address[-4:]}"
-            key = acc.get("sol_private_key", "")
-            return f"{key[:4]}...{key[-4:]}" if key else "No Solana"
+        return short_display(acc, get_network(network))
 
     def _matches_filters(self, project: Dict) -> bool:
         # Текстовый поиск (поиск по названию, описанию, типу и тегам)
@@ -254,8 +297,8 @@ class ProjectsManager:
         if self.filter_status.value != "all" and project.get("status") != self.filter_status.value:
             return False
         if self.filter_expense.value != "all":
-            expenses, incomes = self._get_project_finances(project["id"])
-            total = expenses + incomes
+            derived = self._get_derived(project)
+            total = derived["expenses"] + derived["incomes"]
             if self.filter_expense.value == "with" and total == 0:
                 return False
             if self.filter_expense.value == "without" and total > 0:
@@ -280,15 +323,19 @@ class ProjectsManager:
         reverse = (self.sort_order.value == "desc")
 
         if sort_key == "name":
-            return sorted(projects, key=lambda p: p.get("name", ""), reverse=reverse)
-        elif sort_key == "start_date":
-            return sorted(projects, key=lambda p: p.get("start_date", ""), reverse=reverse)
-        elif sort_key == "end_date":
-            return sorted(projects, key=lambda p: p.get("end_date", ""), reverse=reverse)
+            return sorted(projects, key=lambda p: self._get_derived(p)["name_key"], reverse=reverse)
+        elif sort_key in ("start_date", "end_date"):
+            field = "start_dt" if sort_key == "start_date" else "end_dt"
+
+            def date_key(p: Dict) -> tuple:
+                value = self._get_derived(p)[field]
+                return (value is not None, value or datetime.date.min)
+
+            return sorted(projects, key=date_key, reverse=reverse)
         elif sort_key == "expenses":
-            return sorted(projects, key=lambda p: self._get_project_finances(p["id"])[0], reverse=reverse)
+            return sorted(projects, key=lambda p: self._get_derived(p)["expenses"], reverse=reverse)
         elif sort_key == "accounts_count":
-            return sorted(projects, key=lambda p: len(p.get("accounts", [])), reverse=reverse)
+            return sorted(projects, key=lambda p: self._get_derived(p)["accounts_count"], reverse=reverse)
         else:
             return projects
 
@@ -331,8 +378,9 @@ class ProjectsManager:
         network = project.get("network", NETWORK_EVM)
         start = project.get("start_date", "")
         end = project.get("end_date", "")
-        accounts_cnt = len(project.get("accounts", []))
-        expenses, incomes = self._get_project_finances(project_id)
+        derived = self._get_derived(project)
+        accounts_cnt = derived["accounts_count"]
+        expenses, incomes = derived["expenses"], derived["incomes"]
         tags = project.get("tags", [])
 
         status_color = self._get_status_color(status)
@@ -381,23 +429,7 @@ class ProjectsManager:
             icon_size=22,
         )
 
-        progress_value: Optional[float] = None
-        if start and end:
-            try:
-                start_dt = datetime.datetime.strptime(start, "%Y-%m-%d")
-                end_dt = datetime.datetime.strptime(end, "%Y-%m-%d")
-                now = datetime.datetime.now()
-                if now < start_dt:
-                    progress_value = 0.0
-                elif now > end_dt:
-                    progress_value = 1.0
-                else:
-                    total = (end_dt - start_dt).days
-                    passed = (now - start_dt).days
-                    if total > 0:
-                        progress_value = passed / total
-            except Exception:
-                progress_value = None
+        progress_value = self._get_progress(project)
 
         short_desc = description[:80] + ("…" if len(description) > 80 else "")
         tooltip_desc = self._format_tooltip(description, 50)
@@ -643,7 +675,7 @@ class ProjectsManager:
         project = next((p for p in self.projects if p["id"] == project_id), None)
         if project:
             self.current_project_accounts = project.get("accounts", [])
-            self.current_network = project.get("network", NETWORK_EVM)
+            self.current_network = get_network(project.get("network"))["label"]
             self.selected_image_path = project.get("image_path")
             self.image_cleared = False
             self.current_tags = project.get("tags", []).copy()
@@ -807,13 +839,12 @@ class ProjectsManager:
         self.network_radio = ft.RadioGroup(
             content=ft.Row(
                 [
-                    ft.Radio(value=NETWORK_EVM,
-                             label="EVM",
-                             fill_color=ft.Colors.BLUE_400),
-                    ft.Radio(value=NETWORK_SOLANA,
-                             label="Solana",
-                             fill_color=ft.Colors.PURPLE_400),
-                ]
+                    ft.Radio(value=net["label"],
+                             label=net["label"],
+                             fill_color=net["color"])
+                    for net in NETWORKS
+                ],
+                wrap=True,
             ),
             value=self.current_network,
             on_change=self.on_network_change,
@@ -953,17 +984,14 @@ class ProjectsManager:
 
         checkboxes: List[ft.Checkbox] = []
         filter_text = filter_text.lower()
-        network = (
+        net = get_network(
             self.network_radio.value if self.network_radio else self.current_network
         )
+        key_field, address_field = net["field"], net["address_field"]
 
         for acc in self.accounts_manager.accounts:
-            if network == NETWORK_EVM:
-                key = acc.get("evm_private_key", "")
-                addr = acc.get("evm_address")
-            else:
-                key = acc.get("sol_private_key", "")
-                addr = acc.get("solana_address")
+            key = acc.get(key_field, "")
+            addr = acc.get(address_field)
             if not key:
                 continue
 
@@ -973,9 +1001,7 @@ class ProjectsManager:
             if filter_text and filter_text not in searchable:
                 continue
 
-            network_label = "EVM" if network == NETWORK_EVM else "Solana"
-            display = self._get_account_display(acc, network)
-            label = f"{network_label} {acc['id']} ({display})"
+            label = f"{net['label']} {acc['id']} ({short_display(acc, net)})"
             cb = ft.Checkbox(
                 label=label,
                 value=acc["id"] in self.current_project_accounts,
@@ -1016,7 +1042,7 @@ class ProjectsManager:
     # --------------------------------------------------------------------- #
     #  Сохранение проекта
     # --------------------------------------------------------------------- #
-    def save_project(self, e: ft.ControlEvent = None):
+    async def save_project(self, e: ft.ControlEvent = None):
         name = self.name_field.value.strip()
         if not name:
             return
@@ -1028,8 +1054,9 @@ class ProjectsManager:
         ]
 
         if self.editing_project_id is None:
-            new_id = max([p["id"] for p in self.projects], default=0) + 1
-            image_path = self._save_image(new_id) if self.selected_image_path else None
+            new_id = self.store.projects.next_id()
+            image_path = (await self.store.saver.run(self._save_image, new_id)
+                          if self.selected_image_path else None)
             new_project = {
                 "id": new_id,
                 "name": name,
@@ -1044,7 +1071,7 @@ class ProjectsManager:
                 "archived": False,
                 "tags": self.current_tags.copy(),
             }
-            self.projects.append(new_project)
+            self.store.projects.add([new_project])
 
         else:
             new_image_path: Optional[str] = None
@@ -1057,7 +1084,7 @@ class ProjectsManager:
                         break
                 if old_path:
                     self._delete_image(old_path)
-                new_image_path = self._save_image(self.editing_project_id)
+                new_image_path = await self.store.saver.run(self._save_image, self.editing_project_id)
 
             elif self.image_cleared:
                 old_path = None
@@ -1069,30 +1096,30 @@ class ProjectsManager:
                     self._delete_image(old_path)
                 new_image_path = None
 
-            for proj in self.projects:
-                if proj["id"] == self.editing_project_id:
-                    proj.update(
-                        {
-                            "name": name,
-                            "description": self.desc_field.value,
-                            "status": self.status_dropdown.value,
-                            "type": self.type_dropdown.value,
-                            "network": self.network_radio.value,
-                            "start_date": self.start_field.value,
-                            "end_date": self.end_field.value,
-                            "accounts": selected_accounts,
-                            "image_path": new_image_path
-                            if (new_image_path is not None or self.image_cleared)
-                            else proj.get("image_path"),
-                            "tags": self.current_tags.copy(),
-                        }
-                    )
-                    break
-
-        save_projects(self.projects)
+            proj = self.store.projects.get(self.editing_project_id)
+            if proj is not None:
+                self.store.projects.update(
+                    proj["id"],
+                    {
+                        "name": name,
+                        "description": self.desc_field.value,
+                        "status": self.status_dropdown.value,
+                        "type": self.type_dropdown.value,
+                        "network": self.network_radio.value,
+                        "start_date": self.start_field.value,
+                        "end_date": self.end_field.value,
+                        "accounts": selected_accounts,
+                        "image_path": new_image_path
+                        if (new_image_path is not None or self.image_cleared)
+                        else proj.get("image_path"),
+                        "tags": self.current_tags.copy(),
+                    },
+                )
+
         self.image_cleared = False
         self.close_dialog()
         self.update_content(self.get_view())
+        await self.store.save("projects")
 
     # --------------------------------------------------------------------- #
     #  Удаление проекта (подтверждение)
@@ -1103,10 +1130,7 @@ class ProjectsManager:
             self.page.update()
 
         def confirm(e):
-            for p in self.projects:
-                if p["id"] == project_id and p.get("image_path"):
-                    self._delete_image(p["image_path"])
-                    break
+            # Картинка остаётся на диске, чтобы удаление можно было отменить
             self._delete_project(project_id)
             close_dialog(e)
 
@@ -1125,9 +1149,18 @@ class ProjectsManager:
         self.page.show_dialog(dlg)
 
     def _delete_project(self, project_id: int):
-        self.projects = [p for p in self.projects if p["id"] != project_id]
-        save_projects(self.projects)
+        self.store.projects.delete([project_id])
         self.update_content(self.get_view())
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(f"Project #{project_id} deleted"), action="Undo",
+                                          on_action=self._undo_last, open=True)
+        self.page.update()
+        self.page.run_task(self.store.save, "projects")
+
+    async def _undo_last(self, e=None):
+        entry = self.store.history.undo()
+        if entry:
+            self.update_content(self.get_view())
+            await self.store.save_entry(entry)
 
     def delete_project(self, e: ft.ControlEvent):
         project_id = e.control.data
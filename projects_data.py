@@ -0,0 +1,50 @@
+import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from migrations import log_migration, migrate, read_records, write_records
+from watcher import remember_file
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Константы и утилиты
+# ──────────────────────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+PROJECTS_FILE = DATA_DIR / "projects.json"
+IMAGES_DIR = DATA_DIR / "images"
+
+NETWORK_EVM = "EVM"
+
+
+def ensure_data_dir() -> None:
+    DATA_DIR.mkdir(exist_ok=True)
+    IMAGES_DIR.mkdir(exist_ok=True)
+
+
+def load_projects() -> List[Dict[str, Any]]:
+    """Читает файл с проектами, создаёт его при отсутствии; старую схему мигрирует."""
+    ensure_data_dir()
+    if not PROJECTS_FILE.exists():
+        save_projects([])
+        return []
+
+    data, version = read_records(PROJECTS_FILE)
+    if migrate("projects", data, version):
+        save_projects(data)
+        log_migration(PROJECTS_FILE, "projects", version, len(data))
+    return data
+
+
+def save_projects(projects: List[Dict[str, Any]]) -> None:
+    """Записывает список проектов в JSON‑файл."""
+    ensure_data_dir()
+    write_records(PROJECTS_FILE, "projects", projects)
+    remember_file(PROJECTS_FILE)
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime.date]:
+    """Разбирает дату формата YYYY-MM-DD, при ошибке возвращает None."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
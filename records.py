@@ -0,0 +1,125 @@
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, FrozenSet, Iterator, Mapping, Optional, Tuple
+
+from networks import NETWORKS
+
+# ──────────────────────────────────────────────────────────────
+#  Компактные записи аккаунтов и операций
+# ──────────────────────────────────────────────────────────────
+# Известные поля лежат в __slots__, поэтому у записи нет своей
+# хеш-таблицы ключей; строки-перечисления (сеть, тип, категория)
+# интернируются и на 100k операций хранятся по одному экземпляру.
+# Для UI и сохранения запись выглядит как dict: [], get, items,
+# update, dict(rec), сравнение с dict. В JSON пишется через default=dict.
+
+_MISSING = object()
+
+
+class Record(MutableMapping):
+    """Запись со слотами вместо словаря; незнакомые ключи — в _extra."""
+
+    __slots__ = ("_extra",)
+    FIELDS: Tuple[str, ...] = ()
+    INTERNED: FrozenSet[str] = frozenset()
+    _FIELD_SET: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, data: Optional[Mapping[str, Any]] = None, **fields: Any):
+        self._extra: Optional[Dict[str, Any]] = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def adopt(cls, record: Mapping[str, Any]) -> "Record":
+        """Запись этого класса как есть, иначе — компактная копия."""
+        return record if type(record) is cls else cls(record)
+
+    # ------------------------------------------------------------------
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # Быстрый путь: get вызывается в каждом фильтре и агрегате
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._FIELD_SET:
+            if key in self.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELD_SET:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(1 for key in self.FIELDS if hasattr(self, key)) + len(self._extra or ())
+
+    def clear(self) -> None:
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                object.__delattr__(self, key)
+        self._extra = None
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Account(Record):
+    FIELDS = (("id",)
+              + tuple(f for net in NETWORKS for f in (net["field"], net["address_field"]))
+              + ("email", "twitter_token", "discord_token"))
+    __slots__ = FIELDS
+
+
+class Operation(Record):
+    FIELDS = ("id", "date", "type", "project_id", "account_ids", "network",
+              "category", "amount", "currency", "description", "recurring_id", "account_weights")
+    INTERNED = frozenset({"date", "type", "network", "category", "currency"})
+    __slots__ = FIELDS
@@ -0,0 +1,189 @@
+import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from migrations import log_migration, migrate, read_records, write_records
+from watcher import remember_file
+
+# ──────────────────────────────────────────────────────────────
+#  Повторяющиеся операции (подписки на прокси, капчу и т.п.)
+# ──────────────────────────────────────────────────────────────
+# Шаблон хранит поля операции, интервал, дату начала и необязательную
+# дату окончания. Заранее операции не создаются: даты повторов
+# вычисляются только в запрошенном окне (occurrences), а в журнал
+# при запуске дописываются лишь наступившие с прошлого раза периоды
+# (materialize_due). materialized_to — по какую дату шаблон уже
+# разложен в операции; удалённое вручную повторение не возвращается.
+DATA_DIR = Path("data")
+RECURRING_FILE = DATA_DIR / "recurring.json"
+
+# интервал -> (шаг, единица): "D" — дни, "M" — месяцы
+INTERVALS: Dict[str, Tuple[int, str]] = {
+    "daily": (1, "D"),
+    "weekly": (7, "D"),
+    "monthly": (1, "M"),
+    "quarterly": (3, "M"),
+    "yearly": (12, "M"),
+}
+DEFAULT_INTERVAL = "monthly"
+
+# Поля шаблона, которые копируются в каждую операцию
+OPERATION_FIELDS = ("type", "network", "category", "amount", "currency", "description",
+                    "project_id", "account_ids")
+
+
+def _parse(value: Optional[str]) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _add_months(date: datetime.date, months: int) -> datetime.date:
+    """date + months; 31-е в коротком месяце — последний день месяца."""
+    month_index = date.month - 1 + months
+    year, month = date.year + month_index // 12, month_index % 12 + 1
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return date.replace(year=year, month=month, day=min(date.day, (next_month - datetime.timedelta(days=1)).day))
+
+
+def check_repeat(interval: str, end: Optional[str] = None) -> None:
+    if interval not in INTERVALS:
+        raise ValueError(f"unknown interval {interval!r}; expected one of {', '.join(INTERVALS)}")
+    if end and _parse(end) is None:
+        raise ValueError(f"bad repeat end date {end!r}")
+
+
+def make_template(operation: Dict[str, Any], interval: str = DEFAULT_INTERVAL,
+                  end: Optional[str] = None) -> Dict[str, Any]:
+    """Шаблон из операции: её дата — первое повторение (id задаёт вызывающий)."""
+    check_repeat(interval, end)
+    if _parse(operation.get("date")) is None:
+        raise ValueError(f"bad start date {operation.get('date')!r}")
+    template = {field: operation.get(field) for field in OPERATION_FIELDS}
+    template["account_ids"] = list(template["account_ids"] or [])
+    template.update({"interval": interval, "start": operation["date"][:10], "end": end or None,
+                     "materialized_to": None})
+    return template
+
+
+def is_active(template: Dict[str, Any], today: Optional[datetime.date] = None) -> bool:
+    end = _parse(template.get("end"))
+    return end is None or end >= (today or datetime.date.today())
+
+
+# ──────────────────────────────────────────────────────────────
+#  Даты повторов
+# ──────────────────────────────────────────────────────────────
+def occurrence_dates(template: Dict[str, Any], date_from: Optional[datetime.date],
+                     date_to: datetime.date) -> Iterator[datetime.date]:
+    """Даты повторов шаблона в [date_from, date_to] с учётом start/end.
+
+    Первое повторение в окне находится арифметически, без перебора
+    периодов от даты начала, поэтому окно в далёком будущем не дороже
+    ближнего. n-е повторение всегда считается от start (а не от
+    предыдущего), чтобы 31-е не сползало к 28-му.
+    """
+    start = _parse(template.get("start"))
+    step, unit = INTERVALS.get(template.get("interval"), INTERVALS[DEFAULT_INTERVAL])
+    if start is None:
+        return
+    end = _parse(template.get("end"))
+    lo = max(start, date_from) if date_from else start
+    hi = min(date_to, end) if end else date_to
+    if lo > hi:
+        return
+    if unit == "D":
+        n = -(-(lo - start).days // step)
+        date = start + datetime.timedelta(days=n * step)
+        while date <= hi:
+            yield date
+            n += 1
+            date = start + datetime.timedelta(days=n * step)
+    else:
+        n = ((lo.year - start.year) * 12 + lo.month - start.month) // step
+        date = _add_months(start, n * step)
+        if date < lo:
+            n += 1
+            date = _add_months(start, n * step)
+        while date <= hi:
+            yield date
+            n += 1
+            date = _add_months(start, n * step)
+
+
+def _operation(template: Dict[str, Any], date: datetime.date) -> Dict[str, Any]:
+    op = {field: template.get(field) for field in OPERATION_FIELDS}
+    op["account_ids"] = list(op["account_ids"] or [])
+    op["date"] = date.isoformat()
+    op["recurring_id"] = template["id"]
+    return op
+
+
+def occurrences(templates: Iterable[Dict[str, Any]], date_from: Optional[str],
+                date_to: str) -> List[Dict[str, Any]]:
+    """Повторения в окне как операции без id — для прогноза; в журнал не пишутся."""
+    lo, hi = _parse(date_from), _parse(date_to)
+    if hi is None:
+        raise ValueError(f"bad end date {date_to!r}")
+    ops = [_operation(t, date) for t in templates for date in occurrence_dates(t, lo, hi)]
+    ops.sort(key=lambda op: op["date"])
+    return ops
+
+
+def materialize_due(templates: Iterable[Dict[str, Any]], expenses: Iterable[Dict[str, Any]],
+                    next_id: int, today: Optional[datetime.date] = None
+                    ) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """Операции за периоды, наступившие после materialized_to, по сегодня.
+
+    Возвращает (новые операции с id от next_id, {id шаблона: изменения}).
+    Повторение, для которого в журнале уже есть операция с тем же
+    recurring_id и датой, пропускается: прерванный запуск (операции
+    записаны, шаблоны — нет) не создаст дублей.
+    """
+    today = today or datetime.date.today()
+    due: List[Tuple[Dict[str, Any], datetime.date, datetime.date]] = []
+    for template in templates:
+        done = _parse(template.get("materialized_to"))
+        lo = done + datetime.timedelta(days=1) if done else _parse(template.get("start"))
+        end = _parse(template.get("end"))
+        hi = min(today, end) if end else today
+        if lo is not None and lo <= hi:
+            due.append((template, lo, hi))
+    if not due:
+        return [], {}
+
+    due_ids = {template["id"] for template, _, _ in due}
+    existing = {(exp.get("recurring_id"), exp.get("date")) for exp in expenses
+                if exp.get("recurring_id") in due_ids}
+    ops: List[Dict[str, Any]] = []
+    changes: Dict[int, Dict[str, Any]] = {}
+    for template, lo, hi in due:
+        for date in occurrence_dates(template, lo, hi):
+            if (template["id"], date.isoformat()) in existing:
+                continue
+            op = _operation(template, date)
+            op["id"] = next_id
+            next_id += 1
+            ops.append(op)
+        changes[template["id"]] = {"materialized_to": hi.isoformat()}
+    return ops, changes
+
+
+# ──────────────────────────────────────────────────────────────
+#  Файл шаблонов
+# ──────────────────────────────────────────────────────────────
+def load_recurring() -> List[Dict[str, Any]]:
+    if not RECURRING_FILE.exists():
+        return []
+    data, version = read_records(RECURRING_FILE)
+    if migrate("recurring", data, version):
+        save_recurring(data)
+        log_migration(RECURRING_FILE, "recurring", version, len(data))
+    return data
+
+
+def save_recurring(templates: List[Dict[str, Any]]) -> None:
+    DATA_DIR.mkdir(exist_ok=True)
+    write_records(RECURRING_FILE, "recurring", templates)
+    remember_file(RECURRING_FILE)
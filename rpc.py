@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+# ──────────────────────────────────────────────────────────────
+#  Настройки RPC
+# ──────────────────────────────────────────────────────────────
+DATA_DIR = Path("data")
+RPC_CONFIG_FILE = DATA_DIR / "rpc.json"
+
+PROTOCOL_EVM = "evm"
+PROTOCOL_SOLANA = "solana"
+
+# Публичные эндпоинты по умолчанию; свои задаются в data/rpc.json:
+# {"evm": [{"url": "...", "concurrency": 4, "batch_size": 50}], "sol": [...]}
+DEFAULT_ENDPOINTS: Dict[str, List[Dict[str, Any]]] = {
+    "evm": [{"url": "https://ethereum-rpc.publicnode.com", "concurrency": 4, "batch_size": 50}],
+    "sol": [{"url": "https://api.mainnet-beta.solana.com", "concurrency": 2, "batch_size": 25}],
+}
+
+DEFAULT_TTL = 60.0          # секунд жизни закешированного состояния
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 15.0
+SOLANA_SIGNATURES_LIMIT = 1000
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def load_rpc_config(path: Path = RPC_CONFIG_FILE) -> Dict[str, List[Dict[str, Any]]]:
+    """Читает data/rpc.json; сети, которых там нет, берутся из DEFAULT_ENDPOINTS."""
+    config = {net: list(endpoints) for net, endpoints in DEFAULT_ENDPOINTS.items()}
+    if path.exists():
+        try:
+            config.update(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            print(f"[rpc] cannot read {path}: {exc}")
+    return config
+
+
+class RpcError(Exception):
+    pass
+
+
+class Endpoint:
+    """Один RPC-узел со своим лимитом одновременных запросов."""
+
+    def __init__(self, url: str, concurrency: int = 4, batch_size: int = 50):
+        self.url = url
+        self.batch_size = max(1, int(batch_size))
+        self.semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r})"
+
+
+# ──────────────────────────────────────────────────────────────
+#  Загрузчик балансов и счётчиков транзакций
+# ──────────────────────────────────────────────────────────────
+class BalanceFetcher:
+    """Асинхронно получает нативный баланс и число транзакций адресов.
+
+    Запросы группируются в JSON-RPC батчи, идут через общий пул
+    соединений aiohttp с лимитом на каждый эндпоинт, повторяются при
+    сетевых ошибках и кешируются на ttl секунд.
+    Результат: {адрес: {"balance": float, "tx_count": int}} либо
+    {"error": str} для адресов, которые так и не удалось получить.
+    """
+
+    def __init__(
+        self,
+        endpoints: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        ttl: float = DEFAULT_TTL,
+        retries: int = DEFAULT_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self._config = endpoints if endpoints is not None else load_rpc_config()
+        self._endpoints: Dict[str, List[Endpoint]] = {}
+        self.ttl = ttl
+        self.retries = retries
+        self.timeout = timeout
+        self._cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ids = itertools.count(1)
+
+    # ------------------------------------------------------------------
+    def _get_endpoints(self, network_id: str) -> List[Endpoint]:
+        # Семафоры создаются лениво — уже внутри работающего event loop
+        if network_id not in self._endpoints:
+            self._endpoints[network_id] = [
+                Endpoint(**cfg) for cfg in self._config.get(network_id, [])
+            ]
+        return self._endpoints[network_id]
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def cached(self, network_id: str, address: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get((network_id, address))
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    # ------------------------------------------------------------------
+    async def fetch(self, network_id: str, protocol: str,
+                    addresses: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Состояние адресов сети; закешированные адреса в сеть не уходят."""
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for address in dict.fromkeys(a for a in addresses if a):
+            state = self.cached(network_id, address)
+            if state is not None:
+                results[address] = state
+            else:
+                missing.append(address)
+        endpoints = self._get_endpoints(network_id)
+        if not missing:
+            return results
+        if not endpoints:
+            return {**results, **{a: {"error": "no RPC endpoint"} for a in missing}}
+
+        batch_size = min(ep.batch_size for ep in endpoints)
+        chunks = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        tasks = [
+            self._fetch_chunk(endpoints, idx, protocol, chunk)
+            for idx, chunk in enumerate(chunks)
+        ]
+        expires = time.monotonic() + self.ttl
+        for chunk_result in await asyncio.gather(*tasks):
+            for address, state in chunk_result.items():
+                results[address] = state
+                if "error" not in state:
+                    self._cache[(network_id, address)] = (expires, state)
+        return results
+
+    async def _fetch_chunk(self, endpoints: List[Endpoint], offset: int,
+                           protocol: str, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        last_error = "unknown error"
+        for attempt in range(self.retries):
+            # Каждая повторная попытка уходит на следующий эндпоинт
+            endpoint = endpoints[(offset + attempt) % len(endpoints)]
+            try:
+                async with endpoint.semaphore:
+                    if protocol == PROTOCOL_EVM:
+                        return await self._fetch_evm(endpoint, addresses)
+                    return await self._fetch_solana(endpoint, addresses)
+            except (aiohttp.ClientError, asyncio.TimeoutError, RpcError,
+                    ValueError, TypeError, KeyError) as exc:
+                last_error = f"{endpoint.url}: {exc}"
+                if attempt < self.retries - 1:
+                    # После последней попытки ждать нечего — ошибка сразу уходит в результат
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        return {address: {"error": last_error} for address in addresses}
+
+    async def _post_batch(self, endpoint: Endpoint, calls: List[Tuple[str, list]]) -> List[Any]:
+        """Отправляет JSON-RPC батч и возвращает результаты в порядке вызовов."""
+        ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "2.0", "id": call_id, "method": method, "params": params}
+            for call_id, (method, params) in zip(ids, calls)
+        ]
+        async with self._get_session().post(endpoint.url, json=payload) as resp:
+            if resp.status in RETRY_STATUSES:
+                raise RpcError(f"HTTP {resp.status}")
+            resp.raise_for_status()
+            body = await resp.json(content_type=None)
+        if not isinstance(body, list):
+            raise RpcError(f"unexpected response: {str(body)[:200]}")
+        by_id = {item.get("id"): item for item in body}
+        results = []
+        for call_id in ids:
+            item = by_id.get(call_id)
+            if item is None:
+                raise RpcError(f"missing response for id {call_id}")
+            if item.get("error"):
+                raise RpcError(str(item["error"]))
+            results.append(item.get("result"))
+        return results
+
+    async def _fetch_evm(self, endpoint: Endpoint, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        calls = []
+        for address in addresses:
+            calls.append(("eth_getBalance", [address, "latest"]))
+            calls.append(("eth_getTransactionCount", [address, "latest"]))
+        results = await self._post_batch(endpoint, calls)
+        return {
+            address: {
+                "balance": int(results[2 * i], 16) / 10 ** 18,
+                "tx_count": int(results[2 * i + 1], 16),
+            }
+            for i, address in enumerate(addresses)
+        }
+
+    async def _fetch_solana(self, endpoint: Endpoint, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        # У Solana нет nonce аккаунта: считаем подписи (не больше SOLANA_SIGNATURES_LIMIT)
+        calls = []
+        for address in addresses:
+            calls.append(("getBalance", [address]))
+            calls.append(("getSignaturesForAddress", [address, {"limit": SOLANA_SIGNATURES_LIMIT}]))
+        results = await self._post_batch(endpoint, calls)
+        return {
+            address: {
+                "balance": results[2 * i]["value"] / 10 ** 9,
+                "tx_count": len(results[2 * i + 1] or []),
+            }
+            for i, address in enumerate(addresses)
+        }
@@ -0,0 +1,154 @@
+from typing import Any, Dict, Iterable, Iterator, List
+
+from bitarray import bitarray
+from bitarray.util import zeros
+
+# ──────────────────────────────────────────────────────────────
+#  Выбор аккаунтов как битовая маска по id
+# ──────────────────────────────────────────────────────────────
+MODE_REPLACE = "replace"
+MODE_ADD = "add"            # объединение с текущим выбором
+MODE_INTERSECT = "intersect"
+MODE_REMOVE = "remove"
+SELECTION_MODES = (MODE_REPLACE, MODE_ADD, MODE_INTERSECT, MODE_REMOVE)
+
+
+class Selection:
+    """Множество id аккаунтов: бит i установлен, если выбран аккаунт с id i.
+
+    id аккаунтов — небольшие последовательные числа, поэтому маска
+    компактна, а объединение, пересечение и инверсия идут по машинным
+    словам. Интерфейс совместим с set там, где им пользуется UI
+    (in, add, discard, clear, len, итерация по возрастанию id).
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._bits = zeros(0, endian="little")
+        self.update(ids)
+
+    # ------------------------------------------------------------------
+    def _grow(self, size: int) -> None:
+        if size > len(self._bits):
+            self._bits.extend(zeros(size - len(self._bits), endian="little"))
+
+    @staticmethod
+    def _aligned(a: "Selection", b: "Selection") -> tuple:
+        size = max(len(a._bits), len(b._bits))
+        a._grow(size)
+        b._grow(size)
+        return a._bits, b._bits
+
+    @classmethod
+    def _wrap(cls, bits: bitarray) -> "Selection":
+        sel = cls()
+        sel._bits = bits
+        return sel
+
+    def copy(self) -> "Selection":
+        return self._wrap(self._bits.copy())
+
+    # ------------------------------------------------------------------
+    def __contains__(self, account_id: Any) -> bool:
+        return isinstance(account_id, int) and 0 <= account_id < len(self._bits) and bool(self._bits[account_id])
+
+    def __len__(self) -> int:
+        return self._bits.count(1)
+
+    def __bool__(self) -> bool:
+        return self._bits.any()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._bits.search(1))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Selection):
+            return NotImplemented
+        a, b = self._aligned(self, other)
+        return a == b
+
+    def __repr__(self) -> str:
+        return f"Selection({len(self)} ids)"
+
+    # ------------------------------------------------------------------
+    #  Изменения на месте
+    # ------------------------------------------------------------------
+    def add(self, account_id: int) -> None:
+        self._grow(account_id + 1)
+        self._bits[account_id] = 1
+
+    def discard(self, account_id: int) -> None:
+        if 0 <= account_id < len(self._bits):
+            self._bits[account_id] = 0
+
+    def update(self, ids: Iterable[int]) -> None:
+        ids = [i for i in ids if isinstance(i, int) and i >= 0]
+        if ids:
+            self._grow(max(ids) + 1)
+            for i in ids:
+                self._bits[i] = 1
+
+    def clear(self) -> None:
+        self._bits = zeros(0, endian="little")
+
+    def set_range(self, first: int, last: int, value: bool = True) -> None:
+        """Выбирает (или снимает) id с first по last включительно."""
+        first = max(first, 0)
+        if last < first:
+            return
+        self._grow(last + 1)
+        self._bits[first:last + 1] = value
+
+    # ------------------------------------------------------------------
+    #  Алгебра множеств (новые объекты)
+    # ------------------------------------------------------------------
+    def __or__(self, other: "Selection") -> "Selection":
+        a, b = self._aligned(self, other)
+        return self._wrap(a | b)
+
+    def __and__(self, other: "Selection") -> "Selection":
+        a, b = self._aligned(self, other)
+        return self._wrap(a & b)
+
+    def __sub__(self, other: "Selection") -> "Selection":
+        a, b = self._aligned(self, other)
+        return self._wrap(a & ~b)
+
+    def inverted(self, universe: "Selection") -> "Selection":
+        """Дополнение до universe (например, до всех видимых аккаунтов)."""
+        return universe - self
+
+    def combine(self, other: "Selection", mode: str) -> "Selection":
+        if mode == MODE_ADD:
+            return self | other
+        if mode == MODE_INTERSECT:
+            return self & other
+        if mode == MODE_REMOVE:
+            return self - other
+        return other.copy()
+
+    def ids(self) -> List[int]:
+        return list(self)
+
+
+# ──────────────────────────────────────────────────────────────
+#  Источники выбора
+# ──────────────────────────────────────────────────────────────
+def range_selection(first: int, last: int) -> Selection:
+    sel = Selection()
+    sel.set_range(first, last)
+    return sel
+
+
+def project_selection(project: Dict[str, Any]) -> Selection:
+    """Аккаунты, привязанные к проекту."""
+    return Selection(project.get("accounts") or [])
+
+
+def expenses_selection(expenses: Iterable[Dict[str, Any]]) -> Selection:
+    """Аккаунты, участвовавшие в операциях (например, всех операциях проекта)."""
+    sel = Selection()
+    for exp in expenses:
+        sel.update(exp.get("account_ids") or [])
+    return sel
@@ -0,0 +1,314 @@
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type
+
+from accounts_data import load_accounts, save_accounts
+from attribution import AccountAttribution
+from expenses_data import ExpenseAggregates, load_expenses, save_expenses
+from persistence import AsyncSaver
+from projects_data import load_projects, save_projects
+from records import Account, Operation, Record
+from recurring import load_recurring, materialize_due, save_recurring
+from watcher import merge_records
+
+# ──────────────────────────────────────────────────────────────
+#  Общее хранилище данных с событиями изменений
+# ──────────────────────────────────────────────────────────────
+ADDED = "added"
+UPDATED = "updated"
+DELETED = "deleted"
+
+SNAPSHOT_CHUNK = 2000       # записей за один захват lock-а при копировании для сохранения
+SNAPSHOT_RETRIES = 3        # попыток скопировать по частям, пока коллекция меняется
+
+
+class ChangeEvent:
+    """Изменение коллекции.
+
+    records  — добавленные/обновлённые записи (для deleted — удалённые);
+    previous — копии записей до изменения, в том же порядке (для
+    updated; None, если запись уже была изменена на месте вызывающим).
+    """
+
+    def __init__(self, collection: str, kind: str, records: List[Dict[str, Any]],
+                 previous: Optional[List[Optional[Dict[str, Any]]]] = None):
+        self.collection = collection
+        self.kind = kind
+        self.records = records
+        self.previous = previous if previous is not None else [None] * len(records)
+
+    @property
+    def ids(self) -> List[int]:
+        return [rec["id"] for rec in self.records]
+
+    def __repr__(self) -> str:
+        return f"ChangeEvent({self.collection!r}, {self.kind!r}, ids={self.ids})"
+
+
+Subscriber = Callable[[ChangeEvent], None]
+
+
+class Collection:
+    """Список записей с id, индексом по id и подписчиками на изменения.
+
+    Список records один на всё приложение и меняется только на месте,
+    поэтому ссылки на него из менеджеров остаются валидными. Подписчики
+    вызываются синхронно, в порядке подписки, в потоке, сделавшем изменение.
+    С factory (records.Account, records.Operation) все записи, попадающие
+    в коллекцию, хранятся в компактном виде; add возвращает именно их.
+    """
+
+    def __init__(self, name: str, records: Optional[List[Dict[str, Any]]] = None,
+                 factory: Optional[Type[Record]] = None):
+        self.name = name
+        self.factory = factory
+        self.records: List[Dict[str, Any]] = records if records is not None else []
+        if factory is not None:
+            self.records[:] = [factory.adopt(rec) for rec in self.records]
+        self._by_id: Dict[int, Dict[str, Any]] = {rec["id"]: rec for rec in self.records}
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.RLock()
+        self.version = 0            # счётчик изменений (растёт в _emit)
+
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records)
+
+    def get(self, record_id: int) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(record_id)
+
+    def next_id(self) -> int:
+        return max(self._by_id, default=0) + 1
+
+    def _adopt(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.factory is None:
+            return list(records)
+        return [self.factory.adopt(rec) for rec in records]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Копии записей для записи на диск (из потока AsyncSaver).
+
+        Копируется частями под lock-ом, чтобы изменения из UI ждали не
+        дольше одной части. Если между частями коллекция изменилась
+        (сдвинулся version), копия смешала бы состояния до и после
+        пакета — тогда копирование повторяется, а после SNAPSHOT_RETRIES
+        попыток делается целиком за один захват lock-а.
+        """
+        for _ in range(SNAPSHOT_RETRIES):
+            with self._lock:
+                version = self.version
+                records = list(self.records)
+            copies: List[Dict[str, Any]] = []
+            for start in range(0, len(records), SNAPSHOT_CHUNK):
+                with self._lock:
+                    copies.extend([dict(rec) for rec in records[start:start + SNAPSHOT_CHUNK]])
+            if self.version == version:
+                return copies
+        with self._lock:
+            return [dict(rec) for rec in self.records]
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Подписка на изменения; возвращает функцию отписки."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+    def _emit(self, kind: str, records: List[Dict[str, Any]],
+              previous: Optional[List[Optional[Dict[str, Any]]]] = None) -> None:
+        if not records:
+            return
+        self.version += 1
+        event = ChangeEvent(self.name, kind, records, previous)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as exc:
+                print(f"[store] {self.name} subscriber failed on {kind}: {exc}")
+
+    # ------------------------------------------------------------------
+    #  Изменения
+    # ------------------------------------------------------------------
+    def add(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        records = self._adopt(records)
+        with self._lock:
+            for rec in records:
+                self.records.append(rec)
+                self._by_id[rec["id"]] = rec
+            self._emit(ADDED, records)
+        return records
+
+    def update(self, record_id: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return (self.update_many({record_id: changes}) or [None])[0]
+
+    def update_many(self, changes_by_id: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Применяет изменения к записям; событие — только по реально изменённым."""
+        updated, previous = [], []
+        with self._lock:
+            for record_id, changes in changes_by_id.items():
+                rec = self._by_id.get(record_id)
+                if rec is None or all(rec.get(k) == v for k, v in changes.items()):
+                    continue
+                previous.append(dict(rec))
+                rec.update(changes)
+                updated.append(rec)
+            self._emit(UPDATED, updated, previous)
+        return updated
+
+    def replace(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Заменяет содержимое записи с тем же id целиком."""
+        return (self.replace_many([record]) or [None])[0]
+
+    def replace_many(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        updated, previous = [], []
+        with self._lock:
+            for record in records:
+                rec = self._by_id.get(record["id"])
+                if rec is None or rec == record:
+                    continue
+                previous.append(dict(rec))
+                rec.clear()
+                rec.update(record)
+                updated.append(rec)
+            self._emit(UPDATED, updated, previous)
+        return updated
+
+    def touched(self, records: Iterable[Dict[str, Any]],
+                previous: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Сообщает о записях, уже изменённых на месте (previous — их копии до изменения)."""
+        with self._lock:
+            self._emit(UPDATED, list(records), previous)
+
+    def delete(self, record_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        ids = set(record_ids)
+        with self._lock:
+            removed = [self._by_id.pop(rid) for rid in ids if rid in self._by_id]
+            if removed:
+                self.records[:] = [rec for rec in self.records if rec["id"] not in ids]
+            self._emit(DELETED, removed, removed)
+        return removed
+
+    def restore(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Возвращает удалённые записи на их место по порядку id (для undo)."""
+        records = self._adopt(rec for rec in records if rec["id"] not in self._by_id)
+        with self._lock:
+            if not records:
+                return records
+            tail_id = self.records[-1]["id"] if self.records else 0
+            for rec in records:
+                self.records.append(rec)
+                self._by_id[rec["id"]] = rec
+            if min(rec["id"] for rec in records) < tail_id:
+                self.records.sort(key=lambda rec: rec["id"])
+            self._emit(ADDED, records)
+        return records
+
+    def replace_all(self, fresh: List[Dict[str, Any]]) -> bool:
+        """Сливает свежую версию (например, с диска) и рассылает события по разнице."""
+        added: List[Dict[str, Any]] = []
+        updated: List[Dict[str, Any]] = []
+        previous: List[Dict[str, Any]] = []
+        removed: Dict[int, Dict[str, Any]] = {}
+
+        def on_removed(rec: Dict[str, Any]) -> None:
+            # Для обновлённой записи merge_records сначала вызывает on_removed
+            removed[rec["id"]] = dict(rec)
+
+        def on_updated(rec: Dict[str, Any]) -> None:
+            updated.append(rec)
+            previous.append(removed.pop(rec["id"]))
+
+        fresh = self._adopt(fresh)
+        with self._lock:
+            merged, changed = merge_records(
+                self.records, fresh,
+                on_added=added.append, on_updated=on_updated, on_removed=on_removed,
+            )
+            if not changed:
+                return False
+            self.records[:] = merged
+            self._by_id = {rec["id"]: rec for rec in self.records}
+            deleted = list(removed.values())
+            self._emit(DELETED, deleted, deleted)
+            self._emit(UPDATED, updated, previous)
+            self._emit(ADDED, added)
+        return True
+
+
+class DataStore:
+    """Аккаунты, проекты и операции — общие для всех менеджеров.
+
+    expense_totals подписан первым, поэтому остальные подписчики на
+    операции уже видят обновлённые итоги.
+    """
+
+    def __init__(self, accounts: Optional[List[Dict[str, Any]]] = None,
+                 projects: Optional[List[Dict[str, Any]]] = None,
+                 expenses: Optional[List[Dict[str, Any]]] = None,
+                 recurring: Optional[List[Dict[str, Any]]] = None):
+        self.accounts = Collection("accounts", accounts, Account)
+        self.projects = Collection("projects", projects)
+        self.expenses = Collection("expenses", expenses, Operation)
+        self.recurring = Collection("recurring", recurring)
+        self.expense_totals = ExpenseAggregates(self.expenses.records)
+        self.expenses.subscribe(self._on_expenses_changed)
+        # Доли аккаунтов считаются при первом чтении (лидерборд ROI), дальше — инкрементально
+        self.attribution = AccountAttribution(self.expenses.records, self.projects.records)
+        self.projects.subscribe(lambda event: self.attribution.project_changed(event.ids))
+        self.saver = AsyncSaver({
+            "accounts": save_accounts,
+            "projects": save_projects,
+            "expenses": save_expenses,
+            "recurring": save_recurring,
+        })
+        from undo import UndoLog    # undo импортирует константы событий отсюда
+        self.history = UndoLog({"accounts": self.accounts, "projects": self.projects,
+                                "expenses": self.expenses, "recurring": self.recurring})
+
+    @classmethod
+    def from_disk(cls) -> "DataStore":
+        return cls(load_accounts(), load_projects(), load_expenses(), load_recurring())
+
+    def materialize_recurring(self, today=None) -> List[Dict[str, Any]]:
+        """Дописывает наступившие повторения шаблонов; один шаг undo вместе с шаблонами.
+
+        Сохранять после этого нужно сначала expenses, потом recurring.
+        """
+        ops, changes = materialize_due(self.recurring.records, self.expenses.records,
+                                       self.expenses.next_id(), today)
+        if not changes:
+            return []
+        with self.history.transaction("recurring operations"):
+            added = self.expenses.add(ops)
+            self.recurring.update_many(changes)
+        return added
+
+    async def save(self, name: str) -> None:
+        """Фоновая запись коллекции (см. persistence.AsyncSaver)."""
+        await self.saver.save(name, getattr(self, name).snapshot)
+
+    def save_sync(self, name: str) -> None:
+        self.saver.save_sync(name, getattr(self, name).snapshot)
+
+    async def save_entry(self, entry) -> None:
+        """Записывает коллекции, затронутые шагом undo/redo."""
+        for name in entry.before:
+            await self.save(name)
+
+    def _on_expenses_changed(self, event: ChangeEvent) -> None:
+        for rec, prev in zip(event.records, event.previous):
+            if event.kind == DELETED:
+                self.expense_totals.remove(rec)
+                self.attribution.remove(rec)
+            elif event.kind == ADDED:
+                self.expense_totals.add(rec)
+                self.attribution.add(rec)
+            elif prev is not None:
+                self.expense_totals.remove(prev)
+                self.expense_totals.add(rec)
+                self.attribution.remove(prev)
+                self.attribution.add(rec)
+        if event.kind == UPDATED and any(prev is None for prev in event.previous):
+            # Старые суммы неизвестны — пересчитываем целиком
+            self.expense_totals.rebuild(self.expenses.records)
+            self.attribution.invalidate()
@@ -0,0 +1,131 @@
+import asyncio
+
+from aiohttp import web
+
+from rpc import PROTOCOL_EVM, BalanceFetcher
+
+# ──────────────────────────────────────────────────────────────
+#  BalanceFetcher против локальной заглушки JSON-RPC
+# ──────────────────────────────────────────────────────────────
+WEI = 10 ** 18
+
+
+class StubRpc:
+    """EVM-узел на localhost: баланс адреса «0x..N» — N ETH, nonce — N.
+
+    Первые fail_first запросов получают HTTP 503; batches — число
+    вызовов в каждом принятом батче.
+    """
+
+    def __init__(self, fail_first: int = 0):
+        self.fail_first = fail_first
+        self.requests = 0
+        self.batches = []
+        self.url = ""
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.requests <= self.fail_first:
+            return web.Response(status=503)
+        calls = await request.json()
+        self.batches.append(len(calls))
+        results = []
+        for call in calls:
+            n = int(call["params"][0], 16)
+            value = n * WEI if call["method"] == "eth_getBalance" else n
+            results.append({"jsonrpc": "2.0", "id": call["id"], "result": hex(value)})
+        return web.json_response(results)
+
+    async def __aenter__(self) -> "StubRpc":
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+
+def _fetcher(stub: StubRpc, batch_size: int = 50, **kwargs) -> BalanceFetcher:
+    endpoints = {"evm": [{"url": stub.url, "concurrency": 2, "batch_size": batch_size}]}
+    return BalanceFetcher(endpoints, **kwargs)
+
+
+def _addresses(count: int):
+    return [f"0x{n:040x}" for n in range(1, count + 1)]
+
+
+def test_addresses_are_batched():
+    async def run():
+        async with StubRpc() as stub:
+            fetcher = _fetcher(stub, batch_size=2)
+            try:
+                result = await fetcher.fetch("evm", PROTOCOL_EVM, _addresses(5))
+            finally:
+                await fetcher.close()
+        return stub, result
+
+    stub, result = asyncio.run(run())
+    # Пять адресов по два в батче — три запроса, в каждом баланс и nonce на адрес
+    assert stub.requests == 3
+    assert sorted(stub.batches) == [2, 4, 4]
+    assert result[_addresses(5)[4]] == {"balance": 5.0, "tx_count": 5}
+
+
+def test_failed_request_is_retried():
+    async def run():
+        async with StubRpc(fail_first=1) as stub:
+            fetcher = _fetcher(stub)
+            try:
+                result = await fetcher.fetch("evm", PROTOCOL_EVM, _addresses(1))
+            finally:
+                await fetcher.close()
+        return stub, result
+
+    stub, result = asyncio.run(run())
+    assert stub.requests == 2
+    assert result[_addresses(1)[0]] == {"balance": 1.0, "tx_count": 1}
+
+
+def test_exhausted_retries_report_error_and_are_not_cached():
+    async def run():
+        async with StubRpc(fail_first=10) as stub:
+            fetcher = _fetcher(stub, retries=2)
+            try:
+                address = _addresses(1)[0]
+                result = await fetcher.fetch("evm", PROTOCOL_EVM, [address])
+                cached = fetcher.cached("evm", address)
+            finally:
+                await fetcher.close()
+        return stub, result[address], cached
+
+    stub, state, cached = asyncio.run(run())
+    assert stub.requests == 2
+    assert "HTTP 503" in state["error"]
+    assert cached is None
+
+
+def test_results_are_cached_for_ttl():
+    async def run():
+        async with StubRpc() as stub:
+            fetcher = _fetcher(stub, ttl=0.2)
+            try:
+                addresses = _addresses(3)
+                await fetcher.fetch("evm", PROTOCOL_EVM, addresses)
+                await fetcher.fetch("evm", PROTOCOL_EVM, addresses)
+                requests_within_ttl = stub.requests
+                await asyncio.sleep(0.3)
+                await fetcher.fetch("evm", PROTOCOL_EVM, addresses)
+            finally:
+                await fetcher.close()
+        return stub, requests_within_ttl
+
+    stub, requests_within_ttl = asyncio.run(run())
+    assert requests_within_ttl == 1
+    assert stub.requests == 2
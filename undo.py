@@ -0,0 +1,197 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from store import ADDED, ChangeEvent
+
+# ──────────────────────────────────────────────────────────────
+#  Undo/redo по журналу изменений хранилища
+# ──────────────────────────────────────────────────────────────
+UNDO_LIMIT = 100                # шагов в истории
+UNDO_MAX_RECORDS = 250_000      # записей, которые история держит в памяти суммарно
+
+_ABSENT = None                  # записи до шага не было (её добавили)
+
+
+class UndoEntry:
+    """Один шаг истории: для каждой затронутой записи — её состояние до шага.
+
+    Хранятся только затронутые записи: для добавленных — лишь id, для
+    изменённых и удалённых — копия «до», которую и так делает Collection.
+    Если запись менялась в шаге несколько раз, запоминается самое раннее
+    состояние, поэтому откат любого шага — не больше трёх пакетных
+    операций на коллекцию (delete, replace_many, restore).
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.before: Dict[str, Dict[int, Optional[Dict[str, Any]]]] = {}
+
+    def record(self, event: ChangeEvent) -> None:
+        before = self.before.setdefault(event.collection, {})
+        for rec, prev in zip(event.records, event.previous):
+            if rec["id"] in before:
+                continue
+            if event.kind == ADDED:
+                before[rec["id"]] = _ABSENT
+            elif prev is not None:
+                before[rec["id"]] = prev
+            # updated без previous (изменено на месте) откатить нельзя — пропускаем
+
+    @property
+    def size(self) -> int:
+        return sum(len(ids) for ids in self.before.values())
+
+    def __bool__(self) -> bool:
+        return any(self.before.values())
+
+    def __repr__(self) -> str:
+        return f"UndoEntry({self.label!r}, {self.size} records)"
+
+
+class UndoLog:
+    """Стеки undo/redo поверх событий коллекций DataStore.
+
+    Каждое изменение вне transaction() — отдельный шаг; внутри —
+    все события потока до выхода из блока складываются в один шаг
+    (например, весь импорт файла). Откат сам порождает события, и
+    они записываются в шаг redo.
+    """
+
+    def __init__(self, collections: Dict[str, Any], limit: int = UNDO_LIMIT,
+                 max_records: int = UNDO_MAX_RECORDS):
+        self.collections = collections
+        self.limit = limit
+        self.max_records = max_records
+        self._undo: Deque[UndoEntry] = deque()
+        self._redo: List[UndoEntry] = []
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        for collection in collections.values():
+            collection.subscribe(self._on_event)
+
+    # ------------------------------------------------------------------
+    def _on_event(self, event: ChangeEvent) -> None:
+        if getattr(self._local, "suspended", False):
+            return
+        group = getattr(self._local, "group", None)
+        if group is not None:
+            group.record(event)
+            return
+        entry = UndoEntry(f"{event.kind} {len(event.records)} {event.collection}")
+        entry.record(event)
+        self._push(entry)
+
+    def _push(self, entry: UndoEntry, clear_redo: bool = True) -> None:
+        if not entry:
+            return
+        with self._lock:
+            self._undo.append(entry)
+            if clear_redo:
+                self._redo.clear()
+            self._trim()
+
+    def _trim(self) -> None:
+        total = sum(entry.size for entry in self._undo)
+        while len(self._undo) > 1 and (len(self._undo) > self.limit or total > self.max_records):
+            total -= self._undo.popleft().size
+
+    # ------------------------------------------------------------------
+    @contextmanager
+    def transaction(self, label: str) -> Iterator[UndoEntry]:
+        """Все изменения в блоке (в этом потоке) — один шаг истории."""
+        outer = getattr(self._local, "group", None)
+        if outer is not None:
+            yield outer
+            return
+        group = self._local.group = UndoEntry(label)
+        try:
+            yield group
+        finally:
+            self._local.group = outer
+            self._push(group)
+
+    @contextmanager
+    def recording(self, entry: UndoEntry) -> Iterator[UndoEntry]:
+        """Изменения в блоке дописываются в entry, но в историю не идут.
+
+        Для шага, который собирается по частям в разных задачах event
+        loop (пачки импорта из файла); в историю его кладёт push.
+        """
+        outer = getattr(self._local, "group", None)
+        self._local.group = entry
+        try:
+            yield entry
+        finally:
+            self._local.group = outer
+
+    def push(self, entry: UndoEntry) -> None:
+        self._push(entry)
+
+    @contextmanager
+    def external_change(self) -> Iterator[None]:
+        """Изменения извне (перечитанный файл) не пишутся, а история сбрасывается:
+        старые «до» могут не совпасть с новыми данными."""
+        self._local.suspended = True
+        try:
+            yield
+        finally:
+            self._local.suspended = False
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._undo.clear()
+            self._redo.clear()
+
+    # ------------------------------------------------------------------
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def _revert(self, entry: UndoEntry) -> UndoEntry:
+        """Возвращает записи к состоянию «до»; возвращает шаг для обратного действия."""
+        inverse = UndoEntry(entry.label)
+        outer = getattr(self._local, "group", None)
+        self._local.group = inverse
+        try:
+            for name, before in entry.before.items():
+                collection = self.collections[name]
+                deletes, replaces, restores = [], [], []
+                for record_id, old in before.items():
+                    exists = collection.get(record_id) is not None
+                    if old is _ABSENT:
+                        if exists:
+                            deletes.append(record_id)
+                    elif exists:
+                        replaces.append(old)
+                    else:
+                        restores.append(old)
+                collection.delete(deletes)
+                collection.replace_many(replaces)
+                collection.restore(restores)
+        finally:
+            self._local.group = outer
+        return inverse
+
+    def undo(self) -> Optional[UndoEntry]:
+        """Откатывает последний шаг; возвращает его (None, если откатывать нечего)."""
+        with self._lock:
+            if not self._undo:
+                return None
+            entry = self._undo.pop()
+            self._redo.append(self._revert(entry))
+        return entry
+
+    def redo(self) -> Optional[UndoEntry]:
+        with self._lock:
+            if not self._redo:
+                return None
+            entry = self._redo.pop()
+            self._push(self._revert(entry), clear_redo=False)
+        return entry
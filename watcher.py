@@ -0,0 +1,172 @@
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+# ──────────────────────────────────────────────────────────────
+#  Отслеживание внешних изменений data/*.json
+# ──────────────────────────────────────────────────────────────
+DEFAULT_DEBOUNCE = 0.5   # секунд тишины перед перезагрузкой
+
+# Последняя известная «подпись» файла (mtime_ns, size) после нашей записи
+_known_signatures: Dict[str, Tuple[int, int]] = {}
+_known_lock = threading.Lock()
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def remember_file(path: Path) -> None:
+    """Запоминает состояние файла после собственной записи приложения.
+
+    Событие watchdog для файла с такой же подписью не вызовет
+    перезагрузку — иначе каждый save_* перечитывал бы свой же файл.
+    """
+    sig = _signature(Path(path))
+    if sig is not None:
+        with _known_lock:
+            _known_signatures[str(Path(path).resolve())] = sig
+
+
+def is_external_change(path: Path) -> bool:
+    key = str(Path(path).resolve())
+    sig = _signature(Path(path))
+    with _known_lock:
+        if sig is None or _known_signatures.get(key) == sig:
+            return False
+        _known_signatures[key] = sig
+    return True
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: "DataWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        if event.is_directory:
+            return
+        path = getattr(event, "dest_path", "") or event.src_path
+        self.watcher._touch(Path(path))
+
+
+class DataWatcher:
+    """Следит за файлами данных и сообщает об изменениях пачкой.
+
+    Серия событий в пределах debounce секунд сводится к одному вызову
+    on_change(множество изменившихся имён файлов). Имена — пути
+    относительно data_dir, в том числе в подкаталогах («expenses/manifest.json»).
+    on_change вызывается из потока таймера: работу с хранилищем и UI
+    он должен передать в event loop.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        file_names: Iterable[str],
+        on_change: Callable[[Set[str]], None],
+        debounce: float = DEFAULT_DEBOUNCE,
+    ):
+        self.data_dir = Path(data_dir)
+        self.file_names = set(file_names)
+        self.on_change = on_change
+        self.debounce = debounce
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._observer: Optional[Observer] = None
+
+    def start(self) -> None:
+        self.data_dir.mkdir(exist_ok=True)
+        for name in self.file_names:
+            remember_file(self.data_dir / name)
+        self._observer = Observer()
+        recursive = any("/" in name for name in self.file_names)
+        self._observer.schedule(_Handler(self), str(self.data_dir), recursive=recursive)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _touch(self, path: Path) -> None:
+        try:
+            name = path.resolve().relative_to(self.data_dir.resolve()).as_posix()
+        except ValueError:
+            return
+        if name not in self.file_names:
+            return
+        with self._lock:
+            self._pending.add(name)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            names, self._pending = self._pending, set()
+            self._timer = None
+        changed = {name for name in names if is_external_change(self.data_dir / name)}
+        if changed:
+            try:
+                self.on_change(changed)
+            except Exception as exc:
+                print(f"[watcher] reload failed: {exc}")
+
+
+def merge_records(current: list, fresh: list,
+                  on_added: Optional[Callable[[dict], None]] = None,
+                  on_updated: Optional[Callable[[dict], None]] = None,
+                  on_removed: Optional[Callable[[dict], None]] = None) -> Tuple[list, bool]:
+    """Сливает свежую версию списка записей с текущей по полю id.
+
+    Неизменённые записи остаются теми же объектами, изменённые
+    обновляются на месте (ссылки на них из UI и индексов остаются
+    валидными). Колбэки вызываются только для затронутых записей;
+    для обновлённой сначала on_removed со старым содержимым, затем
+    on_updated с новым — так индексы снимают старые ключи.
+    Возвращает (новый список в порядке файла, были ли изменения).
+    """
+    old_by_id = {rec["id"]: rec for rec in current}
+    merged = []
+    changed = False
+    fresh_ids = set()
+    for rec in fresh:
+        fresh_ids.add(rec["id"])
+        old = old_by_id.get(rec["id"])
+        if old is None:
+            changed = True
+            merged.append(rec)
+            if on_added:
+                on_added(rec)
+        elif old != rec:
+            changed = True
+            if on_removed:
+                on_removed(old)
+            old.clear()
+            old.update(rec)
+            merged.append(old)
+            if on_updated:
+                on_updated(old)
+        else:
+            merged.append(old)
+    for rec_id, old in old_by_id.items():
+        if rec_id not in fresh_ids:
+            changed = True
+            if on_removed:
+                on_removed(old)
+    return merged, changed